@@ -1,4 +1,7 @@
-from app.models import UserProfile
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models import DailyRecord, UserProfile
+from app.services.challenges import METRICS, PERIODS, UNITS, Challenge
 
 
 def format_progress(profile: UserProfile) -> str:
@@ -19,3 +22,96 @@ def format_progress(profile: UserProfile) -> str:
     if profile.temperature is not None:
         parts.append(f"Температура в {profile.city}: {profile.temperature:.1f} °C.")
     return "\n".join(parts)
+
+
+def format_meal_draft(items: List[Dict[str, Any]]) -> str:
+    lines = ["Проверьте прием пищи:"]
+    total = 0.0
+    for number, item in enumerate(items, 1):
+        if item["name"]:
+            calories = item["calories_100g"] * item["grams"] / 100
+            total += calories
+            lines.append(f"{number}. {item['name']} — {item['grams']:.0f} г, {calories:.0f} ккал.")
+        else:
+            lines.append(f"{number}. {item['query']} — не найдено, будет пропущено.")
+    lines.append(f"Итого: {total:.0f} ккал.")
+    lines.append(
+        "Ответьте «да», чтобы записать. Исправить: «2 180» — граммы, "
+        "«2 творог 150» — другой продукт, «2 -» — удалить."
+    )
+    return "\n".join(lines)
+
+
+def format_history(records: List[DailyRecord], days: int) -> str:
+    lines = ["Сегодня:" if days == 1 else "История:"]
+    for record in records:
+        line = (
+            f"{record.day:%d.%m}: вода {record.water:.0f}/{record.water_goal:.0f} мл, "
+            f"+{record.calories_in:.0f}/−{record.calories_out:.0f} ккал (цель {record.calorie_goal:.0f})"
+        )
+        if record.top_foods:
+            line += f", {record.top_foods}"
+        lines.append(line)
+    if days > 1 and len(records) == 1:
+        lines.append("Завершенных дней пока нет — итоги дня попадают в историю после полуночи.")
+    return "\n".join(lines)
+
+
+def format_stats(summary: Dict[str, Any], tiers: Dict[str, float], ingress: Dict[str, int], upstream: Dict[str, Any]) -> str:
+    def top(items: List[Tuple[str, float, float]]) -> str:
+        # Оценка Space-Saving может быть завышена — тогда показываем и гарантированный минимум
+        return ", ".join(
+            f"{name} ({count:.0f})" if guaranteed == count else f"{name} ({count:.0f}, не меньше {guaranteed:.0f})"
+            for name, count, guaranteed in items
+        ) or "—"
+
+    def endpoint(name: str, state: str) -> str:
+        counters = upstream["counters"]
+        p95 = upstream["p95"][name]
+        events = ", ".join(
+            f"{label} {counters.get(f'{name}.{event}', 0)}"
+            for event, label in [("failures", "сбоев"), ("misses", "промахов"), ("hedged", "хеджей"),
+                                 ("stale_served", "устаревших ответов"), ("short_circuited", "отбито")]
+        )
+        latency = f"{p95 * 1000:.0f} мс" if p95 is not None else "—"
+        return f"- {name}: размыкатель {state}, p95 {latency}; {events}."
+
+    return "\n".join([
+        f"Статистика за {summary['day']:%d.%m}:",
+        f"- Активных пользователей: {summary['active_users']}.",
+        f"- Вода: {summary['water'] / 1000:.1f} л.",
+        f"- Калории: +{summary['calories_in']:.0f} / −{summary['calories_out']:.0f} ккал.",
+        f"- Цель по воде выполнили: {summary['goal_rate']:.0%}.",
+        f"- Топ продуктов: {top(summary['top_foods'])}.",
+        f"- Топ тренировок: {top(summary['top_workouts'])}.",
+        f"- Сейчас в диалоге: {summary['in_dialog']}.",
+        "Хранилище:",
+        f"- В памяти: {tiers['hot']}, на диске: {tiers['cold']}, вытеснено: {tiers['evictions']}.",
+        f"- Подъем с диска: {tiers['cold_loads']} раз, в среднем {tiers['cold_load_avg_ms']:.2f} мс, "
+        f"максимум {tiers['cold_load_max_ms']:.2f} мс.",
+        "Входящие:",
+        f"- Склеено повторов: {ingress['merged']}, сброшено при перегрузке: {ingress['dropped']}.",
+        f"- Ждут в очереди графиков: {ingress['waiting']}, чатов в обработке: {ingress['chats']}.",
+        "Внешние API:",
+        *[endpoint(name, state) for name, state in sorted(upstream["breakers"].items())],
+    ])
+
+
+def format_leaderboard(
+    challenge: Challenge,
+    top: List[Tuple[str, float]],
+    rank: Optional[int],
+    score: float,
+    members: int,
+) -> str:
+    unit = UNITS[challenge.metric]
+    lines = [f"Рейтинг ({METRICS[challenge.metric]}, {PERIODS[challenge.period]} с {challenge.period_start:%d.%m}):"]
+    if not top:
+        lines.append("Участников пока нет — присоединяйтесь через /join.")
+    for place, (name, points) in enumerate(top, 1):
+        lines.append(f"{place}. {name} — {points:.0f} {unit}")
+    if rank is not None and rank > len(top):
+        lines.append(f"…\nВы: {rank} место из {members}, {score:.0f} {unit}.")
+    elif rank is None and top:
+        lines.append("Вы не участвуете: /join.")
+    return "\n".join(lines)
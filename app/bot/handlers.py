@@ -1,56 +1,103 @@
+import asyncio
 import logging
-from typing import Optional
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
 
-from telegram import ReplyKeyboardMarkup, ReplyKeyboardRemove, Update
+from telegram import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove, Update
+from telegram.error import BadRequest
 from telegram.ext import (
     Application,
-    CommandHandler,
+    CallbackQueryHandler,
     ContextTypes,
     ConversationHandler,
     MessageHandler,
     filters,
 )
 
-from app.bot.formatters import format_progress
+from app.bot.formatters import format_history, format_leaderboard, format_meal_draft, format_progress, format_stats
+from app.bot.ingress import Ingress
+from app.bot.router import ANY_COMMAND, ANY_PHOTO, ANY_TEXT, Router
 from app.bot.state import FoodState, ProfileState, WaterState, WorkoutState
 from app.models import FoodLogEntry, UserProfile, WorkoutLogEntry
+from app.services.activities import ActivityCatalog
+from app.services.barcode import barcode_decoding_available, decode_barcode, normalize_barcode
 from app.services.calculations import estimate_workout_calories
+from app.services.challenges import METRICS, PERIODS, ChallengeRegistry
 from app.services.food import FoodClient
+from app.services.history import recent_days
+from app.services.meal import parse_item, parse_meal
 from app.services.plotter import ProgressPlotter
+from app.services.reminders import HydrationReminders
+from app.services.resilience import Resilience
+from app.services.stats import GlobalStats
 from app.services.storage import InMemoryStorage
+from app.services.timezones import parse_timezone
 from app.services.weather import WeatherClient
 
+# Клавиатуры и фильтры неизменяемы — собираем один раз на процесс
+MAIN_KEYBOARD = ReplyKeyboardMarkup(
+    [
+        ["Настроить профиль", "Добавить воду"],
+        ["Лог еды", "Тренировка"],
+        ["Прогресс", "Графики"],
+    ],
+    resize_keyboard=True,
+)
+WORKOUT_KEYBOARD = ReplyKeyboardMarkup(
+    [
+        ["бег", "ходьба", "вело"],
+        ["йога", "силовая", "плавание"],
+    ],
+    resize_keyboard=True,
+)
+ROUTED_MESSAGES = filters.TEXT | filters.PHOTO
+
+# Быстрые кнопки под сообщением прогресса: callback_data «q:<действие>[:<аргумент>]»
+QUICK_PREFIX = "q:"
+QUICK_WATER_AMOUNTS = (250, 500)
+
+
+def _quick_keyboard(repeat_workout: bool, repeat_food: bool) -> InlineKeyboardMarkup:
+    rows = [[InlineKeyboardButton(f"+{amount} мл", callback_data=f"{QUICK_PREFIX}water:{amount}") for amount in QUICK_WATER_AMOUNTS]]
+    repeat = []
+    if repeat_workout:
+        repeat.append(InlineKeyboardButton("Повторить тренировку", callback_data=f"{QUICK_PREFIX}workout"))
+    if repeat_food:
+        repeat.append(InlineKeyboardButton("Повторить еду", callback_data=f"{QUICK_PREFIX}food"))
+    if repeat:
+        rows.append(repeat)
+    rows.append([InlineKeyboardButton("Обновить", callback_data=f"{QUICK_PREFIX}refresh")])
+    return InlineKeyboardMarkup(rows)
+
+
+# Вариантов всего четыре (есть ли что повторять) — тоже собираем заранее
+QUICK_KEYBOARDS = {
+    (workout, food): _quick_keyboard(workout, food)
+    for workout in (False, True)
+    for food in (False, True)
+}
+
 
 class BotHandlers:
 
     WORKOUT_TYPES_RU = ["бег", "ходьба", "вело", "йога", "силовая", "плавание"]
-    WORKOUT_SYNONYMS = {
-        "бег": "бег",
-        "run": "бег",
-        "running": "бег",
-        "ходьба": "ходьба",
-        "walk": "ходьба",
-        "вело": "вело",
-        "велосипед": "вело",
-        "bike": "вело",
-        "cycling": "вело",
-        "йога": "йога",
-        "yoga": "йога",
-        "силовая": "силовая",
-        "strength": "силовая",
-        "сила": "силовая",
-        "плавание": "плавание",
-        "swim": "плавание",
+    MEAL_DEADLINE = 8.0
+    MEAL_CONFIRM = {"да", "ок", "ok", "yes", "сохранить", "записать"}
+    CITY_CONFIRM = {"да", "ок", "ok", "yes", "y", "ага"}
+    CITY_DECLINE = {"нет", "no", "n", "не"}
+    CHALLENGE_ALIASES = {
+        "water": "water", "вода": "water", "воды": "water",
+        "activity": "activity", "активность": "activity", "калории": "activity",
+        "day": "day", "день": "day", "daily": "day",
+        "week": "week", "неделя": "week", "weekly": "week",
     }
-    BUTTON_PATTERNS = {
-        "profile": r"Настроить профиль",
-        "water": r"Добавить воду",
-        "food": r"Лог еды",
-        "workout": r"Тренировка",
-        "progress": r"Прогресс",
-        "plots": r"Графики",
+    BUTTONS = {
+        "profile": "Настроить профиль",
+        "water": "Добавить воду",
+        "food": "Лог еды",
+        "workout": "Тренировка",
+        "progress": "Прогресс",
+        "plots": "Графики",
     }
-    BUTTON_REGEX = r"^(Настроить профиль|Добавить воду|Лог еды|Тренировка|Прогресс|Графики)$"
 
     def __init__(
         self,
@@ -58,12 +105,42 @@ class BotHandlers:
         weather: WeatherClient,
         food: FoodClient,
         plotter: ProgressPlotter,
+        reminders: HydrationReminders,
+        activities: ActivityCatalog,
+        stats: GlobalStats,
+        challenges: ChallengeRegistry,
+        admin_ids: FrozenSet[int] = frozenset(),
+        resilience: Optional[Resilience] = None,
     ) -> None:
         self.storage = storage
         self.weather = weather
         self.food = food
         self.plotter = plotter
+        self.reminders = reminders
+        self.activities = activities
+        self.stats = stats
+        self.challenges = challenges
+        self.admin_ids = admin_ids
+        # Размыкатели и счетчики внешних API для /stats
+        self.resilience = resilience or Resilience()
         self.logger = logging.getLogger(self.__class__.__name__)
+        self.router = self.build_router()
+        # Повторы запросов чтения склеиваются, графики идут через ограниченную очередь
+        self.ingress = Ingress(
+            self.router,
+            read_only=[
+                self.help,
+                self.check_progress,
+                self.plot_progress,
+                self.history,
+                self.week_chart,
+                self.month_chart,
+                self.leaderboard,
+            ],
+            expensive=[self.plot_progress, self.week_chart, self.month_chart],
+            # Хэндлеры держат профиль между await — пока апдейт обрабатывается, LRU его не вытесняет
+            pin=self.storage.pinned,
+        )
 
     #Утилиты 
     @staticmethod
@@ -73,53 +150,40 @@ class BotHandlers:
         except (TypeError, ValueError):
             return None
 
-    def ensure_profile(self, update: Update) -> UserProfile:
+    async def ensure_profile(self, update: Update) -> UserProfile:
         user = update.effective_user
-        return self.storage.get_or_create_user(user.id)
+        self.stats.touch(user.id)
+        return await self.storage.load_user(user.id)
 
     @staticmethod
     def main_keyboard() -> ReplyKeyboardMarkup:
-        return ReplyKeyboardMarkup(
-            [
-                ["Настроить профиль", "Добавить воду"],
-                ["Лог еды", "Тренировка"],
-                ["Прогресс", "Графики"],
-            ],
-            resize_keyboard=True,
-        )
+        return MAIN_KEYBOARD
 
-    @classmethod
-    def workout_keyboard(cls) -> ReplyKeyboardMarkup:
-        rows = [
-            ["бег", "ходьба", "вело"],
-            ["йога", "силовая", "плавание"],
-        ]
-        return ReplyKeyboardMarkup(rows, resize_keyboard=True)
+    @staticmethod
+    def workout_keyboard() -> ReplyKeyboardMarkup:
+        return WORKOUT_KEYBOARD
+
+    @staticmethod
+    def quick_keyboard(profile: UserProfile) -> InlineKeyboardMarkup:
+        return QUICK_KEYBOARDS[bool(profile.workout_log), bool(profile.food_log)]
 
     def normalize_workout_type(self, raw: str) -> str:
-        return self.WORKOUT_SYNONYMS.get(raw.strip().lower(), raw.strip())
+        activity = self.activities.match(raw)
+        return activity.name if activity else raw.strip()
 
     @staticmethod
     def in_profile(context: ContextTypes.DEFAULT_TYPE) -> bool:
         return bool(context.user_data.get("profile_in_progress"))
 
     @staticmethod
-    def require_no_profile(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    async def require_no_profile(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
         if context.user_data.get("profile_in_progress"):
             text = "Сначала завершите настройку профиля или введите /cancel."
             if update.message:
-                update.message.reply_text(text)
+                await update.message.reply_text(text)
             return True
         return False
 
-    @property
-    def button_filter(self):
-        return filters.Regex(self.BUTTON_REGEX)
-
-    def is_button(self, update: Update) -> bool:
-        msg = update.message
-        return bool(msg and msg.text and self.button_filter.filter(msg))
-
     @staticmethod
     def is_number(text: str) -> bool:
         try:
@@ -130,12 +194,13 @@ class BotHandlers:
 
     #Общие команды
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        self.ensure_profile(update)
+        profile = await self.ensure_profile(update)
+        self.reminders.schedule(profile)
         await update.message.reply_text(
             "Привет! Я помогу считать воду и калории.\n"
             "Настрой профайл через /set_profile, записывай воду через /log_water 250,\n"
             "еду через /log_food <продукт>, тренировки через /log_workout <тип> <минуты>.\n"
-            "Типы тренировок: бег, ходьба, вело, йога, силовая, плавание.\n"
+            "Типы тренировок: бег, ходьба, вело, йога, силовая, плавание и еще две сотни других.\n"
             "Посмотреть прогресс: /check_progress. Графики: /plot_progress.\n"
             "Можешь пользоваться кнопками ниже или командами. Подсказки: /help",
             reply_markup=self.main_keyboard(),
@@ -147,9 +212,16 @@ class BotHandlers:
             "/set_profile — шаг за шагом настроить вес, активность, город.\n"
             "/log_water <мл> — записать воду.\n"
             "/log_food <название> — найти калорийность продукта и ввести граммы.\n"
-            "/log_workout <тип> <минуты> — записать тренировку и расход. Доступные типы: бег, ходьба, вело, йога, силовая, плавание.\n"
-            "/check_progress — текущие итоги по воде и калориям.\n"
+            "/log_meal <продукт граммы, ...> — записать прием пищи из нескольких продуктов.\n"
+            "/log_barcode <штрихкод> — найти продукт по штрихкоду (или пришлите фото штрихкода в диалоге еды).\n"
+            "/log_workout <тип> <минуты> — записать тренировку и расход. Тип можно писать с опечатками: «тенис», «бегг».\n"
+            "/check_progress — текущие итоги по воде и калориям; кнопки под ними записывают воду и повторяют тренировку или еду в одно нажатие.\n"
             "/plot_progress — отправить графики прогресса.\n"
+            "/history [дней] — итоги прошлых дней (по умолчанию 7).\n"
+            "/week, /month — графики за неделю и за месяц.\n"
+            "/reminders on|off — включить или выключить напоминания пить воду.\n"
+            "/timezone <пояс> — часовой пояс для сброса дневных итогов и напоминаний.\n"
+            "В группе: /challenge вода|активность день|неделя, /join, /leave, /leaderboard — общий челлендж.\n"
             "/cancel — выйти из текущего диалога.",
             reply_markup=self.main_keyboard(),
         )
@@ -157,6 +229,8 @@ class BotHandlers:
     async def cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         context.user_data.pop("profile_draft", None)
         context.user_data.pop("food_context", None)
+        context.user_data.pop("meal_draft", None)
+        context.user_data.pop("meal_mode", None)
         context.user_data.pop("workout_context", None)
         context.user_data["profile_in_progress"] = False
         await update.message.reply_text("Диалог отменен.", reply_markup=self.main_keyboard())
@@ -208,8 +282,34 @@ class BotHandlers:
         return ProfileState.CITY
 
     async def set_city(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        context.user_data["profile_draft"]["city"] = update.message.text.strip()
-        await update.message.reply_text("Ваш пол? Напишите m/f или пропустите.")
+        text = update.message.text.strip()
+        draft = context.user_data["profile_draft"]
+        suggestion = draft.pop("city_suggestion", None)
+        answer = text.lower()
+        if suggestion and answer in self.CITY_CONFIRM:
+            place = self.weather.cities.get(suggestion["city_id"])
+            # Город угадан по опечатке — погоду берем по нему, но часовой пояс, заданный раньше, не трогаем
+            draft["city"], draft["city_id"], draft["city_timezone"] = place.name, place.id, False
+            note = f"Город: {place.name}. Часовой пояс не меняю — если нужен {place.timezone}, задайте его через /timezone."
+        else:
+            if suggestion and answer in self.CITY_DECLINE:
+                text, place = suggestion["query"], None
+            else:
+                place = self.weather.cities.resolve(text)
+                guess = self.weather.cities.suggest(text) if place is None else None
+                if guess is not None:
+                    draft["city_suggestion"] = {"query": text, "city_id": guess.id}
+                    await update.message.reply_text(
+                        f"Вы имели в виду {guess.name} ({guess.timezone})? Ответьте да/нет или напишите город иначе."
+                    )
+                    return ProfileState.CITY
+            if place:
+                draft["city"], draft["city_id"], draft["city_timezone"] = place.name, place.id, True
+                note = f"Город: {place.name} ({place.timezone})."
+            else:
+                draft["city"], draft["city_id"], draft["city_timezone"] = text, "", False
+                note = "Не нашел город в справочнике — погоду буду искать по названию, часовой пояс задайте через /timezone."
+        await update.message.reply_text(f"{note}\nВаш пол? Напишите m/f или пропустите.")
         return ProfileState.GENDER
 
     async def set_gender(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -238,19 +338,25 @@ class BotHandlers:
         else:
             draft["calorie_goal_manual"] = None
 
-        profile = self.ensure_profile(update)
+        profile = await self.ensure_profile(update)
         profile.weight = draft.get("weight", profile.weight)
         profile.height = draft.get("height", profile.height)
         profile.age = draft.get("age", profile.age)
         profile.activity = draft.get("activity", profile.activity)
         profile.city = draft.get("city", profile.city)
+        profile.city_id = draft.get("city_id", profile.city_id)
         profile.gender = draft.get("gender", profile.gender)
         profile.calorie_goal_manual = draft.get("calorie_goal_manual")
+        place = self.weather.cities.get(profile.city_id)
+        # Пояс по городу — только при точном совпадении названия; угаданный город пояс не переписывает
+        if place and draft.get("city_timezone") and place.timezone != profile.timezone:
+            self.storage.set_timezone(profile, place.timezone)
 
-        temperature = self.weather.fetch_temperature(profile.city)
+        temperature = await asyncio.to_thread(self.weather.fetch_temperature, profile.city, profile.city_id)
         if temperature is not None:
             profile.temperature = temperature
         self.storage.recalc_goals(profile)
+        self.reminders.schedule(profile)
 
         context.user_data.pop("profile_draft", None)
         context.user_data["profile_in_progress"] = False
@@ -263,9 +369,9 @@ class BotHandlers:
         return ConversationHandler.END
 
     #Вода
-    async def log_water_entry(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        if self.require_no_profile(update, context):
-            return ConversationHandler.END
+    async def log_water_entry(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> Optional[int]:
+        if await self.require_no_profile(update, context):
+            return None
         context.user_data.pop("food_context", None)
         if context.args:
             amount = self.parse_float(" ".join(context.args))
@@ -275,8 +381,8 @@ class BotHandlers:
                     reply_markup=self.main_keyboard(),
                 )
                 return ConversationHandler.END
-            profile = self.ensure_profile(update)
-            profile.logged_water += amount
+            profile = await self.ensure_profile(update)
+            await self.record_water(profile, amount)
             water_left = max(profile.water_goal - profile.logged_water, 0)
             await update.message.reply_text(
                 f"Записано {amount:.0f} мл. Осталось {water_left:.0f} мл до цели {profile.water_goal:.0f} мл.",
@@ -291,12 +397,6 @@ class BotHandlers:
         return WaterState.AMOUNT
 
     async def log_water_amount(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        if self.is_button(update):
-            await update.message.reply_text(
-                "Сначала введите объем воды в мл или /cancel.",
-                reply_markup=self.main_keyboard(),
-            )
-            return WaterState.AMOUNT
         amount = self.parse_float(update.message.text)
         if amount is None or amount <= 0:
             await update.message.reply_text(
@@ -305,8 +405,8 @@ class BotHandlers:
             )
             return WaterState.AMOUNT
 
-        profile = self.ensure_profile(update)
-        profile.logged_water += amount
+        profile = await self.ensure_profile(update)
+        await self.record_water(profile, amount)
         water_left = max(profile.water_goal - profile.logged_water, 0)
         await update.message.reply_text(
             f"Записано {amount:.0f} мл. Осталось {water_left:.0f} мл до цели {profile.water_goal:.0f} мл.",
@@ -314,55 +414,95 @@ class BotHandlers:
         )
         return ConversationHandler.END
 
+    async def record_water(self, profile: UserProfile, amount: float) -> None:
+        await self.storage.add_water(profile.user_id, amount)
+        self.reminders.schedule(profile)
+        self.stats.water_logged(profile, amount)
+        self.challenges.record(profile.user_id, "water", amount)
+
     #Еда
-    async def log_food_entry(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        if self.require_no_profile(update, context):
-            return ConversationHandler.END
+    async def log_food_entry(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> Optional[int]:
+        if await self.require_no_profile(update, context):
+            return None
+        context.user_data.pop("meal_mode", None)
         if context.args:
             product_name = " ".join(context.args)
             return await self.search_food(update, context, product_name)
-        await update.message.reply_text("Что вы съели? Напишите название продукта.", reply_markup=self.main_keyboard())
+        await update.message.reply_text(
+            "Что вы съели? Напишите название продукта или несколько продуктов с граммами: "
+            "гречка 200г, курица 150 г, огурец 100. Можно прислать фото штрихкода.",
+            reply_markup=self.main_keyboard(),
+        )
         return FoodState.NAME
 
     async def food_name_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        if self.is_button(update):
-            await update.message.reply_text("Введите название продукта или /cancel.", reply_markup=self.main_keyboard())
-            return FoodState.NAME
         product_name = update.message.text.strip()
+        # Цифры с верной контрольной суммой — штрихкод (в том числе ответ на подсказку /log_barcode)
+        barcode = normalize_barcode(product_name)
+        if barcode:
+            return await self.search_barcode(update, context, barcode)
         if not product_name or self.is_number(product_name):
             await update.message.reply_text("Введите название продукта (не число) или /cancel.", reply_markup=self.main_keyboard())
             return FoodState.NAME
+        # После /log_meal без аргументов и один продукт с граммами — прием пищи, как в /log_meal гречка 200г.
+        # В /log_food прием пищи — только перечисление; «молоко 3,2» остается поиском одного продукта
+        meal_mode = context.user_data.pop("meal_mode", False)
+        items = parse_meal(product_name, min_items=1 if meal_mode else 2)
+        if items:
+            return await self.resolve_meal(update, context, items)
         return await self.search_food(update, context, product_name)
 
     async def search_food(self, update: Update, context: ContextTypes.DEFAULT_TYPE, product_name: str) -> int:
-        info = self.food.get_food_info(product_name)
+        info = await asyncio.to_thread(self.food.get_food_info, product_name)
         if not info or info.get("calories", 0) <= 0:
             await update.message.reply_text("Не нашел продукт. Попробуйте уточнить название.", reply_markup=self.main_keyboard())
             return FoodState.NAME
+        return await self.ask_grams(update, context, info)
+
+    @staticmethod
+    def alternatives_keyboard(alternatives: List[Dict[str, Any]]) -> ReplyKeyboardMarkup:
+        return ReplyKeyboardMarkup([[item["name"]] for item in alternatives], resize_keyboard=True, one_time_keyboard=True)
+
+    async def ask_grams(self, update: Update, context: ContextTypes.DEFAULT_TYPE, info: Dict[str, Any]) -> int:
         context.user_data["food_context"] = info
+        alternatives = info.get("alternatives") or []
+        text = f"{info['name']} — {info['calories']:.0f} ккал на 100 г. Сколько грамм вы съели?"
+        if alternatives:
+            text += "\nЕсли продукт не тот — возможно, вы имели в виду один из вариантов на кнопках."
         await update.message.reply_text(
-            f"{info['name']} — {info['calories']:.0f} ккал на 100 г. Сколько грамм вы съели?",
-            reply_markup=self.main_keyboard(),
+            text,
+            reply_markup=self.alternatives_keyboard(alternatives) if alternatives else self.main_keyboard(),
         )
         return FoodState.GRAMS
 
+    async def choose_alternative(self, update: Update, context: ContextTypes.DEFAULT_TYPE, info: Dict[str, Any], text: str) -> Optional[int]:
+        #Выбор варианта «возможно, вы имели в виду»: выбранный становится основным, прежний — среди вариантов.
+        alternatives = info.get("alternatives") or []
+        chosen = next((item for item in alternatives if item["name"] == text), None)
+        if chosen is None:
+            return None
+        rest = [item for item in alternatives if item is not chosen]
+        current = {key: value for key, value in info.items() if key != "alternatives"}
+        return await self.ask_grams(update, context, {**chosen, "alternatives": [current, *rest]})
+
     async def food_grams_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        if self.is_button(update):
-            await update.message.reply_text("Сначала введите массу в граммах или /cancel.", reply_markup=self.main_keyboard())
-            return FoodState.GRAMS
-        grams = self.parse_float(update.message.text)
+        info = context.user_data.get("food_context")
+        text = update.message.text.strip()
+        if info and not self.is_number(text):
+            state = await self.choose_alternative(update, context, info, text)
+            if state is not None:
+                return state
+        grams = self.parse_float(text)
         if grams is None or grams <= 0:
             await update.message.reply_text("Введите массу в граммах или /cancel.", reply_markup=self.main_keyboard())
             return FoodState.GRAMS
-        info = context.user_data.get("food_context")
         if not info:
             await update.message.reply_text("Начните заново с /log_food.")
             return ConversationHandler.END
 
         calories = info["calories"] * grams / 100
-        profile = self.ensure_profile(update)
-        profile.logged_calories += calories
-        profile.food_log.append(FoodLogEntry(name=info["name"], grams=grams, calories=calories))
+        profile = await self.ensure_profile(update)
+        await self.record_food(profile, [FoodLogEntry(name=info["name"], grams=grams, calories=calories)])
         await update.message.reply_text(
             f"Записано: {info['name']} — {calories:.0f} ккал ({grams:.0f} г).",
             reply_markup=self.main_keyboard(),
@@ -370,24 +510,156 @@ class BotHandlers:
         context.user_data.pop("food_context", None)
         return ConversationHandler.END
 
-    #Тренировки
-    async def log_workout_entry(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        if self.require_no_profile(update, context):
+    async def record_food(self, profile: UserProfile, entries: List[FoodLogEntry]) -> None:
+        await self.storage.add_food(profile.user_id, entries)
+        self.stats.food_logged(profile, entries)
+
+    #Штрихкоды
+    async def log_barcode_entry(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> Optional[int]:
+        if await self.require_no_profile(update, context):
+            return None
+        barcode = normalize_barcode("".join(context.args or []))
+        if not barcode:
+            await update.message.reply_text(
+                "Пришлите цифры штрихкода с упаковки (8 или 13 цифр) или его фото, например: 4607001771234",
+                reply_markup=self.main_keyboard(),
+            )
+            return FoodState.NAME
+        return await self.search_barcode(update, context, barcode)
+
+    async def food_photo_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        if not barcode_decoding_available():
+            await update.message.reply_text(
+                "Распознавание фото недоступно. Введите штрихкод: /log_barcode <цифры>.",
+                reply_markup=self.main_keyboard(),
+            )
+            return FoodState.NAME
+        photo_file = await update.message.photo[-1].get_file()
+        data = await photo_file.download_as_bytearray()
+        barcode = await asyncio.to_thread(decode_barcode, bytes(data))
+        if not barcode:
+            await update.message.reply_text(
+                "Не удалось прочитать штрихкод. Сфотографируйте ближе или введите /log_barcode <цифры>.",
+                reply_markup=self.main_keyboard(),
+            )
+            return FoodState.NAME
+        return await self.search_barcode(update, context, barcode)
+
+    async def search_barcode(self, update: Update, context: ContextTypes.DEFAULT_TYPE, barcode: str) -> int:
+        info = await asyncio.to_thread(self.food.get_by_barcode, barcode)
+        if not info or info.get("calories", 0) <= 0:
+            await update.message.reply_text(
+                f"Продукт со штрихкодом {barcode} не найден. Напишите название продукта.",
+                reply_markup=self.main_keyboard(),
+            )
+            return FoodState.NAME
+        return await self.ask_grams(update, context, info)
+
+    #Прием пищи из нескольких продуктов
+    async def log_meal_entry(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> Optional[int]:
+        if await self.require_no_profile(update, context):
+            return None
+        items = parse_meal(" ".join(context.args or []))
+        if not items:
+            await update.message.reply_text(
+                "Перечислите продукты с граммами через запятую, например: гречка 200г, курица 150 г, огурец 100.",
+                reply_markup=self.main_keyboard(),
+            )
+            context.user_data["meal_mode"] = True
+            return FoodState.NAME
+        return await self.resolve_meal(update, context, items)
+
+    @staticmethod
+    def meal_item(query: str, grams: float, info: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        found = bool(info and info.get("calories", 0) > 0)
+        return {
+            "query": query,
+            "name": info["name"] if found else None,
+            "grams": grams,
+            "calories_100g": info["calories"] if found else 0.0,
+        }
+
+    async def resolve_meal(self, update: Update, context: ContextTypes.DEFAULT_TYPE, items: List[Tuple[str, float]]) -> int:
+        #Все продукты ищем одновременно, общий дедлайн — MEAL_DEADLINE.
+        found = await self.food.get_many([name for name, _ in items], timeout=self.MEAL_DEADLINE)
+        draft = [self.meal_item(name, grams, found.get(name)) for name, grams in items]
+        context.user_data["meal_draft"] = draft
+        await update.message.reply_text(format_meal_draft(draft), reply_markup=self.main_keyboard())
+        return FoodState.MEAL
+
+    async def meal_confirm_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        text = update.message.text.strip()
+        draft = context.user_data.get("meal_draft")
+        if not draft:
+            await update.message.reply_text("Начните заново с /log_food.", reply_markup=self.main_keyboard())
             return ConversationHandler.END
+        if text.lower() in self.MEAL_CONFIRM:
+            return await self.save_meal(update, context, draft)
+
+        number, _, rest = text.partition(" ")
+        index = int(number) - 1 if number.isdigit() else -1
+        rest = rest.strip()
+        if not 0 <= index < len(draft) or not rest:
+            await update.message.reply_text(
+                "Ответьте «да», чтобы записать, или исправьте позицию: «2 180», «2 творог 150», «2 -».",
+                reply_markup=self.main_keyboard(),
+            )
+            return FoodState.MEAL
+
+        grams = self.parse_float(rest)
+        if rest in {"-", "удалить"}:
+            draft.pop(index)
+        elif grams is not None and grams > 0:
+            draft[index]["grams"] = grams
+        else:
+            name, grams = parse_item(rest) or (rest, draft[index]["grams"])
+            found = await self.food.get_many([name], timeout=self.MEAL_DEADLINE)
+            draft[index] = self.meal_item(name, grams, found.get(name))
+
+        if not draft:
+            context.user_data.pop("meal_draft", None)
+            await update.message.reply_text("Список пуст, ничего не записано.", reply_markup=self.main_keyboard())
+            return ConversationHandler.END
+        await update.message.reply_text(format_meal_draft(draft), reply_markup=self.main_keyboard())
+        return FoodState.MEAL
+
+    async def save_meal(self, update: Update, context: ContextTypes.DEFAULT_TYPE, draft: List[Dict[str, Any]]) -> int:
+        entries = [
+            FoodLogEntry(name=item["name"], grams=item["grams"], calories=item["calories_100g"] * item["grams"] / 100)
+            for item in draft
+            if item["name"]
+        ]
+        if not entries:
+            await update.message.reply_text(
+                "Ни один продукт не найден. Замените позиции или /cancel.",
+                reply_markup=self.main_keyboard(),
+            )
+            return FoodState.MEAL
+        total = sum(entry.calories for entry in entries)
+        profile = await self.ensure_profile(update)
+        await self.record_food(profile, entries)
+        context.user_data.pop("meal_draft", None)
+        await update.message.reply_text(
+            f"Записано продуктов: {len(entries)}, всего {total:.0f} ккал.",
+            reply_markup=self.main_keyboard(),
+        )
+        return ConversationHandler.END
+
+    #Тренировки
+    async def log_workout_entry(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> Optional[int]:
+        if await self.require_no_profile(update, context):
+            return None
         args = context.args or []
         if len(args) >= 2:
             return await self.log_workout_direct(update, context, args)
         await update.message.reply_text(
             "Укажите тип тренировки. Выберите кнопку или напишите свой вариант.\n"
-            "Доступные варианты: бег, ходьба, вело, йога, силовая, плавание.",
+            "Популярные: бег, ходьба, вело, йога, силовая, плавание. Подойдут и другие: теннис, бокс, лыжи…",
             reply_markup=self.workout_keyboard(),
         )
         return WorkoutState.TYPE
 
     async def log_workout_type(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        if self.is_button(update):
-            await update.message.reply_text("Введите тип тренировки текстом или /cancel.", reply_markup=self.main_keyboard())
-            return WorkoutState.TYPE
         workout_type = self.normalize_workout_type(update.message.text)
         context.user_data["workout_context"] = {"type": workout_type}
         await update.message.reply_text(
@@ -397,9 +669,6 @@ class BotHandlers:
         return WorkoutState.MINUTES
 
     async def log_workout_minutes(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        if self.is_button(update):
-            await update.message.reply_text("Введите длительность в минутах или /cancel.", reply_markup=self.main_keyboard())
-            return WorkoutState.MINUTES
         minutes = self.parse_float(update.message.text)
         if minutes is None or minutes <= 0:
             await update.message.reply_text("Укажите длительность числом, например 30.", reply_markup=self.main_keyboard())
@@ -419,15 +688,8 @@ class BotHandlers:
             await update.message.reply_text("Укажите длительность в минутах числом, например 30.", reply_markup=self.main_keyboard())
             return ConversationHandler.END
 
-        profile = self.ensure_profile(update)
-        calories, water_bonus = estimate_workout_calories(workout_type, minutes, profile.weight)
-        profile.burned_calories += calories
-        profile.workout_water_bonus += water_bonus
-        profile.workout_log.append(
-            WorkoutLogEntry(workout_type=workout_type, minutes=minutes, calories=calories, water_bonus=water_bonus)
-        )
-        self.storage.recalc_goals(profile)
-
+        profile = await self.ensure_profile(update)
+        calories, water_bonus = await self.record_workout(profile, workout_type, minutes)
         await update.message.reply_text(
             f"Тренировка '{workout_type}' {minutes:.0f} мин — {calories:.0f} ккал. "
             f"Дополнительно выпейте {water_bonus} мл воды. "
@@ -436,29 +698,135 @@ class BotHandlers:
         )
         return ConversationHandler.END
 
+    async def record_workout(self, profile: UserProfile, workout_type: str, minutes: float) -> Tuple[float, int]:
+        calories, water_bonus = estimate_workout_calories(workout_type, minutes, profile.weight)
+        entry = WorkoutLogEntry(workout_type=workout_type, minutes=minutes, calories=calories, water_bonus=water_bonus)
+        await self.storage.add_workout(profile.user_id, entry)
+        self.reminders.schedule(profile)
+        self.stats.workout_logged(profile, entry)
+        self.challenges.record(profile.user_id, "activity", calories)
+        return calories, water_bonus
+
+    #Напоминания
+    async def toggle_reminders(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        profile = await self.ensure_profile(update)
+        arg = (context.args[0].lower() if context.args else "")
+        if arg in {"off", "выкл", "нет"}:
+            profile.reminders_enabled = False
+            self.reminders.unschedule(profile.user_id)
+            text = "Напоминания о воде выключены."
+        elif arg in {"on", "вкл", "да"}:
+            profile.reminders_enabled = True
+            self.reminders.schedule(profile)
+            text = "Напоминания о воде включены."
+        else:
+            state = "включены" if profile.reminders_enabled else "выключены"
+            text = f"Напоминания о воде {state}. Используйте /reminders on или /reminders off."
+        await update.message.reply_text(text, reply_markup=self.main_keyboard())
+
+    async def set_timezone(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        profile = await self.ensure_profile(update)
+        if not context.args:
+            await update.message.reply_text(
+                f"Ваш часовой пояс: {profile.timezone}. Дневные счетчики сбрасываются в полночь по нему.\n"
+                "Изменить: /timezone Asia/Novosibirsk, /timezone UTC+7 или /timezone Новосибирск.",
+                reply_markup=self.main_keyboard(),
+            )
+            return
+        timezone = parse_timezone(" ".join(context.args))
+        if not timezone:
+            await update.message.reply_text(
+                "Не знаю такого часового пояса. Смещение — от UTC-12 до UTC+14. "
+                "Пример: /timezone Europe/Moscow или /timezone UTC+3.",
+                reply_markup=self.main_keyboard(),
+            )
+            return
+        self.storage.set_timezone(profile, timezone)
+        self.reminders.schedule(profile)
+        await update.message.reply_text(f"Часовой пояс: {timezone}.", reply_markup=self.main_keyboard())
+
     #Прогресс
     async def check_progress(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        if self.require_no_profile(update, context):
+        if await self.require_no_profile(update, context):
             return
-        profile = self.ensure_profile(update)
-        temperature = self.weather.fetch_temperature(profile.city)
+        profile = await self.ensure_profile(update)
+        temperature = await asyncio.to_thread(self.weather.fetch_temperature, profile.city, profile.city_id)
         if temperature is not None:
             profile.temperature = temperature
         self.storage.recalc_goals(profile)
         message = update.effective_message
         if not message:
             return
-        await message.reply_text(format_progress(profile), reply_markup=self.main_keyboard())
+        # Под прогрессом — быстрые кнопки; нажатия правят это же сообщение. Ответ цитирует запрос:
+        # по нему quick_log узнает владельца сообщения в группе
+        await message.reply_text(format_progress(profile), reply_markup=self.quick_keyboard(profile), quote=True)
+
+    @staticmethod
+    def owns_progress(query: CallbackQuery) -> bool:
+        #В личке сообщение прогресса всегда свое; в группе владелец — автор процитированного запроса.
+        message = query.message
+        if message is None or message.chat.type == "private":
+            return True
+        request = message.reply_to_message
+        return request is not None and request.from_user is not None and request.from_user.id == query.from_user.id
+
+    async def quick_log(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        #Одно нажатие инлайн-кнопки: записываем и обновляем сообщение прогресса на месте.
+        query = update.callback_query
+        if not self.owns_progress(query):
+            await query.answer("Это чужой прогресс. Отправьте /check_progress, чтобы получить свои кнопки.", show_alert=True)
+            return
+        if context.user_data.get("profile_in_progress"):
+            await query.answer("Сначала завершите настройку профиля или введите /cancel.", show_alert=True)
+            return
+        action, _, arg = query.data[len(QUICK_PREFIX):].partition(":")
+        # callback_data приходит от клиента: принимаем только то, что сами положили в кнопки
+        amount = int(arg) if arg.isdigit() else None
+        valid = amount in QUICK_WATER_AMOUNTS if action == "water" else not arg
+        if not valid:
+            await query.answer()
+            return
+        profile = await self.ensure_profile(update)
+        if action == "water":
+            await self.record_water(profile, amount)
+            notice = f"+{amount:.0f} мл воды"
+        elif action == "workout":
+            if not profile.workout_log:
+                await query.answer("Сегодня тренировок еще не было.")
+                return
+            last = profile.workout_log[-1]
+            calories, _ = await self.record_workout(profile, last.workout_type, last.minutes)
+            notice = f"{last.workout_type} {last.minutes:.0f} мин — {calories:.0f} ккал"
+        elif action == "food":
+            if not profile.food_log:
+                await query.answer("Сегодня еда еще не записана.")
+                return
+            last = profile.food_log[-1]
+            await self.record_food(profile, [FoodLogEntry(name=last.name, grams=last.grams, calories=last.calories)])
+            notice = f"{last.name} {last.grams:.0f} г — {last.calories:.0f} ккал"
+        elif action == "refresh":
+            self.storage.recalc_goals(profile)
+            notice = "Обновлено"
+        else:
+            await query.answer()
+            return
+        await query.answer(notice)
+        try:
+            await query.edit_message_text(format_progress(profile), reply_markup=self.quick_keyboard(profile))
+        except BadRequest as exc:
+            # «Обновить» без изменений — Telegram отвечает «message is not modified»
+            if "not modified" not in str(exc).lower():
+                raise
 
     async def plot_progress(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        if self.require_no_profile(update, context):
+        if await self.require_no_profile(update, context):
             return
-        profile = self.ensure_profile(update)
-        temperature = self.weather.fetch_temperature(profile.city)
+        profile = await self.ensure_profile(update)
+        temperature = await asyncio.to_thread(self.weather.fetch_temperature, profile.city, profile.city_id)
         if temperature is not None:
             profile.temperature = temperature
         self.storage.recalc_goals(profile)
-        img = self.plotter.build_plot(profile)
+        img = await asyncio.to_thread(self.plotter.build_plot, profile)
         message = update.effective_message
         if not message:
             return
@@ -468,115 +836,168 @@ class BotHandlers:
             reply_markup=self.main_keyboard(),
         )
 
-    #Регистрация хэндлеров
-    def register(self, app: Application) -> None:
-        profile_conv = ConversationHandler(
-            entry_points=[
-                CommandHandler("set_profile", self.set_profile_start),
-                MessageHandler(filters.TEXT & filters.Regex(f"^{self.BUTTON_PATTERNS['profile']}$"), self.set_profile_start),
-            ],
-            states={
-                ProfileState.WEIGHT: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND & ~self.button_filter, self.set_weight),
-                    CommandHandler("check_progress", self.check_progress),
-                ],
-                ProfileState.HEIGHT: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND & ~self.button_filter, self.set_height),
-                    CommandHandler("check_progress", self.check_progress),
-                ],
-                ProfileState.AGE: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND & ~self.button_filter, self.set_age),
-                    CommandHandler("check_progress", self.check_progress),
-                ],
-                ProfileState.ACTIVITY: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND & ~self.button_filter, self.set_activity),
-                    CommandHandler("check_progress", self.check_progress),
-                ],
-                ProfileState.CITY: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND & ~self.button_filter, self.set_city),
-                    CommandHandler("check_progress", self.check_progress),
-                ],
-                ProfileState.GENDER: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND & ~self.button_filter, self.set_gender),
-                    CommandHandler("check_progress", self.check_progress),
-                ],
-                ProfileState.CUSTOM_CALORIES: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND & ~self.button_filter, self.finish_profile),
-                    CommandHandler("check_progress", self.check_progress),
-                ],
-            },
-            fallbacks=[CommandHandler("cancel", self.cancel)],
-            allow_reentry=True,
-        )
+    #История
+    async def history(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if await self.require_no_profile(update, context):
+            return
+        days = self.parse_float(context.args[0]) if context.args else 7
+        if days is None or not 1 <= days <= 366:
+            await update.message.reply_text("Укажите число дней от 1 до 366, например: /history 14", reply_markup=self.main_keyboard())
+            return
+        profile = await self.ensure_profile(update)
+        records = recent_days(profile, int(days))
+        await update.message.reply_text(format_history(records, int(days)), reply_markup=self.main_keyboard())
 
-        food_conv = ConversationHandler(
-            entry_points=[
-                CommandHandler("log_food", self.log_food_entry),
-                MessageHandler(filters.TEXT & filters.Regex(f"^{self.BUTTON_PATTERNS['food']}$"), self.log_food_entry),
-            ],
-            states={
-                FoodState.NAME: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND & ~self.button_filter, self.food_name_handler),
-                    CommandHandler("check_progress", self.check_progress),
-                    MessageHandler(filters.COMMAND, self.cancel),
-                ],
-                FoodState.GRAMS: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND & ~self.button_filter, self.food_grams_handler),
-                    CommandHandler("check_progress", self.check_progress),
-                    MessageHandler(filters.COMMAND, self.cancel),
-                ],
-            },
-            fallbacks=[CommandHandler("cancel", self.cancel)],
-            allow_reentry=True,
-        )
+    async def history_chart(self, update: Update, days: int, title: str) -> None:
+        profile = await self.ensure_profile(update)
+        img = await asyncio.to_thread(self.plotter.build_history_plot, recent_days(profile, days), title)
+        await update.message.reply_photo(photo=img, caption=title, reply_markup=self.main_keyboard())
 
-        water_conv = ConversationHandler(
-            entry_points=[
-                CommandHandler("log_water", self.log_water_entry),
-                MessageHandler(filters.TEXT & filters.Regex(f"^{self.BUTTON_PATTERNS['water']}$"), self.log_water_entry),
-            ],
-            states={
-                WaterState.AMOUNT: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND & ~self.button_filter, self.log_water_amount),
-                    CommandHandler("check_progress", self.check_progress),
-                    MessageHandler(filters.COMMAND, self.cancel),
-                ],
-            },
-            fallbacks=[CommandHandler("cancel", self.cancel)],
-            allow_reentry=True,
-        )
+    async def week_chart(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if await self.require_no_profile(update, context):
+            return
+        await self.history_chart(update, 7, "Последние 7 дней")
 
-        workout_conv = ConversationHandler(
-            entry_points=[
-                CommandHandler("log_workout", self.log_workout_entry),
-                MessageHandler(filters.TEXT & filters.Regex(f"^{self.BUTTON_PATTERNS['workout']}$"), self.log_workout_entry),
-            ],
-            states={
-                WorkoutState.TYPE: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND & ~self.button_filter, self.log_workout_type),
-                    CommandHandler("check_progress", self.check_progress),
-                    MessageHandler(filters.COMMAND, self.cancel),
-                ],
-                WorkoutState.MINUTES: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND & ~self.button_filter, self.log_workout_minutes),
-                    CommandHandler("check_progress", self.check_progress),
-                    MessageHandler(filters.COMMAND, self.cancel),
-                ],
-            },
-            fallbacks=[CommandHandler("cancel", self.cancel)],
-            allow_reentry=True,
+    async def month_chart(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if await self.require_no_profile(update, context):
+            return
+        await self.history_chart(update, 30, "Последние 30 дней")
+
+    #Групповые челленджи
+    @staticmethod
+    async def require_group(update: Update) -> bool:
+        if update.effective_chat.type in {"group", "supergroup"}:
+            return True
+        await update.message.reply_text("Челленджи работают в групповых чатах: добавьте бота в группу.")
+        return False
+
+    async def challenge(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if not await self.require_group(update):
+            return
+        chat_id = update.effective_chat.id
+        options = {self.CHALLENGE_ALIASES.get(arg.lower()) for arg in context.args or []}
+        metric = next((m for m in METRICS if m in options), None)
+        if metric is None:
+            current = self.challenges.get(chat_id)
+            text = (
+                f"Сейчас идет челлендж: {METRICS[current.metric]}, период — {PERIODS[current.period]}. "
+                if current else "Челленджа в этом чате пока нет. "
+            )
+            await update.message.reply_text(
+                text + "Начать новый: /challenge вода день или /challenge активность неделя. "
+                "Присоединиться — /join, рейтинг — /leaderboard."
+            )
+            return
+        period = "week" if "week" in options else "day"
+        self.challenges.start(chat_id, metric, period)
+        await update.message.reply_text(
+            f"Челлендж начат: {METRICS[metric]}, период — {PERIODS[period]}. "
+            "Присоединяйтесь через /join, записи воды и тренировок в личке с ботом идут в зачет."
         )
 
-        app.add_handler(CommandHandler("start", self.start))
-        app.add_handler(CommandHandler("help", self.help))
-        app.add_handler(profile_conv)
-        app.add_handler(food_conv)
-        app.add_handler(water_conv)
-        app.add_handler(workout_conv)
-        app.add_handler(CommandHandler("check_progress", self.check_progress))
-        app.add_handler(CommandHandler("plot_progress", self.plot_progress))
-        app.add_handler(CommandHandler("cancel", self.cancel))
-
-        #Поддержка кнопок (текст без слэша) для простых команд
-        app.add_handler(MessageHandler(filters.TEXT & filters.Regex(f"^{self.BUTTON_PATTERNS['progress']}$"), self.check_progress))
-        app.add_handler(MessageHandler(filters.TEXT & filters.Regex(f"^{self.BUTTON_PATTERNS['plots']}$"), self.plot_progress))
+    async def join_challenge(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if not await self.require_group(update):
+            return
+        user = update.effective_user
+        if not self.challenges.join(update.effective_chat.id, user.id, user.full_name):
+            await update.message.reply_text("Сначала начните челлендж: /challenge вода день.")
+            return
+        await self.ensure_profile(update)
+        await update.message.reply_text(f"{user.full_name} в игре! Рейтинг — /leaderboard.")
+
+    async def leave_challenge(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if not await self.require_group(update):
+            return
+        left = self.challenges.leave(update.effective_chat.id, update.effective_user.id)
+        await update.message.reply_text("Вы вышли из челленджа." if left else "Вы не участвуете в челлендже этого чата.")
+
+    async def leaderboard(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if not await self.require_group(update):
+            return
+        challenge = self.challenges.get(update.effective_chat.id)
+        if challenge is None:
+            await update.message.reply_text("Челленджа в этом чате пока нет: /challenge вода день.")
+            return
+        top, rank, score = self.challenges.standings(challenge.chat_id, update.effective_user.id)
+        await update.message.reply_text(format_leaderboard(challenge, top, rank, score, len(challenge.board)))
+
+    #Администрирование
+    async def admin_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if update.effective_user.id not in self.admin_ids:
+            await update.message.reply_text("Команда доступна только администраторам.", reply_markup=self.main_keyboard())
+            return
+        text = format_stats(self.stats.summary(), self.storage.tier_stats(), self.ingress.snapshot(), self.resilience.snapshot())
+        await update.message.reply_text(text, reply_markup=self.main_keyboard())
+
+    #Регистрация хэндлеров
+    def build_router(self) -> Router:
+        router = Router(on_dialog=self.stats.dialog_changed)
+        router.command("start", self.start)
+        router.command("help", self.help)
+        router.command("cancel", self.cancel)
+        router.command("check_progress", self.check_progress)
+        router.command("plot_progress", self.plot_progress)
+        router.command("reminders", self.toggle_reminders)
+        router.command("timezone", self.set_timezone)
+        router.command("history", self.history)
+        router.command("week", self.week_chart)
+        router.command("month", self.month_chart)
+        router.command("stats", self.admin_stats)
+        router.command("challenge", self.challenge)
+        router.command("join", self.join_challenge)
+        router.command("leave", self.leave_challenge)
+        router.command("leaderboard", self.leaderboard)
+
+        entries = {
+            "set_profile": ("profile", self.set_profile_start),
+            "log_food": ("food", self.log_food_entry),
+            "log_meal": (None, self.log_meal_entry),
+            "log_barcode": (None, self.log_barcode_entry),
+            "log_water": ("water", self.log_water_entry),
+            "log_workout": ("workout", self.log_workout_entry),
+        }
+        for command, (button, callback) in entries.items():
+            router.command(command, callback)
+            if button:
+                router.add(self.BUTTONS[button], callback)
+        router.add(self.BUTTONS["progress"], self.check_progress)
+        router.add(self.BUTTONS["plots"], self.plot_progress)
+
+        steps = {
+            ProfileState.WEIGHT: self.set_weight,
+            ProfileState.HEIGHT: self.set_height,
+            ProfileState.AGE: self.set_age,
+            ProfileState.ACTIVITY: self.set_activity,
+            ProfileState.CITY: self.set_city,
+            ProfileState.GENDER: self.set_gender,
+            ProfileState.CUSTOM_CALORIES: self.finish_profile,
+            FoodState.NAME: self.food_name_handler,
+            FoodState.GRAMS: self.food_grams_handler,
+            FoodState.MEAL: self.meal_confirm_handler,
+            WaterState.AMOUNT: self.log_water_amount,
+            WorkoutState.TYPE: self.log_workout_type,
+            WorkoutState.MINUTES: self.log_workout_minutes,
+        }
+        for state, callback in steps.items():
+            router.add(ANY_TEXT, callback, state=state)
+        router.add(ANY_PHOTO, self.food_photo_handler, state=FoodState.NAME)
+
+        # В диалогах еды/воды/тренировки прочие команды прерывают диалог
+        dialogs = {
+            "log_food": (FoodState.NAME, FoodState.GRAMS, FoodState.MEAL),
+            "log_meal": (FoodState.NAME, FoodState.GRAMS, FoodState.MEAL),
+            "log_barcode": (FoodState.NAME, FoodState.GRAMS, FoodState.MEAL),
+            "log_water": (WaterState.AMOUNT,),
+            "log_workout": (WorkoutState.TYPE, WorkoutState.MINUTES),
+        }
+        for command, states in dialogs.items():
+            for state in states:
+                router.add(ANY_COMMAND, self.cancel, state=state)
+                router.command("check_progress", self.check_progress, state=state)
+                router.command("cancel", self.cancel, state=state)
+                router.command(command, entries[command][1], state=state)
+        return router
+
+    def register(self, app: Application) -> None:
+        app.add_handler(MessageHandler(ROUTED_MESSAGES, self.ingress.dispatch))
+        app.add_handler(CallbackQueryHandler(self.ingress.wrap(self.quick_log), pattern=f"^{QUICK_PREFIX}"))
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import time
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Dict, Iterable, Optional, Set, Tuple
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from app.bot.router import Callback, Router
+
+
+class Overloaded(Exception):
+    pass
+
+
+class Backpressure:
+    #Ограничение на дорогие хэндлеры: max_active выполняются, не больше max_waiting ждут, остальные отбрасываются.
+
+    def __init__(self, max_active: int = 2, max_waiting: int = 16) -> None:
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_active)
+
+    async def __aenter__(self) -> None:
+        if self._semaphore.locked() and self.waiting >= self.max_waiting:
+            raise Overloaded()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._semaphore.release()
+
+
+class Ingress:
+    #Входная стадия перед роутером: порядок апдейтов внутри чата, склейка повторных запросов чтения, сброс нагрузки.
+
+    def __init__(
+        self,
+        router: Router,
+        read_only: Iterable[Callback],
+        expensive: Iterable[Callback],
+        window: float = 2.0,
+        max_active: int = 2,
+        max_waiting: int = 16,
+        pin: Optional[Callable[[int], ContextManager]] = None,
+    ) -> None:
+        self.router = router
+        # pin(user_id) держит профиль автора в горячем уровне, пока его апдейт ждет и выполняется
+        self.pin = pin
+        self.read_only: Set[Callback] = set(read_only)
+        self.expensive: Set[Callback] = set(expensive)
+        self.window = window
+        self.backpressure = Backpressure(max_active=max_active, max_waiting=max_waiting)
+        self.merged = 0
+        self.dropped = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+        # (чат, пользователь, текст) -> время ответа на запрос чтения
+        self._recent: Dict[Tuple[int, int, str], float] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._queued: Dict[int, int] = {}
+
+    def _resolve(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> Optional[Callback]:
+        message = update.effective_message
+        if not message or not message.text:
+            return None
+        callback, _ = self.router.resolve(Router.get_state(update, context), message.text, context.bot.username)
+        return callback
+
+    def _pinned(self, update: Update) -> ContextManager:
+        user = update.effective_user
+        return self.pin(user.id) if self.pin is not None and user is not None else nullcontext()
+
+    def _is_duplicate(self, key: Tuple[int, int, str], now: float) -> bool:
+        answered = self._recent.get(key)
+        if answered is None:
+            return False
+        if now - answered < self.window:
+            return True
+        del self._recent[key]
+        return False
+
+    def _prune(self, now: float) -> None:
+        if len(self._recent) > 10000:
+            self._recent = {key: answered for key, answered in self._recent.items() if now - answered < self.window}
+
+    async def serialized(self, chat_id: int, coro) -> None:
+        #Апдейты одного чата выполняются по очереди, разных чатов — параллельно.
+        lock = self._locks.get(chat_id)
+        if lock is None:
+            lock = self._locks[chat_id] = asyncio.Lock()
+        self._queued[chat_id] = self._queued.get(chat_id, 0) + 1
+        try:
+            async with lock:
+                await coro
+        finally:
+            self._queued[chat_id] -= 1
+            if not self._queued[chat_id]:
+                del self._queued[chat_id]
+                del self._locks[chat_id]
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        with self._pinned(update):
+            await self._dispatch(update, context)
+
+    async def _dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        chat = update.effective_chat
+        if chat is None:
+            await self.router.dispatch(update, context)
+            return
+        await self.serialized(chat.id, self._handle(update, context))
+
+    async def _handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        # Хэндлер определяется под блокировкой чата: апдейт перед этим в очереди мог сменить состояние диалога,
+        # и склейка и ограничение нагрузки должны решаться по тому хэндлеру, который действительно выполнится
+        callback = self._resolve(update, context)
+        if callback not in self.read_only:
+            await self._run(update, context, callback)
+            return
+        now = time.monotonic()
+        # Склеиваются только повторы одного и того же сообщения одного пользователя:
+        # /history 30 после /history 7 и тот же запрос соседа по группе — разные запросы
+        user = update.effective_user
+        key = (update.effective_chat.id, user.id if user else 0, update.effective_message.text)
+        if self._is_duplicate(key, now):
+            # Тот же запрос отвечен, пока этот ждал очереди, или только что — ответ на него и есть ответ на этот
+            self.merged += 1
+            return
+        self._prune(now)
+        try:
+            await self._run(update, context, callback)
+        finally:
+            self._recent[key] = time.monotonic()
+
+    async def _run(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback: Optional[Callback]) -> None:
+        if callback not in self.expensive:
+            await self.router.dispatch(update, context)
+            return
+        try:
+            async with self.backpressure:
+                await self.router.dispatch(update, context)
+        except Overloaded:
+            self.dropped += 1
+            self.logger.debug("Shedding %s: %d requests already waiting", callback.__name__, self.backpressure.waiting)
+            await update.effective_message.reply_text("Сейчас много запросов, попробуйте через минуту.")
+
+    def wrap(self, callback: Callback) -> Callback:
+        #Для хэндлеров вне роутера (callback-кнопки): только порядок внутри чата.
+        async def handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+            chat = update.effective_chat
+            with self._pinned(update):
+                if chat is None:
+                    await callback(update, context)
+                else:
+                    await self.serialized(chat.id, callback(update, context))
+
+        return handler
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "merged": self.merged,
+            "dropped": self.dropped,
+            "waiting": self.backpressure.waiting,
+            "chats": len(self._locks),
+        }
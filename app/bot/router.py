@@ -0,0 +1,89 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import ContextTypes, ConversationHandler
+
+Callback = Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[Optional[int]]]
+DialogHook = Callable[[int, bool], None]
+
+# Ключи-заглушки для «любой текст», «любая команда» и «фото» внутри состояния
+ANY_TEXT = "<text>"
+ANY_COMMAND = "<command>"
+ANY_PHOTO = "<photo>"
+
+
+class Router:
+    #Единая точка входа для сообщений: поиск хэндлера по (состояние, текст).
+
+    # В user_data лежит {chat_id: состояние}: диалог в личке не перехватывает сообщения того же пользователя в группе
+    STATE_KEY = "state"
+
+    def __init__(self, on_dialog: Optional[DialogHook] = None) -> None:
+        self.routes: Dict[Tuple[Optional[int], str], Callback] = {}
+        # Вызывается при входе в диалог и выходе из него: (user_id, в диалоге ли)
+        self.on_dialog = on_dialog
+
+    @classmethod
+    def get_state(cls, update: Update, context: ContextTypes.DEFAULT_TYPE) -> Optional[int]:
+        states = context.user_data.get(cls.STATE_KEY)
+        chat = update.effective_chat
+        return states.get(chat.id if chat else None) if states else None
+
+    @classmethod
+    def set_state(cls, update: Update, context: ContextTypes.DEFAULT_TYPE, state: int) -> None:
+        chat = update.effective_chat
+        chat_id = chat.id if chat else None
+        states = context.user_data.setdefault(cls.STATE_KEY, {})
+        if state == ConversationHandler.END:
+            states.pop(chat_id, None)
+            if not states:
+                del context.user_data[cls.STATE_KEY]
+        else:
+            states[chat_id] = state
+
+    def add(self, key: str, callback: Callback, state: Optional[int] = None) -> None:
+        self.routes[(state, key)] = callback
+
+    def command(self, name: str, callback: Callback, state: Optional[int] = None) -> None:
+        self.add(f"/{name}", callback, state)
+
+    def resolve(
+        self, state: Optional[int], text: str, bot_username: Optional[str] = None
+    ) -> Tuple[Optional[Callback], Optional[List[str]]]:
+        #Команда: (состояние, /cmd) -> (состояние, любая команда) -> (глобально, /cmd).
+        #Текст/кнопка: (состояние, текст) -> (глобально, текст) -> (состояние, любой текст).
+        routes = self.routes
+        if text.startswith("/"):
+            head, *args = text.split()
+            key, _, addressee = head.partition("@")
+            # /cmd@ДругойБот в группе адресована не нам — как в CommandHandler
+            if addressee and bot_username and addressee.lower() != bot_username.lower():
+                return None, None
+            key = key.lower()
+            callback = routes.get((state, key)) or routes.get((state, ANY_COMMAND)) or routes.get((None, key))
+            return callback, args
+        callback = routes.get((state, text)) or routes.get((None, text)) or routes.get((state, ANY_TEXT))
+        return callback, None
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        message = update.effective_message
+        if not message:
+            return
+        state = self.get_state(update, context)
+        if message.text:
+            callback, args = self.resolve(state, message.text, context.bot.username)
+        elif message.photo:
+            callback, args = self.routes.get((state, ANY_PHOTO)), None
+        else:
+            return
+        if callback is None:
+            return
+        context.args = args
+        new_state = await callback(update, context)
+        # None — хэндлер не трогает диалог, END — диалог завершен
+        if new_state is None:
+            return
+        self.set_state(update, context, new_state)
+        in_dialog = new_state != ConversationHandler.END
+        if self.on_dialog and (state is not None) != in_dialog and update.effective_user:
+            self.on_dialog(update.effective_user.id, in_dialog)
@@ -14,6 +14,7 @@ class ProfileState(IntEnum):
 class FoodState(IntEnum):
     NAME = 7
     GRAMS = 8
+    MEAL = 12
 
 
 class WaterState(IntEnum):
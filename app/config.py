@@ -1,6 +1,6 @@
 import os
 from dataclasses import dataclass
-from typing import Optional
+from typing import FrozenSet, Optional
 
 
 @dataclass
@@ -10,6 +10,14 @@ class Config:
     webhook_url: Optional[str] = None
     webhook_port: Optional[int] = None
     webhook_path: str = "/webhook"
+    snapshot_path: Optional[str] = None
+    snapshot_interval: int = 300
+    rollover_sweep: bool = False
+    admin_ids: FrozenSet[int] = frozenset()
+    cold_path: Optional[str] = None
+    max_hot_profiles: int = 50000
+    concurrent_updates: int = 64
+    shared_totals_db: Optional[str] = None
 
     @staticmethod
     def from_env() -> "Config":
@@ -20,10 +28,22 @@ class Config:
         webhook_port = os.getenv("WEBHOOK_PORT")
         webhook_path = os.getenv("WEBHOOK_PATH", "/webhook")
         webhook_port_int = int(webhook_port) if webhook_port else None
+        snapshot_interval = os.getenv("SNAPSHOT_INTERVAL")
+        max_hot_profiles = os.getenv("MAX_HOT_PROFILES")
+        concurrent_updates = os.getenv("CONCURRENT_UPDATES")
+        admin_ids = frozenset(int(item) for item in os.getenv("ADMIN_IDS", "").replace(" ", "").split(",") if item)
         return Config(
             bot_token=token,
             openweather_api_key=os.getenv("OPENWEATHER_API_KEY"),
             webhook_url=webhook_url,
             webhook_port=webhook_port_int,
             webhook_path=webhook_path,
+            snapshot_path=os.getenv("SNAPSHOT_PATH"),
+            snapshot_interval=int(snapshot_interval) if snapshot_interval else 300,
+            rollover_sweep=os.getenv("ROLLOVER_SWEEP", "").lower() in {"1", "true", "yes"},
+            admin_ids=admin_ids,
+            cold_path=os.getenv("COLD_PATH"),
+            max_hot_profiles=int(max_hot_profiles) if max_hot_profiles else 50000,
+            concurrent_updates=int(concurrent_updates) if concurrent_updates else 64,
+            shared_totals_db=os.getenv("SHARED_TOTALS_DB"),
         )
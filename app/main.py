@@ -8,18 +8,82 @@ from telegram.ext import Application
 
 from app.bot.handlers import BotHandlers
 from app.config import Config
+from app.services.activities import default_catalog
+from app.services.challenges import ChallengeRegistry
+from app.services.coldstore import ColdStore
+from app.services.counters import LocalCounters, SqliteCounters
 from app.services.food import FoodClient
 from app.services.plotter import ProgressPlotter
+from app.services.reminders import HydrationReminders
+from app.services.resilience import Resilience
+from app.services.rollover import RolloverSweeper
+from app.services.snapshot import Snapshotter, SnapshotFile
+from app.services.stats import GlobalStats
 from app.services.storage import InMemoryStorage
 from app.services.weather import WeatherClient
 
 
 def build_application(config: Config) -> Application:
-    storage = InMemoryStorage()
-    weather = WeatherClient(api_key=config.openweather_api_key)
-    food = FoodClient()
+    cold = ColdStore(config.cold_path) if config.cold_path else None
+    # Общий файл дневных итогов: несколько процессов видят одни и те же суммы воды и калорий;
+    # журналы, настройки и история остаются в памяти каждого процесса
+    counters = SqliteCounters(config.shared_totals_db) if config.shared_totals_db else LocalCounters()
+    storage = InMemoryStorage(cold=cold, max_hot=config.max_hot_profiles, counters=counters)
+    reminders = HydrationReminders(storage=storage)
+    snapshotter = None
+    base = None
+    if config.snapshot_path:
+        # Профили из снимка поднимаются лениво, старт не зависит от числа пользователей
+        base = SnapshotFile.open_if_exists(config.snapshot_path)
+        storage.loader = base.load if base else None
+        snapshotter = Snapshotter(
+            storage,
+            config.snapshot_path,
+            base=base,
+            interval=config.snapshot_interval,
+            reminder_due=reminders.wheel.due,
+        )
+    resilience = Resilience()
+    weather = WeatherClient(api_key=config.openweather_api_key, resilience=resilience)
+    food = FoodClient(resilience=resilience)
     plotter = ProgressPlotter()
-    handlers = BotHandlers(storage=storage, weather=weather, food=food, plotter=plotter)
+    sweeper = RolloverSweeper(storage) if config.rollover_sweep else None
+    # Каталог активностей грузится один раз при старте, дальше — только поиск по индексу
+    activities = default_catalog()
+    handlers = BotHandlers(
+        storage=storage,
+        weather=weather,
+        food=food,
+        plotter=plotter,
+        reminders=reminders,
+        activities=activities,
+        stats=GlobalStats(),
+        challenges=ChallengeRegistry(),
+        admin_ids=config.admin_ids,
+        resilience=resilience,
+    )
+
+    # Фоновые задачи живут вместе с приложением
+    async def on_startup(app: Application) -> None:
+        # Профили из снимка поднимаются лениво — напоминания для них ставятся по срокам из индекса снимка,
+        # профили не декодируются. Сроки берем сразу: следующий снимок закроет этот файл
+        restored = list(base.reminder_due()) if base else None
+        await reminders.start(app.bot, restored)
+        if snapshotter:
+            await snapshotter.start()
+        if sweeper:
+            await sweeper.start()
+
+    async def on_shutdown(app: Application) -> None:
+        await reminders.stop()
+        if sweeper:
+            await sweeper.stop()
+        if snapshotter:
+            await snapshotter.stop()
+        resilience.executor.shutdown(wait=False)
+        if cold:
+            cold.close()
+        counters.close()
 
     application = (
         Application.builder()
@@ -32,6 +96,10 @@ def build_application(config: Config) -> Application:
         .get_updates_read_timeout(60)
         .get_updates_write_timeout(60)
         .get_updates_pool_timeout(20)
+        # Параллельно обрабатываются разные чаты; порядок внутри чата держит Ingress
+        .concurrent_updates(config.concurrent_updates)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
         .build()
     )
     # Ошибки сети не должны валить приложение
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import datetime as dt
+from array import array
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 
 @dataclass
@@ -22,6 +24,95 @@ class WorkoutLogEntry:
     timestamp: dt.datetime = field(default_factory=dt.datetime.now)
 
 
+@dataclass
+class DailyRecord:
+    day: dt.date
+    water: float
+    water_goal: float
+    calories_in: float
+    calories_out: float
+    calorie_goal: float
+    top_foods: str
+
+
+@dataclass
+class DailyHistory:
+    #Архив завершенных дней по колонкам, по возрастанию дня; обычно дни только дописываются в конец.
+    days: array = field(default_factory=lambda: array("l"))  # номер дня (date.toordinal)
+    water: array = field(default_factory=lambda: array("f"))
+    water_goal: array = field(default_factory=lambda: array("f"))
+    calories_in: array = field(default_factory=lambda: array("f"))
+    calories_out: array = field(default_factory=lambda: array("f"))
+    calorie_goal: array = field(default_factory=lambda: array("f"))
+    top_foods: List[str] = field(default_factory=list)
+
+    COLUMNS = ("days", "water", "water_goal", "calories_in", "calories_out", "calorie_goal")
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def append(self, record: DailyRecord) -> None:
+        day = record.day.toordinal()
+        if self.days and day <= self.days[-1]:
+            # Часовой пояс сдвинули назад — тот же местный день архивируется второй раз: не теряем его
+            self._merge(record, day)
+            return
+        self.days.append(day)
+        self.water.append(record.water)
+        self.water_goal.append(record.water_goal)
+        self.calories_in.append(record.calories_in)
+        self.calories_out.append(record.calories_out)
+        self.calorie_goal.append(record.calorie_goal)
+        self.top_foods.append(record.top_foods)
+
+    def _merge(self, record: DailyRecord, day: int) -> None:
+        #Итоги складываются с уже сохраненным днем, цели берутся последние; дня еще нет — вставляем по порядку.
+        position = bisect_left(self.days, day)
+        if position == len(self.days) or self.days[position] != day:
+            for name, value in zip(self.COLUMNS, (day, record.water, record.water_goal, record.calories_in,
+                                                  record.calories_out, record.calorie_goal)):
+                getattr(self, name).insert(position, value)
+            self.top_foods.insert(position, record.top_foods)
+            return
+        self.water[position] += record.water
+        self.calories_in[position] += record.calories_in
+        self.calories_out[position] += record.calories_out
+        self.water_goal[position] = record.water_goal
+        self.calorie_goal[position] = record.calorie_goal
+        names = [name for text in (self.top_foods[position], record.top_foods) for name in text.split(", ") if name]
+        self.top_foods[position] = ", ".join(list(dict.fromkeys(names))[:3])
+
+    def range(self, start: dt.date, end: dt.date) -> List[DailyRecord]:
+        #Бинарный поиск границ и срез колонок — время зависит только от числа дней в ответе.
+        lo = bisect_left(self.days, start.toordinal())
+        hi = bisect_right(self.days, end.toordinal())
+        return [
+            DailyRecord(
+                day=dt.date.fromordinal(self.days[i]),
+                water=self.water[i],
+                water_goal=self.water_goal[i],
+                calories_in=self.calories_in[i],
+                calories_out=self.calories_out[i],
+                calorie_goal=self.calorie_goal[i],
+                top_foods=self.top_foods[i],
+            )
+            for i in range(lo, hi)
+        ]
+
+    def to_record(self) -> Dict[str, Any]:
+        record: Dict[str, Any] = {name: getattr(self, name).tobytes() for name in self.COLUMNS}
+        record["top_foods"] = list(self.top_foods)
+        return record
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "DailyHistory":
+        history = cls()
+        for name in cls.COLUMNS:
+            getattr(history, name).frombytes(record[name])
+        history.top_foods = list(record["top_foods"])
+        return history
+
+
 @dataclass
 class UserProfile:
     user_id: int
@@ -30,9 +121,12 @@ class UserProfile:
     age: int = 30
     activity: float = 30.0  # минут в день
     city: str = "Moscow"
+    city_id: str = "moscow"
+    timezone: str = "Europe/Moscow"
     gender: str = "unspecified"
     calorie_goal_manual: Optional[float] = None
     temperature: Optional[float] = None
+    reminders_enabled: bool = True
 
     water_goal: int = 2100
     calorie_goal: int = 2000
@@ -43,5 +137,7 @@ class UserProfile:
     burned_calories: float = 0.0
     food_log: List[FoodLogEntry] = field(default_factory=list)
     workout_log: List[WorkoutLogEntry] = field(default_factory=list)
+    history: DailyHistory = field(default_factory=DailyHistory)
 
     last_reset: dt.datetime = field(default_factory=dt.datetime.now)
+    next_reset: float = 0.0  # эпоха следующей местной полуночи
@@ -0,0 +1,116 @@
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_MET = 6.0
+# Короче этого нечеткий поиск не включаем: «бе» не должно становиться бегом
+MIN_FUZZY_LENGTH = 4
+CATALOG_PATH = Path(__file__).resolve().parent.parent / "data" / "activities.tsv"
+
+_NON_WORD_RE = re.compile(r"[^\w\s./-]+")
+
+
+@dataclass(frozen=True)
+class Activity:
+    name: str
+    met: float
+
+
+def normalize(text: str) -> str:
+    text = _NON_WORD_RE.sub(" ", text.lower().replace("ё", "е"))
+    return " ".join(text.split())
+
+
+def trigrams(text: str) -> List[str]:
+    padded = f"  {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class ActivityCatalog:
+    #Каталог активностей: точный поиск по синонимам и нечеткий по индексу триграмм.
+
+    def __init__(self, activities: List[Tuple[Activity, List[str]]], min_similarity: float = 0.6) -> None:
+        self.min_similarity = min_similarity
+        self.exact: Dict[str, Activity] = {}
+        self.keys: List[str] = []
+        self.values: List[Activity] = []
+        self.gram_counts: List[int] = []
+        self.multiword: List[bool] = []
+        self.index: Dict[str, List[int]] = defaultdict(list)
+        for activity, synonyms in activities:
+            for synonym in [activity.name, *synonyms]:
+                key = normalize(synonym)
+                if not key or key in self.exact:
+                    continue
+                self.exact[key] = activity
+                position = len(self.keys)
+                self.keys.append(key)
+                self.values.append(activity)
+                grams = set(trigrams(key))
+                self.gram_counts.append(len(grams))
+                self.multiword.append(" " in key)
+                for gram in grams:
+                    self.index[gram].append(position)
+        self.index = dict(self.index)
+
+    def __len__(self) -> int:
+        return len({activity.name for activity in self.values})
+
+    def match(self, raw: str) -> Optional[Activity]:
+        #Точное совпадение, иначе ближайший синоним по коэффициенту Дайса на триграммах.
+        query = normalize(raw)
+        if not query:
+            return None
+        activity = self.exact.get(query)
+        if activity is not None:
+            return activity
+        if len(query) < MIN_FUZZY_LENGTH:
+            return None
+        # Одно слово не сопоставляем с синонимами из нескольких слов: «тренировка» — не «айкидо тренировка»
+        single_word = " " not in query
+        grams = set(trigrams(query))
+        index = self.index
+        shared = Counter(chain.from_iterable(index.get(gram, ()) for gram in grams))
+        total = len(grams)
+        gram_counts = self.gram_counts
+        best, best_score = None, self.min_similarity
+        for position, count in shared.items():
+            if single_word and self.multiword[position]:
+                continue
+            score = 2 * count / (total + gram_counts[position])
+            if score > best_score or (
+                score == best_score and best is not None
+                and abs(len(self.keys[position]) - len(query)) < abs(len(self.keys[best]) - len(query))
+            ):
+                best, best_score = position, score
+        if best is not None:
+            return self.values[best]
+        # «бег в парке» — пробуем первое слово отдельно
+        first = query.split()[0]
+        return self.exact.get(first) if first != query else None
+
+    def met(self, raw: str) -> float:
+        activity = self.match(raw)
+        return activity.met if activity else DEFAULT_MET
+
+    @classmethod
+    def load(cls, path: Path = CATALOG_PATH) -> "ActivityCatalog":
+        activities: List[Tuple[Activity, List[str]]] = []
+        with open(path, encoding="utf-8") as source:
+            for line in source:
+                line = line.rstrip("\n")
+                if not line or line.startswith("#"):
+                    continue
+                name, met, synonyms = line.split("\t")
+                activities.append((Activity(name=name, met=float(met)), [s for s in synonyms.split("|") if s]))
+        return cls(activities)
+
+
+@lru_cache(maxsize=None)
+def default_catalog() -> ActivityCatalog:
+    #Каталог читается один раз на процесс.
+    return ActivityCatalog.load()
@@ -0,0 +1,48 @@
+import io
+import logging
+from typing import Optional
+
+from PIL import Image
+
+try:
+    from pyzbar.pyzbar import ZBarSymbol, decode
+except ImportError:  # pyzbar требует системную libzbar, без нее работает только ввод кода текстом
+    decode = None
+
+logger = logging.getLogger("Barcode")
+
+BARCODE_LENGTHS = {8, 12, 13, 14}
+
+
+def normalize_barcode(raw: str) -> Optional[str]:
+    #Оставляем цифры и проверяем контрольную цифру EAN/UPC/GTIN.
+    code = "".join(ch for ch in raw if ch.isdigit())
+    if len(code) not in BARCODE_LENGTHS or len(code) != len(raw.strip().replace(" ", "")):
+        return None
+    digits = [int(ch) for ch in code]
+    body, check = digits[:-1], digits[-1]
+    total = sum(d * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(body)))
+    if (10 - total % 10) % 10 != check:
+        return None
+    return code
+
+
+def barcode_decoding_available() -> bool:
+    return decode is not None
+
+
+def decode_barcode(image_bytes: bytes) -> Optional[str]:
+    #Ищем на фото штрихкод EAN/UPC и возвращаем первый валидный.
+    if decode is None:
+        return None
+    try:
+        image = Image.open(io.BytesIO(image_bytes)).convert("L")
+    except OSError as exc:
+        logger.warning("Cannot read photo: %s", exc)
+        return None
+    symbols = [ZBarSymbol.EAN13, ZBarSymbol.EAN8, ZBarSymbol.UPCA]
+    for result in decode(image, symbols=symbols):
+        code = normalize_barcode(result.data.decode("ascii", errors="ignore"))
+        if code:
+            return code
+    return None
@@ -2,6 +2,7 @@ import math
 from typing import Tuple
 
 from app.models import UserProfile
+from app.services.activities import default_catalog
 
 
 def _cap_activity(minutes: float) -> float:
@@ -39,25 +40,8 @@ def calculate_calorie_goal(profile: UserProfile) -> int:
 
 
 def estimate_workout_calories(workout_type: str, minutes: float, weight: float) -> Tuple[float, int]:
-    #Оцениваем калории по MET и добавляем бонус воды за тренировку.
-    workout = workout_type.lower()
-    met_values = {
-        "бег": 9.8,
-        "run": 9.8,
-        "running": 9.8,
-        "ходьба": 3.5,
-        "walk": 3.5,
-        "вело": 7.5,
-        "bike": 7.5,
-        "cycling": 7.5,
-        "йога": 3,
-        "yoga": 3,
-        "силовая": 6,
-        "strength": 6,
-        "swim": 8,
-        "плавание": 8,
-    }
-    met = met_values.get(workout, 6)
+    #Оцениваем калории по MET из каталога активностей и добавляем бонус воды за тренировку.
+    met = default_catalog().met(workout_type)
     calories = 0.0175 * met * weight * minutes
     water_bonus = math.ceil(minutes / 30) * 200 if minutes > 0 else 0
     return calories, water_bonus
@@ -0,0 +1,100 @@
+import datetime as dt
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.services.leaderboard import RankedBoard
+from app.services.timezones import DEFAULT_TIMEZONE, zone
+
+METRICS = {"water": "вода", "activity": "активность"}
+UNITS = {"water": "мл", "activity": "ккал"}
+PERIODS = {"day": "день", "week": "неделя"}
+
+
+@dataclass
+class Challenge:
+    chat_id: int
+    metric: str
+    period: str
+    timezone: str = DEFAULT_TIMEZONE
+    period_start: Optional[dt.date] = None
+    board: RankedBoard = field(default_factory=RankedBoard)
+    names: Dict[int, str] = field(default_factory=dict)
+
+    def current_period(self, now: float) -> dt.date:
+        today = dt.datetime.fromtimestamp(now, zone(self.timezone)).date()
+        if self.period == "week":
+            return today - dt.timedelta(days=today.weekday())
+        return today
+
+    def roll(self, now: Optional[float] = None) -> None:
+        #Новый день/неделя обнуляет очки — один раз за период, лениво при обращении.
+        start = self.current_period(time.time() if now is None else now)
+        if start != self.period_start:
+            self.period_start = start
+            self.board.reset()
+
+
+class ChallengeRegistry:
+    #Челленджи групповых чатов; очки участников обновляются приращениями при каждой записи.
+
+    def __init__(self) -> None:
+        self.challenges: Dict[int, Challenge] = {}
+        # user_id -> чаты, где пользователь участвует: запись трогает только его рейтинги
+        self.memberships: Dict[int, Set[int]] = {}
+
+    def get(self, chat_id: int) -> Optional[Challenge]:
+        challenge = self.challenges.get(chat_id)
+        if challenge is not None:
+            challenge.roll()
+        return challenge
+
+    def start(self, chat_id: int, metric: str, period: str) -> Challenge:
+        #Новый челлендж в чате заменяет старый; участники переходят в него с нулем.
+        old = self.challenges.get(chat_id)
+        challenge = Challenge(chat_id=chat_id, metric=metric, period=period)
+        if old is not None:
+            challenge.names = old.names
+            for user_id in old.names:
+                challenge.board.set(user_id, 0.0)
+        challenge.roll()
+        self.challenges[chat_id] = challenge
+        return challenge
+
+    def join(self, chat_id: int, user_id: int, name: str) -> bool:
+        challenge = self.get(chat_id)
+        if challenge is None:
+            return False
+        challenge.names[user_id] = name
+        if user_id not in challenge.board:
+            challenge.board.set(user_id, 0.0)
+        self.memberships.setdefault(user_id, set()).add(chat_id)
+        return True
+
+    def leave(self, chat_id: int, user_id: int) -> bool:
+        challenge = self.challenges.get(chat_id)
+        if challenge is None or user_id not in challenge.names:
+            return False
+        del challenge.names[user_id]
+        challenge.board.discard(user_id)
+        chats = self.memberships.get(user_id)
+        if chats is not None:
+            chats.discard(chat_id)
+            if not chats:
+                del self.memberships[user_id]
+        return True
+
+    def record(self, user_id: int, metric: str, delta: float) -> None:
+        for chat_id in self.memberships.get(user_id, ()):
+            challenge = self.challenges.get(chat_id)
+            if challenge is None or challenge.metric != metric:
+                continue
+            challenge.roll()
+            challenge.board.add(user_id, delta)
+
+    def standings(self, chat_id: int, user_id: int, n: int = 10) -> Tuple[List[Tuple[str, float]], Optional[int], float]:
+        challenge = self.get(chat_id)
+        if challenge is None:
+            return [], None, 0.0
+        top = [(challenge.names.get(member, str(member)), score) for member, score in challenge.board.top(n)]
+        return top, challenge.board.rank(user_id), challenge.board.scores.get(user_id, 0.0)
@@ -0,0 +1,131 @@
+from bisect import bisect_left
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.services.activities import normalize
+
+CITIES_PATH = Path(__file__).resolve().parent.parent / "data" / "cities.tsv"
+_END = "\uffff"
+
+
+@dataclass(frozen=True)
+class City:
+    id: str
+    name: str
+    latitude: float
+    longitude: float
+    timezone: str
+    population: int
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    #Расстояние Дамерау–Левенштейна с отсечкой: больше limit не считаем.
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            cost = char_a != char_b
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class CityIndex:
+    #Справочник городов: отсортированный массив нормализованных названий и параллельный массив городов.
+
+    def __init__(self, cities: List[Tuple[City, List[str]]]) -> None:
+        self.by_id: Dict[str, City] = {}
+        pairs: Dict[str, City] = {}
+        for city, names in cities:
+            self.by_id[city.id] = city
+            for name in [city.name, *names]:
+                key = normalize(name)
+                # Одинаковые названия у разных городов — оставляем крупнейший
+                if key and (key not in pairs or pairs[key].population < city.population):
+                    pairs[key] = city
+        self.keys: List[str] = sorted(pairs)
+        self.values: List[City] = [pairs[key] for key in self.keys]
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def get(self, city_id: str) -> Optional[City]:
+        return self.by_id.get(city_id)
+
+    def _range(self, prefix: str) -> Tuple[int, int]:
+        return bisect_left(self.keys, prefix), bisect_left(self.keys, prefix + _END)
+
+    def resolve(self, raw: str) -> Optional[City]:
+        #Только надежные совпадения: точное название или синоним, либо начало названия ровно одного города.
+        #Опечатки сюда не попадают — «Орск» не должен молча стать Омском; для них есть suggest.
+        query = normalize(raw)
+        if not query:
+            return None
+        start, end = self._range(query)
+        if start < end and self.keys[start] == query:
+            return self.values[start]
+        if len(query) >= 3 and start < end:
+            cities = {city.id: city for city in self.values[start:end]}
+            if len(cities) == 1:
+                return next(iter(cities.values()))
+        return None
+
+    def suggest(self, raw: str) -> Optional[City]:
+        #Кандидат для вопроса «вы имели в виду?»: крупнейший город с таким началом названия
+        #или ближайший по опечатке в 1–2 буквы. Без подтверждения пользователя не применяется.
+        query = normalize(raw)
+        if not query:
+            return None
+        start, end = self._range(query)
+        if len(query) >= 3 and start < end:
+            return max(self.values[start:end], key=lambda city: city.population)
+        limit = 1 if len(query) <= 5 else 2
+        # Первую букву считаем верной — кандидаты только из ее диапазона
+        start, end = self._range(query[0])
+        best: Optional[Tuple[int, int, City]] = None
+        for position in range(start, end):
+            key = self.keys[position]
+            if abs(len(key) - len(query)) > limit:
+                continue
+            distance = edit_distance(query, key, limit)
+            if distance > limit:
+                continue
+            city = self.values[position]
+            if best is None or (distance, -city.population) < best[:2]:
+                best = (distance, -city.population, city)
+        return best[2] if best else None
+
+    @classmethod
+    def load(cls, path: Path = CITIES_PATH) -> "CityIndex":
+        cities: List[Tuple[City, List[str]]] = []
+        with open(path, encoding="utf-8") as source:
+            for line in source:
+                line = line.rstrip("\n")
+                if not line or line.startswith("#"):
+                    continue
+                city_id, name, latitude, longitude, timezone, population, names = line.split("\t")
+                city = City(
+                    id=city_id,
+                    name=name,
+                    latitude=float(latitude),
+                    longitude=float(longitude),
+                    timezone=timezone,
+                    population=int(population),
+                )
+                cities.append((city, [n for n in names.split(",") if n]))
+        return cls(cities)
+
+
+@lru_cache(maxsize=None)
+def default_cities() -> CityIndex:
+    #Справочник читается один раз на процесс.
+    return CityIndex.load()
@@ -0,0 +1,82 @@
+import os
+from typing import Dict, Optional, Tuple
+
+from app.models import UserProfile
+from app.services.snapshot import decode_profile, encode_profile
+
+
+class ColdStore:
+    #Холодный уровень хранилища: вытесненные профили в файле-журнале, в памяти только индекс.
+
+    def __init__(self, path: str, compact_ratio: float = 2.0, compact_min_bytes: int = 16 * 1024 * 1024) -> None:
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.compact_min_bytes = compact_min_bytes
+        # Файл — продолжение памяти процесса; долговременная копия данных живет в снимке
+        self._file = open(path, "w+b")
+        self.index: Dict[int, Tuple[int, int]] = {}
+        self.size = 0
+        self.live_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self.index
+
+    def raw(self, user_id: int) -> Optional[bytes]:
+        entry = self.index.get(user_id)
+        if entry is None:
+            return None
+        offset, length = entry
+        return os.pread(self._file.fileno(), length, offset)
+
+    def put(self, profile: UserProfile) -> None:
+        self._drop(profile.user_id)
+        data = encode_profile(profile)
+        os.pwrite(self._file.fileno(), data, self.size)
+        self.index[profile.user_id] = (self.size, len(data))
+        self.size += len(data)
+        self.live_bytes += len(data)
+        if self.size > self.compact_min_bytes and self.size > self.live_bytes * self.compact_ratio:
+            self.compact()
+
+    def peek(self, user_id: int) -> Optional[UserProfile]:
+        data = self.raw(user_id)
+        return decode_profile(data) if data is not None else None
+
+    def take(self, user_id: int) -> Optional[UserProfile]:
+        #Профиль возвращается в горячий уровень, запись в файле становится мусором.
+        data = self.raw(user_id)
+        if data is None:
+            return None
+        self._drop(user_id)
+        return decode_profile(data)
+
+    def _drop(self, user_id: int) -> None:
+        entry = self.index.pop(user_id, None)
+        if entry is not None:
+            self.live_bytes -= entry[1]
+
+    def compact(self) -> None:
+        #Переписываем только живые записи; журнал растет не больше чем в compact_ratio раз.
+        tmp_path = f"{self.path}.tmp"
+        index: Dict[int, Tuple[int, int]] = {}
+        offset = 0
+        with open(tmp_path, "wb") as out:
+            for user_id, (old_offset, length) in self.index.items():
+                out.write(os.pread(self._file.fileno(), length, old_offset))
+                index[user_id] = (offset, length)
+                offset += length
+        os.replace(tmp_path, self.path)
+        self._file.close()
+        self._file = open(self.path, "r+b")
+        self.index = index
+        self.size = self.live_bytes = offset
+
+    def close(self) -> None:
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
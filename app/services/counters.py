@@ -0,0 +1,140 @@
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, Tuple
+
+
+@dataclass(frozen=True)
+class DayTotals:
+    water: float = 0.0
+    calories_in: float = 0.0
+    calories_out: float = 0.0
+    water_bonus: int = 0
+
+    def __add__(self, other: "DayTotals") -> "DayTotals":
+        return DayTotals(
+            water=self.water + other.water,
+            calories_in=self.calories_in + other.calories_in,
+            calories_out=self.calories_out + other.calories_out,
+            water_bonus=self.water_bonus + other.water_bonus,
+        )
+
+
+class LocalCounters:
+    #Дневные итоги в памяти процесса: одна запись на пользователя, период — номер местного дня (date.toordinal).
+
+    shared = False
+
+    def __init__(self) -> None:
+        self._rows: Dict[int, Tuple[int, DayTotals]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, user_id: int, period: int, delta: DayTotals, seed: DayTotals) -> DayTotals:
+        #Атомарно прибавляет delta; новая запись периода начинается с seed (итогов, уже известных профилю).
+        with self._lock:
+            row = self._rows.get(user_id)
+            if row is not None and row[0] > period:
+                # Запись более нового дня не затираем итогами старого
+                return seed + delta
+            base = row[1] if row is not None and row[0] == period else seed
+            totals = base + delta
+            self._rows[user_id] = (period, totals)
+            return totals
+
+    def get_days(self, user_id: int, periods: Iterable[int]) -> Dict[int, DayTotals]:
+        row = self._rows.get(user_id)
+        return {row[0]: row[1]} if row is not None and row[0] in set(periods) else {}
+
+    def discard(self, user_id: int) -> None:
+        #Профиль ушел из памяти — его итоги сохранены в нем самом и вернутся как seed.
+        with self._lock:
+            self._rows.pop(user_id, None)
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteCounters:
+    #Дневные итоги в общем файле SQLite: несколько процессов бота на одной машине видят одни и те же суммы.
+    #Общие только четыре суммы дня; журналы еды и тренировок, настройки и история у каждого процесса свои.
+
+    shared = True
+
+    # Запись на пару (пользователь, местный день): процессы с разным мнением о дне пишут в разные записи
+    # и не затирают итоги друг друга
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS user_day_totals (
+            user_id INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            water REAL NOT NULL,
+            calories_in REAL NOT NULL,
+            calories_out REAL NOT NULL,
+            water_bonus INTEGER NOT NULL,
+            PRIMARY KEY (user_id, day)
+        )
+    """
+    # Один оператор: либо новая запись дня (seed + delta), либо приращение существующей
+    _ADD = """
+        INSERT INTO user_day_totals (user_id, day, water, calories_in, calories_out, water_bonus)
+        VALUES (:user_id, :period, :seed_water + :water, :seed_in + :calories_in,
+                :seed_out + :calories_out, :seed_bonus + :water_bonus)
+        ON CONFLICT (user_id, day) DO UPDATE SET
+            water = water + :water,
+            calories_in = calories_in + :calories_in,
+            calories_out = calories_out + :calories_out,
+            water_bonus = water_bonus + :water_bonus
+        RETURNING water, calories_in, calories_out, water_bonus
+    """
+    # Вчерашнюю запись оставляем процессам, которые еще не перешли на новый день. Чистка идет при первой записи
+    # пользователя в новом дне, а не на каждой записи
+    _PRUNE = "DELETE FROM user_day_totals WHERE user_id = :user_id AND day < :period - 1"
+
+    def __init__(self, path: str, timeout: float = 5.0) -> None:
+        self.path = path
+        self._connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(self._SCHEMA)
+        self._lock = threading.Lock()
+        # user_id -> последний день, для которого этот процесс уже удалил старые записи
+        self._pruned: Dict[int, int] = {}
+
+    def add(self, user_id: int, period: int, delta: DayTotals, seed: DayTotals) -> DayTotals:
+        params = {
+            "user_id": user_id,
+            "period": period,
+            "water": delta.water,
+            "calories_in": delta.calories_in,
+            "calories_out": delta.calories_out,
+            "water_bonus": delta.water_bonus,
+            "seed_water": seed.water,
+            "seed_in": seed.calories_in,
+            "seed_out": seed.calories_out,
+            "seed_bonus": seed.water_bonus,
+        }
+        with self._lock:
+            row = self._connection.execute(self._ADD, params).fetchone()
+            if self._pruned.get(user_id, -1) < period:
+                self._connection.execute(self._PRUNE, params)
+                self._pruned[user_id] = period
+        return DayTotals(*row)
+
+    def get_days(self, user_id: int, periods: Iterable[int]) -> Dict[int, DayTotals]:
+        #Итоги нескольких дней пользователя одним запросом: уходящего и нового при смене дня.
+        days = sorted(set(periods))
+        placeholders = ", ".join("?" * len(days))
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT day, water, calories_in, calories_out, water_bonus FROM user_day_totals "
+                f"WHERE user_id = ? AND day IN ({placeholders})",
+                (user_id, *days),
+            ).fetchall()
+        return {day: DayTotals(*totals) for day, *totals in rows}
+
+    def discard(self, user_id: int) -> None:
+        # Общие итоги нужны другим процессам — вытеснение из памяти их не трогает, забываем только отметку чистки
+        with self._lock:
+            self._pruned.pop(user_id, None)
+
+    def close(self) -> None:
+        self._connection.close()
@@ -1,68 +1,151 @@
+import asyncio
 import logging
 import html
-from typing import Any, Dict, Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
 import requests
 
+from app.services.food_ranking import ALTERNATIVE_MIN_SCORE, rank
+from app.services.resilience import Resilience, raise_for_upstream
+
+_FAILED = object()
+
 
 class FoodClient:
     #Клиент OpenFoodFacts для получения калорийности продуктов.
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        resilience: Optional[Resilience] = None,
+        cache_ttl: float = 6 * 3600,
+        barcode_ttl: float = 30 * 24 * 3600,
+        barcode_miss_ttl: float = 15 * 60,
+        alternatives: int = 3,
+        cache_size: int = 10000,
+    ) -> None:
         self.logger = logging.getLogger(self.__class__.__name__)
+        # requests.Session не потокобезопасна, а поиск идет из to_thread и потоков хеджа — своя сессия на поток
+        self._local = threading.local()
+        resilience = resilience or Resilience()
+        self.search_api = resilience.endpoint("openfoodfacts.search", hedge=True)
+        self.product_api = resilience.endpoint("openfoodfacts.product", hedge=True)
+        self.cache_ttl = cache_ttl
+        self.barcode_ttl = barcode_ttl
+        self.barcode_miss_ttl = barcode_miss_ttl
+        self.alternatives = alternatives
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._barcode_cache: "OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _store(self, cache: "OrderedDict[str, Any]", key: str, ttl: float, info: Optional[Dict[str, Any]]) -> None:
+        #Кэши ограничены cache_size записями: вытесняется давно добавленная.
+        with self._lock:
+            cache[key] = (time.monotonic() + ttl, info)
+            cache.move_to_end(key)
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
 
     def get_food_info(self, product_name: str) -> Optional[Dict[str, Any]]:
-        #Ищем продукт в OpenFoodFacts с приоритетом русских названий и лучшего совпадения.
-        
-        try:
-            resp = requests.get(
-                "https://world.openfoodfacts.org/cgi/search.pl",
-                params={
-                    "action": "process",
-                    "search_terms": product_name,
-                    "json": True,
-                    "page_size": 10,
-                    "search_simple": 1,
-                    "fields": "product_name,product_name_ru,nutriments",
-                    "lang": "ru",
-                },
-                timeout=10,
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            products = data.get("products", [])
-            if not products:
-                return None
+        #Найденные продукты кэшируем по нормализованному запросу.
+        key = " ".join(product_name.lower().split())
+        cached = self._cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        info = self._search(product_name)
+        if info:
+            self._store(self._cache, key, self.cache_ttl, info)
+        return info
 
-            query = product_name.lower()
+    async def get_many(self, product_names: List[str], timeout: float) -> Dict[str, Optional[Dict[str, Any]]]:
+        #Ищем несколько продуктов параллельно с общим дедлайном; не успевшие — None.
+        names = list(dict.fromkeys(product_names))
+        tasks = {name: asyncio.ensure_future(asyncio.to_thread(self.get_food_info, name)) for name in names}
+        if tasks:
+            await asyncio.wait(tasks.values(), timeout=timeout)
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        for name, task in tasks.items():
+            if task.done() and not task.cancelled() and task.exception() is None:
+                results[name] = task.result()
+            else:
+                # Поток доработает сам и положит результат в кэш для следующего раза
+                results[name] = None
+        return results
 
-            def pick_name(p: Dict[str, Any]) -> Optional[str]:
-                name = p.get("product_name_ru") or p.get("product_name")
-                return html.unescape(name) if name else None
+    def get_by_barcode(self, barcode: str) -> Optional[Dict[str, Any]]:
+        #Прямой запрос продукта по штрихкоду; карточки по коду почти не меняются — кэшируем надолго.
+        #Промах кэшируем коротко: карточку могут добавить в базу в любой момент.
+        cached = self._barcode_cache.get(barcode)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        info = self.product_api.call(barcode, lambda: self._fetch_barcode(barcode), default=_FAILED)
+        if info is _FAILED:
+            return None
+        self._store(self._barcode_cache, barcode, self.barcode_ttl if info else self.barcode_miss_ttl, info)
+        return info
+
+    def _fetch_barcode(self, barcode: str) -> Optional[Dict[str, Any]]:
+        resp = self.session.get(
+            f"https://world.openfoodfacts.org/api/v2/product/{barcode}.json",
+            params={"fields": "product_name,product_name_ru,nutriments"},
+            timeout=10,
+        )
+        if resp.status_code == 404:
+            return None
+        raise_for_upstream(resp)
+        data = resp.json()
+        product = data.get("product") if data.get("status") == 1 else None
+        name = (product.get("product_name_ru") or product.get("product_name")) if product else None
+        return self._build_product(html.unescape(name), product) if name else None
 
-            def score(p: Dict[str, Any]) -> int:
-                # Ранжируем: точное начало совпадения > вхождение > остальное. Штраф за напитки.
-                name = pick_name(p) or ""
-                name_l = name.lower()
-                s = 0
-                if name_l.startswith(query):
-                    s += 3
-                elif query in name_l:
-                    s += 1
-                tags = p.get("categories_tags", []) or []
-                if any("beverages" in t for t in tags):
-                    s -= 2
-                return s
+    def _search(self, product_name: str) -> Optional[Dict[str, Any]]:
+        key = " ".join(product_name.lower().split())
+        return self.search_api.call(key, lambda: self._fetch_search(product_name))
 
-            products.sort(key=score, reverse=True)
-            best = products[0]
-            best_name = pick_name(best)
-            if not best_name:
-                return None
-            return self._build_product(best_name, best)
-        except requests.RequestException as exc:
-            self.logger.error("Food API request failed: %s", exc)
+    def _fetch_search(self, product_name: str) -> Optional[Dict[str, Any]]:
+        #Ищем продукт в OpenFoodFacts; лучшее совпадение и похожие варианты выбирает food_ranking.
+        resp = self.session.get(
+            "https://world.openfoodfacts.org/cgi/search.pl",
+            params={
+                "action": "process",
+                "search_terms": product_name,
+                "json": True,
+                "page_size": 24,
+                "search_simple": 1,
+                "fields": "product_name,product_name_ru,nutriments,categories_tags",
+                "lang": "ru",
+            },
+            timeout=10,
+        )
+        raise_for_upstream(resp)
+        data = resp.json()
+        ranked = rank(product_name, data.get("products", []), k=1 + self.alternatives)
+        if not ranked:
             return None
+        best, *others = ranked
+        info = self._build_product(best.name, best.product)
+        # Варианты для ответа «возможно, вы имели в виду»: достаточно похожие, с калорийностью, без повторов названия
+        alternatives = []
+        names = {info["name"]}
+        for candidate in others:
+            if candidate.score < ALTERNATIVE_MIN_SCORE or not candidate.has_energy or candidate.name in names:
+                continue
+            alternative = self._build_product(candidate.name, candidate.product)
+            if alternative["calories"] > 0:
+                names.add(alternative["name"])
+                alternatives.append(alternative)
+        info["alternatives"] = alternatives
+        return info
 
     def _build_product(self, name: str, product: Dict[str, Any]) -> Dict[str, Any]:
         calories = product.get("nutriments", {}).get("energy-kcal_100g")
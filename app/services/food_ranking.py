@@ -0,0 +1,185 @@
+import heapq
+import html
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.activities import normalize, trigrams
+
+_CYRILLIC_RE = re.compile(r"[а-яё]")
+
+# Веса слагаемых оценки
+TOKEN_WEIGHT = 0.45
+TRIGRAM_WEIGHT = 0.35
+PREFIX_BONUS = 0.1
+LANGUAGE_BONUS = 0.1
+BEVERAGE_PENALTY = 0.2
+NO_ENERGY_PENALTY = 0.3
+# Слово с опечаткой засчитывается наполовину, если совпадают первые STEM букв
+STEM = 4
+MAX_BONUS = PREFIX_BONUS + LANGUAGE_BONUS
+# Ниже этой оценки кандидат не предлагается как «возможно, вы имели в виду»
+ALTERNATIVE_MIN_SCORE = 0.4
+# На коротких списках (страница поиска — 24 продукта) и при k, сравнимом с n, куча и отсев по верхней
+# оценке не окупаются: проще оценить всех и отсортировать
+SORT_MAX_CANDIDATES = 24
+SORT_MIN_K_FRACTION = 0.25
+
+
+@dataclass(frozen=True)
+class Candidate:
+    name: str
+    score: float
+    russian: bool
+    has_energy: bool
+    product: Dict[str, Any]
+
+
+@dataclass(frozen=True)
+class Query:
+    key: str
+    tokens: Tuple[str, ...]
+    stems: Tuple[str, ...]
+    grams: Tuple[str, ...]
+    russian: bool
+
+
+def prepare_query(text: str) -> Query:
+    key = normalize(text)
+    return Query(
+        key=key,
+        tokens=tuple(key.split()),
+        stems=tuple(token[:STEM] for token in key.split()),
+        grams=tuple(set(trigrams(key))),
+        russian=bool(_CYRILLIC_RE.search(key)),
+    )
+
+
+def _name(product: Dict[str, Any]) -> Optional[Tuple[str, bool]]:
+    russian_name = product.get("product_name_ru")
+    raw_name = russian_name or product.get("product_name")
+    if not raw_name:
+        return None
+    # unescape нужен редким названиям с сущностями (&quot;, &amp;) — остальные не трогаем
+    name = (html.unescape(raw_name) if "&" in raw_name else raw_name).strip()
+    return name, bool(russian_name)
+
+
+def _has_energy(product: Dict[str, Any]) -> bool:
+    nutriments = product.get("nutriments") or {}
+    return nutriments.get("energy-kcal_100g") is not None or nutriments.get("energy_100g") is not None
+
+
+def _bonus(query: Query, key: str, russian: bool, product: Dict[str, Any]) -> float:
+    #Слагаемые, не зависящие от близости текста: начало названия, язык, штрафы.
+    value = 0.0
+    if key.startswith(query.key):
+        value += PREFIX_BONUS
+    if russian == query.russian:
+        value += LANGUAGE_BONUS
+    if any("beverages" in tag for tag in product.get("categories_tags") or ()):
+        value -= BEVERAGE_PENALTY
+    if not _has_energy(product):
+        value -= NO_ENERGY_PENALTY
+    return value
+
+
+def _text_bound(query: Query, key: str) -> float:
+    #Верхняя оценка близости текста за несколько проверок подстрок: слово без общего начала не совпадет,
+    #а общих триграмм не больше, чем триграмм в запросе.
+    stems = 0
+    for stem in query.stems:
+        if stem in key:
+            stems += 1
+    grams = len(query.grams)
+    return TOKEN_WEIGHT * stems / len(query.stems) + TRIGRAM_WEIGHT * 2 * grams / (grams + len(key) + 1)
+
+
+def _text(query: Query, key: str) -> float:
+    words = f" {key} "
+    matched = 0.0
+    for token in query.tokens:
+        if f" {token} " in words:
+            matched += 1.0
+        elif f" {token[:STEM]}" in words:
+            matched += 0.5
+    # Триграммы запроса ищем подстроками в названии — без списка и множества триграмм кандидата
+    padded = f"  {key} "
+    shared = sum(gram in padded for gram in query.grams)
+    similarity = 2 * shared / (len(query.grams) + len(key) + 1)
+    return TOKEN_WEIGHT * matched / len(query.tokens) + TRIGRAM_WEIGHT * similarity
+
+
+def score(query: Query, key: str, russian: bool, product: Dict[str, Any]) -> float:
+    #Оценка по нормализованному названию: слова, триграммы (Дайс), начало названия, язык, штрафы.
+    if not query.tokens:
+        return 0.0
+    return _text(query, key) + _bonus(query, key, russian, product)
+
+
+def _key(name: str) -> str:
+    #Быстрый путь normalize для названий из одних букв, цифр и пробелов — без регэкспа.
+    lowered = name.lower()
+    if "ё" not in lowered and lowered.replace(" ", "").isalnum():
+        return " ".join(lowered.split())
+    return normalize(name)
+
+
+def _rank_sorted(query: Query, products: List[Dict[str, Any]], k: int) -> List[Tuple[float, int, str, bool]]:
+    scored: List[Tuple[float, int, str, bool]] = []
+    for index, product in enumerate(products):
+        named = _name(product)
+        if named is None:
+            continue
+        name, russian_name = named
+        key = _key(name)
+        if not key:
+            continue
+        russian = russian_name or bool(_CYRILLIC_RE.search(key))
+        scored.append((_text(query, key) + _bonus(query, key, russian, product), -index, name, russian))
+    # sorted устойчива и с reverse=True: при равной оценке выше продукт, который раньше в выдаче
+    return sorted(scored, key=lambda entry: entry[0], reverse=True)[:k]
+
+
+def _rank_heap(query: Query, products: List[Dict[str, Any]], k: int) -> List[Tuple[float, int, str, bool]]:
+    #Куча из k элементов, а кандидат, который даже по верхней оценке не обгоняет худшего в куче,
+    #не оценивается целиком.
+    heap: List[Tuple[float, int, str, bool]] = []
+    for index, product in enumerate(products):
+        named = _name(product)
+        if named is None:
+            continue
+        name, russian_name = named
+        key = _key(name)
+        if not key:
+            continue
+        if len(heap) == k:
+            bound = _text_bound(query, key)
+            if bound + MAX_BONUS <= heap[0][0]:
+                continue
+        russian = russian_name or bool(_CYRILLIC_RE.search(key))
+        bonus = _bonus(query, key, russian, product)
+        if len(heap) == k and bonus + bound <= heap[0][0]:
+            continue
+        # -index разводит равные оценки: выигрывает продукт выше в выдаче
+        entry = (bonus + _text(query, key), -index, name, russian)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+    return sorted(heap, reverse=True)
+
+
+def rank(text: str, products: List[Dict[str, Any]], k: int = 4) -> List[Candidate]:
+    #k лучших кандидатов. Полная сортировка — для коротких списков и больших k, куча с отсевом — для длинных.
+    query = prepare_query(text)
+    if not query.tokens or k <= 0:
+        return []
+    if len(products) <= SORT_MAX_CANDIDATES or k >= len(products) * SORT_MIN_K_FRACTION:
+        top = _rank_sorted(query, products, k)
+    else:
+        top = _rank_heap(query, products, k)
+    return [
+        Candidate(name=name, score=value, russian=russian, has_energy=_has_energy(products[-position]), product=products[-position])
+        for value, position, name, russian in top
+    ]
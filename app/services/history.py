@@ -0,0 +1,61 @@
+import datetime as dt
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List
+
+from app.models import DailyRecord, UserProfile
+from app.services.timezones import zone
+
+
+def top_foods(profile: UserProfile, limit: int = 3) -> str:
+    calories: Dict[str, float] = defaultdict(float)
+    for entry in profile.food_log:
+        calories[entry.name] += entry.calories
+    names = sorted(calories, key=calories.get, reverse=True)[:limit]
+    return ", ".join(names)
+
+
+def local_today(profile: UserProfile) -> dt.date:
+    return dt.datetime.now(zone(profile.timezone)).date()
+
+
+@lru_cache(maxsize=4096)
+def _day_ending_at(next_reset: float, timezone: str) -> int:
+    return dt.datetime.fromtimestamp(next_reset - 1, zone(timezone)).date().toordinal()
+
+
+def counter_period(profile: UserProfile) -> int:
+    #Номер (date.toordinal) местного дня, к которому относятся текущие счетчики, — того, что заканчивается в next_reset.
+    #У пользователей одного пояса next_reset общий, так что datetime считается раз в сутки на пояс, а не на апдейт.
+    return _day_ending_at(profile.next_reset, profile.timezone)
+
+
+def counter_day(profile: UserProfile) -> dt.date:
+    return dt.date.fromordinal(counter_period(profile))
+
+
+def current_record(profile: UserProfile, day: dt.date) -> DailyRecord:
+    return DailyRecord(
+        day=day,
+        water=profile.logged_water,
+        water_goal=profile.water_goal,
+        calories_in=profile.logged_calories,
+        calories_out=profile.burned_calories,
+        calorie_goal=profile.calorie_goal,
+        top_foods=top_foods(profile),
+    )
+
+
+def archive_day(profile: UserProfile) -> None:
+    #Сворачиваем завершившийся день в одну запись перед сбросом счетчиков; пустые дни не храним.
+    if not (profile.logged_water or profile.food_log or profile.workout_log):
+        return
+    profile.history.append(current_record(profile, counter_day(profile)))
+
+
+def recent_days(profile: UserProfile, days: int) -> List[DailyRecord]:
+    #Последние days дней по местному календарю, включая текущий незавершенный.
+    today = local_today(profile)
+    records = profile.history.range(today - dt.timedelta(days=days - 1), today - dt.timedelta(days=1))
+    records.append(current_record(profile, today))
+    return records
@@ -0,0 +1,122 @@
+from bisect import bisect_left, insort
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Ключ в упорядоченной структуре: (-очки, user_id) — по убыванию очков, при равенстве по id
+Key = Tuple[float, int]
+
+
+class RankedBoard:
+    #Рейтинг как отсортированный список блоков: вставка/удаление за O(log n + размер блока), место за O(log n), топ без сортировки.
+
+    def __init__(self, load: int = 256) -> None:
+        self.load = load
+        self.scores: Dict[int, float] = {}
+        self._blocks: List[List[Key]] = []
+        self._maxes: List[Key] = []
+        # Дерево Фенвика по размерам блоков: сколько участников выше блока — за O(log числа блоков)
+        self._sizes: List[int] = [0]
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self.scores
+
+    def _insert(self, key: Key) -> None:
+        if not self._blocks:
+            self._blocks.append([key])
+            self._maxes.append(key)
+            self._reindex()
+            return
+        position = min(bisect_left(self._maxes, key), len(self._blocks) - 1)
+        block = self._blocks[position]
+        insort(block, key)
+        self._maxes[position] = block[-1]
+        if len(block) > 2 * self.load:
+            # Делим переполненный блок пополам, чтобы вставка оставалась дешевой
+            half = block[self.load:]
+            del block[self.load:]
+            self._blocks.insert(position + 1, half)
+            self._maxes[position] = block[-1]
+            self._maxes.insert(position + 1, half[-1])
+            # Номера блоков сдвинулись — раз в load вставок пересобираем дерево за O(числа блоков)
+            self._reindex()
+        else:
+            self._resize(position, 1)
+
+    def _remove(self, key: Key) -> None:
+        position = bisect_left(self._maxes, key)
+        block = self._blocks[position]
+        del block[bisect_left(block, key)]
+        if block:
+            self._maxes[position] = block[-1]
+            self._resize(position, -1)
+        else:
+            del self._blocks[position]
+            del self._maxes[position]
+            self._reindex()
+
+    def _reindex(self) -> None:
+        sizes = [0] + [len(block) for block in self._blocks]
+        for index in range(1, len(sizes)):
+            parent = index + (index & -index)
+            if parent < len(sizes):
+                sizes[parent] += sizes[index]
+        self._sizes = sizes
+
+    def _resize(self, position: int, delta: int) -> None:
+        index = position + 1
+        while index < len(self._sizes):
+            self._sizes[index] += delta
+            index += index & -index
+
+    def _count_before(self, position: int) -> int:
+        total = 0
+        while position > 0:
+            total += self._sizes[position]
+            position -= position & -position
+        return total
+
+    def set(self, user_id: int, score: float) -> None:
+        old = self.scores.get(user_id)
+        if old is not None:
+            self._remove((-old, user_id))
+        self.scores[user_id] = score
+        self._insert((-score, user_id))
+
+    def add(self, user_id: int, delta: float) -> None:
+        self.set(user_id, self.scores.get(user_id, 0.0) + delta)
+
+    def discard(self, user_id: int) -> None:
+        old = self.scores.pop(user_id, None)
+        if old is not None:
+            self._remove((-old, user_id))
+
+    def rank(self, user_id: int) -> Optional[int]:
+        #Место с единицы: бинарный поиск блока и позиции внутри него, участники выше блока — из дерева Фенвика.
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        key = (-score, user_id)
+        position = bisect_left(self._maxes, key)
+        return self._count_before(position) + bisect_left(self._blocks[position], key) + 1
+
+    def top(self, n: int) -> List[Tuple[int, float]]:
+        return [(user_id, -negative) for negative, user_id in self._iter_keys(n)]
+
+    def _iter_keys(self, n: int) -> Iterator[Key]:
+        for block in self._blocks:
+            for key in block:
+                if n <= 0:
+                    return
+                yield key
+                n -= 1
+
+    def reset(self) -> None:
+        #Новый период: все участники остаются с нулем, порядок — по user_id.
+        members = sorted(self.scores)
+        self.scores = dict.fromkeys(members, 0.0)
+        keys = [(-0.0, user_id) for user_id in members]
+        self._blocks = [keys[start:start + self.load] for start in range(0, len(keys), self.load)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._reindex()
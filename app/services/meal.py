@@ -0,0 +1,31 @@
+import re
+from typing import List, Optional, Tuple
+
+# «гречка 200г», «курица 150 г», «огурец 100», «сыр 30,5 гр»
+_ITEM_RE = re.compile(
+    r"^(?P<name>.*?\D)\s*(?P<grams>\d+(?:[.,]\d+)?)\s*(?:г|гр|грамм\w*|g|gr)?\.?$",
+    re.IGNORECASE,
+)
+_SPLIT_RE = re.compile(r",(?!\d)|[;\n]+|\s+\+\s+")
+
+
+def parse_item(text: str) -> Optional[Tuple[str, float]]:
+    #Одна позиция: название и граммы в конце строки.
+    match = _ITEM_RE.match(text.strip())
+    if not match:
+        return None
+    name = match.group("name").strip(" -—:")
+    grams = float(match.group("grams").replace(",", "."))
+    if not name or grams <= 0:
+        return None
+    return name, grams
+
+
+def parse_meal(text: str, min_items: int = 1) -> List[Tuple[str, float]]:
+    #Разбираем «гречка 200г, курица 150 г, огурец 100» в список (название, граммы).
+    #Если хотя бы одна часть без граммов или частей меньше min_items — это не прием пищи, а обычное название.
+    parts = [part for part in _SPLIT_RE.split(text) if part.strip()]
+    items = [parse_item(part) for part in parts]
+    if len(items) < max(min_items, 1) or any(item is None for item in items):
+        return []
+    return items
@@ -1,14 +1,23 @@
+import threading
 from io import BytesIO
+from typing import List
 
 import matplotlib.pyplot as plt
 
-from app.models import UserProfile
+from app.models import DailyRecord, UserProfile
+
+# pyplot хранит текущую фигуру глобально — графики из потоков строятся по одному
+_PYPLOT_LOCK = threading.Lock()
 
 
 class ProgressPlotter:
     # Строит графики прогресса по воде и калориям.
 
     def build_plot(self, profile: UserProfile) -> BytesIO:
+        with _PYPLOT_LOCK:
+            return self._build_plot(profile)
+
+    def _build_plot(self, profile: UserProfile) -> BytesIO:
         water_goal = max(profile.water_goal, 1)
         calorie_goal = max(profile.calorie_goal, 1)
         water = profile.logged_water
@@ -33,8 +42,45 @@ class ProgressPlotter:
                 ax.spines[spine].set_visible(False)
 
         buf = BytesIO()
-        plt.tight_layout()
-        plt.savefig(buf, format="png")
+        fig.tight_layout()
+        fig.savefig(buf, format="png")
+        plt.close(fig)
+        buf.seek(0)
+        return buf
+
+    def build_history_plot(self, records: List[DailyRecord], title: str) -> BytesIO:
+        with _PYPLOT_LOCK:
+            return self._build_history_plot(records, title)
+
+    def _build_history_plot(self, records: List[DailyRecord], title: str) -> BytesIO:
+        labels = [f"{r.day:%d.%m}" for r in records]
+        positions = range(len(records))
+
+        fig, axes = plt.subplots(2, 1, figsize=(10, 6), sharex=True)
+        fig.suptitle(title, fontsize=12)
+
+        axes[0].bar(positions, [r.water for r in records], color="#4ba3fa", label="Выпито")
+        axes[0].plot(positions, [r.water_goal for r in records], color="#1f5f99", marker=".", label="Цель")
+        axes[0].set_title("Вода (мл)")
+        axes[0].legend(loc="upper left", fontsize=8)
+
+        width = 0.4
+        axes[1].bar([p - width / 2 for p in positions], [r.calories_in for r in records], width, color="#f0a202", label="Потреблено")
+        axes[1].bar([p + width / 2 for p in positions], [r.calories_out for r in records], width, color="#f18805", label="Сожжено")
+        axes[1].plot(positions, [r.calorie_goal for r in records], color="#8a5a00", marker=".", label="Цель")
+        axes[1].set_title("Калории (ккал)")
+        axes[1].legend(loc="upper left", fontsize=8)
+        axes[1].set_xticks(list(positions))
+        axes[1].set_xticklabels(labels, rotation=45 if len(records) > 10 else 0, fontsize=8)
+
+        for ax in axes:
+            ax.grid(axis="y", alpha=0.2)
+            for spine in ["top", "right"]:
+                ax.spines[spine].set_visible(False)
+
+        buf = BytesIO()
+        fig.tight_layout()
+        fig.savefig(buf, format="png")
         plt.close(fig)
         buf.seek(0)
         return buf
@@ -0,0 +1,226 @@
+import asyncio
+import datetime as dt
+import logging
+import math
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from telegram.error import Forbidden, TelegramError
+
+from app.models import UserProfile
+from app.services.storage import InMemoryStorage
+from app.services.timezones import zone
+
+
+class TimerWheel:
+    #Кольцевой таймер: один слот на тик, в слоте — множество ключей, срок которых наступает к концу тика.
+
+    def __init__(self, tick: float = 60.0, size: int = 1440) -> None:
+        self.tick = tick
+        self.size = size
+        self.slots: List[Set[int]] = [set() for _ in range(size)]
+        self.due: Dict[int, float] = {}
+        self.slot_of: Dict[int, int] = {}
+        self.cursor: Optional[int] = None  # абсолютный номер последнего обработанного тика
+
+    def __len__(self) -> int:
+        return len(self.due)
+
+    def schedule(self, key: int, when: float) -> None:
+        self.cancel(key)
+        # Слот — первый тик не раньше срока: ключ со сроком внутри тика сработает на его границе,
+        # а не через полный оборот колеса
+        absolute = math.ceil(when / self.tick)
+        if self.cursor is not None and absolute <= self.cursor:
+            # Срок уже прошел — попадет в ближайший тик
+            absolute = self.cursor + 1
+        slot = absolute % self.size
+        self.slots[slot].add(key)
+        self.slot_of[key] = slot
+        self.due[key] = when
+
+    def cancel(self, key: int) -> None:
+        slot = self.slot_of.pop(key, None)
+        if slot is not None:
+            self.slots[slot].discard(key)
+            del self.due[key]
+
+    def pop_due(self, now: float) -> List[int]:
+        #Забираем наступившие ключи; проходим только слоты с прошлого тика.
+        current = int(now // self.tick)
+        if self.cursor is None:
+            # Первый вызов: ключи, поставленные до запуска цикла, могут лежать в любом слоте — обходим оборот
+            self.cursor = current - self.size
+        start = max(self.cursor + 1, current - self.size + 1)
+        ready: List[int] = []
+        for absolute in range(start, current + 1):
+            slot = self.slots[absolute % self.size]
+            if not slot:
+                continue
+            # Ключи следующих оборотов колеса остаются на месте
+            fired = [key for key in slot if self.due[key] <= now]
+            for key in fired:
+                slot.discard(key)
+                del self.slot_of[key]
+                del self.due[key]
+            ready.extend(fired)
+        self.cursor = max(self.cursor, current)
+        return ready
+
+
+class HydrationReminders:
+    #Напоминания «пора пить»: один планировщик на всех, равномерно по часам бодрствования.
+
+    def __init__(
+        self,
+        storage: InMemoryStorage,
+        tick: float = 60.0,
+        wake_start: int = 8,
+        wake_end: int = 22,
+        portion: int = 250,
+        min_interval: float = 30 * 60,
+        batch_size: int = 25,
+        batch_pause: float = 1.0,
+    ) -> None:
+        self.storage = storage
+        self.wheel = TimerWheel(tick=tick, size=int(24 * 3600 // tick) + 1)
+        self.wake_start = wake_start
+        self.wake_end = wake_end
+        self.portion = portion
+        self.min_interval = min_interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._task: Optional[asyncio.Task] = None
+
+    #Расписание
+    @staticmethod
+    def _local_now(profile: UserProfile, now: float) -> dt.datetime:
+        return dt.datetime.fromtimestamp(now, zone(profile.timezone))
+
+    @staticmethod
+    def logged_water(profile: UserProfile, now: float) -> float:
+        # Профиль из cold мог пережить местную полночь без сброса — выпитое за прошлый день не считаем
+        if profile.next_reset and now >= profile.next_reset:
+            return 0.0
+        return profile.logged_water
+
+    def next_due(self, profile: UserProfile, now: float) -> Optional[float]:
+        if not profile.reminders_enabled:
+            return None
+        local = self._local_now(profile, now)
+        day_start = local.replace(hour=self.wake_start, minute=0, second=0, microsecond=0)
+        day_end = local.replace(hour=self.wake_end, minute=0, second=0, microsecond=0)
+        if local < day_start:
+            return day_start.timestamp()
+        next_morning = (day_start + dt.timedelta(days=1)).timestamp()
+        if local >= day_end:
+            return next_morning
+        remaining = profile.water_goal - self.logged_water(profile, now)
+        if remaining <= 0:
+            # Цель выполнена — продолжим завтра, после сброса счетчиков
+            return next_morning
+        reminders_left = math.ceil(remaining / self.portion)
+        interval = max(self.min_interval, (day_end.timestamp() - now) / reminders_left)
+        due = now + interval
+        return due if due < day_end.timestamp() else next_morning
+
+    def schedule(self, profile: UserProfile, now: Optional[float] = None) -> None:
+        #Вызывается после логирования воды/смены цели: переносит следующее напоминание.
+        now = time.time() if now is None else now
+        due = self.next_due(profile, now)
+        if due is None:
+            self.wheel.cancel(profile.user_id)
+        else:
+            self.wheel.schedule(profile.user_id, due)
+
+    def unschedule(self, user_id: int) -> None:
+        self.wheel.cancel(user_id)
+
+    async def seed(self, due: Iterable[Tuple[int, Optional[float]]], now: Optional[float] = None, chunk: int = 1000) -> int:
+        #После рестарта колесо пустое: ставим сроки из индекса снимка, профили не декодируются.
+        #Срок 0 — напоминания выключены. Пропущенные за простой или неизвестные сроки разносим по ближайшему
+        #min_interval: collect_due прочитает профиль и пересчитает срок, но не для всех пользователей в одном тике.
+        #Тех, кого хэндлеры уже переставили, не трогаем; каждые chunk записей отдаем управление циклу.
+        now = time.time() if now is None else now
+        spread = max(int(self.min_interval), 1)
+        seeded = 0
+        for index, (user_id, when) in enumerate(due, 1):
+            if when != 0.0 and user_id not in self.wheel.due:
+                if when is None or when <= now:
+                    when = now + user_id % spread
+                self.wheel.schedule(user_id, when)
+                seeded += 1
+            if index % chunk == 0:
+                await asyncio.sleep(0)
+        return seeded
+
+    #Рассылка
+    def format_reminder(self, profile: UserProfile, now: float) -> str:
+        logged = self.logged_water(profile, now)
+        left = max(profile.water_goal - logged, 0)
+        return (
+            "Пора выпить воды!\n"
+            f"Выпито {logged:.0f} мл из {profile.water_goal:.0f} мл, осталось {left:.0f} мл."
+        )
+
+    def collect_due(self, now: float) -> List[UserProfile]:
+        #Профили читаются без подъема из cold: рассылка не должна вытеснять активных пользователей.
+        due_profiles: List[UserProfile] = []
+        for user_id in self.wheel.pop_due(now):
+            profile = self.storage.peek(user_id)
+            if profile is None:
+                continue
+            # Срок из снимка мог устареть за время простоя — ночью не напоминаем, только переставляем
+            awake = self.wake_start <= self._local_now(profile, now).hour < self.wake_end
+            if profile.reminders_enabled and awake and self.logged_water(profile, now) < profile.water_goal:
+                due_profiles.append(profile)
+            self.schedule(profile, now)
+        return due_profiles
+
+    async def _send(self, bot, profile: UserProfile) -> None:
+        try:
+            await bot.send_message(chat_id=profile.user_id, text=self.format_reminder(profile, time.time()))
+        except Forbidden:
+            # Пользователь заблокировал бота — больше не напоминаем; профиль из cold поднимаем, чтобы флаг сохранился
+            self.storage.get_or_create_user(profile.user_id).reminders_enabled = False
+            self.unschedule(profile.user_id)
+        except TelegramError as exc:
+            self.logger.warning("Reminder to %s failed: %s", profile.user_id, exc)
+
+    async def send_batch(self, bot, profiles: List[UserProfile]) -> None:
+        for start in range(0, len(profiles), self.batch_size):
+            batch = profiles[start:start + self.batch_size]
+            await asyncio.gather(*(self._send(bot, p) for p in batch))
+            if start + self.batch_size < len(profiles):
+                await asyncio.sleep(self.batch_pause)
+
+    async def run(self, bot, restored: Optional[Iterable[Tuple[int, Optional[float]]]] = None) -> None:
+        if restored is not None:
+            seeded = await self.seed(restored)
+            self.logger.info("Scheduled reminders for %d restored profiles", seeded)
+        while True:
+            try:
+                profiles = self.collect_due(time.time())
+                if profiles:
+                    self.logger.info("Sending %d hydration reminders", len(profiles))
+                    await self.send_batch(bot, profiles)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.logger.exception("Reminder tick failed: %s", exc)
+            await asyncio.sleep(self.wheel.tick - time.time() % self.wheel.tick)
+
+    #Жизненный цикл (post_init / post_shutdown приложения)
+    async def start(self, bot, restored: Optional[Iterable[Tuple[int, Optional[float]]]] = None) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(bot, restored))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
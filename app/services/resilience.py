@@ -0,0 +1,232 @@
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Optional
+
+import requests
+
+
+class UpstreamError(Exception):
+    #Ответ апстрима, который считаем сбоем (5xx, 429), а не «не найдено».
+    pass
+
+
+class UpstreamMiss(Exception):
+    #Ответ 4xx: «не найдено», неверный ключ или запрос — апстрим исправен, размыкатель не трогаем.
+    pass
+
+
+def raise_for_upstream(resp: requests.Response) -> None:
+    #5xx и 429 — сбой апстрима (идет в размыкатель), прочие 4xx — промах без сбоя.
+    if resp.status_code >= 500 or resp.status_code == 429:
+        raise UpstreamError(f"{resp.status_code} from {resp.url}")
+    if resp.status_code >= 400:
+        raise UpstreamMiss(f"{resp.status_code} from {resp.url}")
+
+
+class CircuitBreaker:
+    #Размыкатель по последовательным сбоям: closed -> open -> half_open -> closed/open.
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    # Пропуск для вызовов в замкнутом состоянии
+    PASS = object()
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout: float,
+        on_transition: Callable[[str, str, str], None],
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_transition = on_transition
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        # Пропуск текущего пробного запроса; None — пробный запрос не идет
+        self._probe: Optional[object] = None
+        self._lock = threading.Lock()
+
+    def _move(self, state: str) -> None:
+        old, self.state = self.state, state
+        # Любой переход завершает полуоткрытое состояние вместе с его пробным запросом
+        self._probe = None
+        self.on_transition(self.name, old, state)
+
+    def allow(self) -> Optional[object]:
+        #None — вызов не пропущен; иначе пропуск, который передается в record_*/release того же вызова.
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._move(self.HALF_OPEN)
+            if self.state == self.CLOSED:
+                return self.PASS
+            if self.state == self.HALF_OPEN and self._probe is None:
+                # В полуоткрытом состоянии пропускаем один пробный запрос
+                self._probe = object()
+                return self._probe
+            return None
+
+    def record_success(self, ticket: object) -> None:
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self._move(self.CLOSED)
+
+    def release(self, ticket: object) -> None:
+        #Вызов завершился любым исходом; слот пробного запроса освобождает только сам пробный запрос.
+        with self._lock:
+            if ticket is self._probe:
+                self._probe = None
+
+    def record_failure(self, ticket: object) -> None:
+        with self._lock:
+            self.failures += 1
+            # Сбой запроса, начатого до размыкания, не решает судьбу пробного
+            probe_failed = self.state == self.HALF_OPEN and ticket is self._probe
+            if probe_failed or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self._move(self.OPEN)
+
+
+class Endpoint:
+    #Защищенный вызов одного апстрима: размыкатель, хедж по p95 и последнее хорошее значение.
+
+    def __init__(
+        self,
+        name: str,
+        layer: "Resilience",
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        hedge: bool = False,
+        hedge_min_delay: float = 0.3,
+        stale_size: int = 10000,
+    ) -> None:
+        self.name = name
+        self.layer = layer
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout, layer.on_transition)
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.latencies: Deque[float] = deque(maxlen=200)
+        self.stale_size = stale_size
+        self._stale: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def p95(self) -> Optional[float]:
+        #Пока замеров мало, хедж не включаем.
+        if len(self.latencies) < 20:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def _timed(self, fn: Callable[[], Any]) -> Any:
+        # Длительность пишется и для упавших попыток: иначе при деградации p95 занижен и хедж уходит слишком рано
+        started = time.monotonic()
+        try:
+            return fn()
+        finally:
+            self.latencies.append(time.monotonic() - started)
+
+    def _run(self, fn: Callable[[], Any]) -> Any:
+        p95 = self.p95() if self.hedge else None
+        if p95 is None:
+            return self._timed(fn)
+        first = self.layer.executor.submit(self._timed, fn)
+        done, _ = wait([first], timeout=max(self.hedge_min_delay, p95))
+        if done:
+            return first.result()
+        # Первый запрос задержался дольше p95 — дублируем и берем первый успешный ответ
+        self.layer.count(self.name, "hedged")
+        second = self.layer.executor.submit(self._timed, fn)
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # Проигравший запрос снимаем, если он еще ждет потока; уже начатый доработает сам
+                    for loser in pending:
+                        loser.cancel()
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _remember(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._stale[key] = value
+            self._stale.move_to_end(key)
+            if len(self._stale) > self.stale_size:
+                self._stale.popitem(last=False)
+
+    def _fallback(self, key: str, default: Any) -> Any:
+        with self._lock:
+            if key in self._stale:
+                self.layer.count(self.name, "stale_served")
+                return self._stale[key]
+        return default
+
+    def call(self, key: str, fn: Callable[[], Any], default: Any = None) -> Any:
+        ticket = self.breaker.allow()
+        if ticket is None:
+            self.layer.count(self.name, "short_circuited")
+            return self._fallback(key, default)
+        try:
+            result = self._run(fn)
+        except UpstreamMiss as exc:
+            # Апстрим ответил — для размыкателя это успех, для вызывающего — пустой результат
+            self.breaker.record_success(ticket)
+            self.layer.count(self.name, "misses")
+            self.layer.logger.warning("%s: %s", self.name, exc)
+            return default
+        except (requests.RequestException, UpstreamError, ValueError) as exc:
+            self.breaker.record_failure(ticket)
+            self.layer.count(self.name, "failures")
+            self.layer.logger.warning("%s failed: %s", self.name, exc)
+            return self._fallback(key, default)
+        else:
+            self.breaker.record_success(ticket)
+        finally:
+            # Неожиданное исключение не должно оставить размыкатель полуоткрытым навсегда
+            self.breaker.release(ticket)
+        if result is not None:
+            self._remember(key, result)
+        return result
+
+
+class Resilience:
+    #Общий слой устойчивости для внешних API: реестр эндпоинтов и счетчики.
+
+    def __init__(self, max_workers: int = 16) -> None:
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upstream")
+        self.endpoints: Dict[str, Endpoint] = {}
+        self.counters: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def endpoint(self, name: str, **options: Any) -> Endpoint:
+        if name not in self.endpoints:
+            self.endpoints[name] = Endpoint(name, self, **options)
+        return self.endpoints[name]
+
+    def count(self, endpoint: str, event: str) -> None:
+        with self._lock:
+            self.counters[f"{endpoint}.{event}"] += 1
+
+    def on_transition(self, endpoint: str, old: str, new: str) -> None:
+        self.count(endpoint, f"{old}->{new}")
+        log = self.logger.warning if new == CircuitBreaker.OPEN else self.logger.info
+        log("Circuit %s: %s -> %s", endpoint, old, new)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            "breakers": {name: ep.breaker.state for name, ep in self.endpoints.items()},
+            "p95": {name: ep.p95() for name, ep in self.endpoints.items()},
+            "counters": counters,
+        }
@@ -0,0 +1,51 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from app.services.storage import InMemoryStorage
+
+
+class RolloverSweeper:
+    #Фоновый сброс дневных счетчиков у неактивных пользователей в их местную полночь.
+
+    def __init__(self, storage: InMemoryStorage, interval: float = 60.0, batch_size: int = 1000) -> None:
+        self.storage = storage
+        self.interval = interval
+        self.batch_size = batch_size
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._task: Optional[asyncio.Task] = None
+
+    async def sweep(self) -> int:
+        total = 0
+        while True:
+            done = self.storage.rollover_due(time.time(), limit=self.batch_size)
+            total += done
+            if done < self.batch_size:
+                return total
+            # Полночь большого часового пояса — отдаем управление loop между пачками
+            await asyncio.sleep(0)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                total = await self.sweep()
+                if total:
+                    self.logger.info("Daily rollover for %d idle users", total)
+            except Exception as exc:
+                self.logger.exception("Rollover sweep failed: %s", exc)
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        self.storage.enable_rollover_sweep()
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
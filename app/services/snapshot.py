@@ -0,0 +1,263 @@
+import asyncio
+import datetime as dt
+import logging
+import marshal
+import mmap
+import os
+import struct
+import time
+from dataclasses import fields
+from typing import Dict, Iterator, Mapping, Optional, Tuple
+
+from app.models import DailyHistory, FoodLogEntry, UserProfile, WorkoutLogEntry
+from app.services.cities import default_cities
+from app.services.storage import InMemoryStorage
+
+# Формат файла:
+#   заголовок  <8sII — магия, версия marshal, число профилей
+#   индекс     <qQId — user_id, смещение, длина, срок напоминания (0 — выключены); отсортирован по user_id
+#   данные     записи профилей подряд (marshal от простых типов)
+MAGIC = b"HWSNAP02"
+HEADER = struct.Struct("<8sII")
+INDEX_ENTRY = struct.Struct("<qQId")
+# Снимки первой версии: индекс без срока напоминаний
+MAGIC_V1 = b"HWSNAP01"
+INDEX_ENTRY_V1 = struct.Struct("<qQI")
+
+_DATETIME_FIELDS = {"timestamp", "last_reset"}
+_LOG_TYPES = {"food_log": FoodLogEntry, "workout_log": WorkoutLogEntry}
+
+
+def _plain(name: str, value):
+    if name in _DATETIME_FIELDS:
+        return value.timestamp()
+    return value
+
+
+def encode_profile(profile: UserProfile) -> bytes:
+    record = {}
+    for field in fields(UserProfile):
+        value = getattr(profile, field.name)
+        if field.name in _LOG_TYPES:
+            value = [tuple(_plain(f.name, getattr(entry, f.name)) for f in fields(entry)) for entry in value]
+        elif field.name == "history":
+            value = value.to_record()
+        else:
+            value = _plain(field.name, value)
+        record[field.name] = value
+    return marshal.dumps(record)
+
+
+def decode_profile(data: bytes) -> UserProfile:
+    record = marshal.loads(data)
+    known = {field.name: field for field in fields(UserProfile)}
+    kwargs = {}
+    for name, value in record.items():
+        # Поля, удаленные из модели, пропускаем; новые получат значения по умолчанию
+        if name not in known:
+            continue
+        if name in _LOG_TYPES:
+            entry_type = _LOG_TYPES[name]
+            names = [f.name for f in fields(entry_type)]
+            value = [
+                entry_type(**{
+                    key: dt.datetime.fromtimestamp(item) if key in _DATETIME_FIELDS else item
+                    for key, item in zip(names, entry)
+                })
+                for entry in value
+            ]
+        elif name == "history":
+            value = DailyHistory.from_record(value)
+        elif name in _DATETIME_FIELDS:
+            value = dt.datetime.fromtimestamp(value)
+        kwargs[name] = value
+    if "city_id" not in record:
+        # Снимок старше справочника городов: id выводим из названия, иначе погода по умолчанию уйдет в Москву
+        city = default_cities().resolve(kwargs.get("city", ""))
+        kwargs["city_id"] = city.id if city is not None else ""
+    return UserProfile(**kwargs)
+
+
+class SnapshotFile:
+    #Снимок, открытый через mmap: при старте читается только заголовок, профили — по запросу.
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, self.count = HEADER.unpack_from(self._map, 0)
+        except (ValueError, struct.error):
+            self._file.close()
+            raise ValueError(f"Empty or truncated snapshot: {path}")
+        if magic not in (MAGIC, MAGIC_V1) or version != marshal.version:
+            self.close()
+            raise ValueError(f"Unsupported snapshot format: {path}")
+        self._index = INDEX_ENTRY if magic == MAGIC else INDEX_ENTRY_V1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _entry(self, position: int) -> Tuple[int, int, int]:
+        return self._index.unpack_from(self._map, HEADER.size + position * self._index.size)[:3]
+
+    def raw(self, user_id: int) -> Optional[bytes]:
+        #Бинарный поиск по индексу прямо в отображенном файле.
+        low, high = 0, self.count - 1
+        while low <= high:
+            middle = (low + high) // 2
+            key, offset, length = self._entry(middle)
+            if key == user_id:
+                return self._map[offset:offset + length]
+            if key < user_id:
+                low = middle + 1
+            else:
+                high = middle - 1
+        return None
+
+    def load(self, user_id: int) -> Optional[UserProfile]:
+        data = self.raw(user_id)
+        return decode_profile(data) if data is not None else None
+
+    def entries(self) -> Iterator[Tuple[int, int, int]]:
+        for position in range(self.count):
+            yield self._entry(position)
+
+    def reminder_due(self) -> Iterator[Tuple[int, Optional[float]]]:
+        #Сроки напоминаний прямо из индекса, без декодирования профилей; None — снимок старого формата, срок неизвестен.
+        for position in range(self.count):
+            entry = self._index.unpack_from(self._map, HEADER.size + position * self._index.size)
+            yield entry[0], entry[3] if self._index is INDEX_ENTRY else None
+
+    def records(self) -> Iterator[Tuple[int, bytes]]:
+        for key, offset, length in self.entries():
+            yield key, self._map[offset:offset + length]
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    @classmethod
+    def open_if_exists(cls, path: str) -> Optional["SnapshotFile"]:
+        if not os.path.exists(path):
+            return None
+        try:
+            return cls(path)
+        except ValueError as exc:
+            logging.getLogger(cls.__name__).warning("Snapshot ignored: %s", exc)
+            return None
+
+
+def write_snapshot(
+    path: str,
+    fresh: Dict[int, bytes],
+    base: Optional[SnapshotFile],
+    reminder_due: Optional[Mapping[int, float]] = None,
+) -> SnapshotFile:
+    #Сливаем прошлый снимок со свежими записями и атомарно подменяем файл. Файл переписывается целиком,
+    #но в памяти собирается только индекс: неизмененные записи копируются из mmap прошлого снимка по одной.
+    #Сроки напоминаний берутся из reminder_due (расписание планировщика), без него — из прошлого индекса.
+    if reminder_due is None:
+        reminder_due = {user_id: due for user_id, due in base.reminder_due() if due} if base is not None else {}
+    # user_id -> (смещение в прошлом снимке или None для свежей записи, длина)
+    layout: Dict[int, Tuple[Optional[int], int]] = {}
+    if base is not None:
+        for user_id, offset, length in base.entries():
+            if user_id not in fresh:
+                layout[user_id] = (offset, length)
+    for user_id, data in fresh.items():
+        layout[user_id] = (None, len(data))
+    user_ids = sorted(layout)
+    offset = HEADER.size + INDEX_ENTRY.size * len(user_ids)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, marshal.version, len(user_ids)))
+        for user_id in user_ids:
+            length = layout[user_id][1]
+            out.write(INDEX_ENTRY.pack(user_id, offset, length, reminder_due.get(user_id, 0.0)))
+            offset += length
+        for user_id in user_ids:
+            base_offset, length = layout[user_id]
+            out.write(fresh[user_id] if base_offset is None else base._map[base_offset:base_offset + length])
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, path)
+    return SnapshotFile(path)
+
+
+class Snapshotter:
+    #Периодические снимки InMemoryStorage без остановки event loop: кодируются только измененные профили.
+
+    def __init__(
+        self,
+        storage: InMemoryStorage,
+        path: str,
+        base: Optional[SnapshotFile] = None,
+        interval: float = 300.0,
+        chunk_size: int = 500,
+        reminder_due: Optional[Mapping[int, float]] = None,
+    ) -> None:
+        self.storage = storage
+        # Расписание напоминаний (TimerWheel.due) пишется в индекс, чтобы после рестарта не декодировать профили
+        self.reminder_due = reminder_due
+        self.path = path
+        self.base = base
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def snapshot_once(self) -> None:
+        async with self._lock:
+            started = time.monotonic()
+            # Забираем только профили, тронутые после прошлого снимка, остальные берем из файла
+            dirty, self.storage.dirty = self.storage.dirty, set()
+            fresh: Dict[int, bytes] = {}
+            for number, user_id in enumerate(dirty, 1):
+                profile = self.storage.users.get(user_id)
+                if profile is not None:
+                    fresh[user_id] = encode_profile(profile)
+                elif self.storage.cold is not None and user_id in self.storage.cold:
+                    # Вытеснен после изменения — в холодном уровне уже лежат готовые байты
+                    fresh[user_id] = self.storage.cold.raw(user_id)
+                if number % self.chunk_size == 0:
+                    await asyncio.sleep(0)
+            # Копия расписания: пока файл пишется в потоке, планировщик продолжает его менять
+            due = dict(self.reminder_due) if self.reminder_due is not None else None
+            try:
+                snapshot = await asyncio.to_thread(write_snapshot, self.path, fresh, self.base, due)
+            except OSError as exc:
+                self.storage.dirty |= dirty
+                self.logger.error("Snapshot failed: %s", exc)
+                return
+            old, self.base = self.base, snapshot
+            self.storage.loader = snapshot.load
+            if old is not None:
+                old.close()
+            self.logger.info(
+                "Snapshot written: %d profiles (%d changed) in %.2fs",
+                len(snapshot), len(fresh), time.monotonic() - started,
+            )
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.snapshot_once()
+            except Exception as exc:
+                self.logger.exception("Snapshot tick failed: %s", exc)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.snapshot_once()
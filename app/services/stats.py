@@ -0,0 +1,135 @@
+import datetime as dt
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.models import FoodLogEntry, UserProfile, WorkoutLogEntry
+from app.services.timezones import DEFAULT_TIMEZONE, zone
+
+
+class SpaceSaving:
+    #Поток самых частых ключей (Space-Saving): не больше capacity счетчиков при любом числе ключей.
+
+    def __init__(self, capacity: int = 64) -> None:
+        self.capacity = capacity
+        self.counts: Dict[str, float] = {}
+        # Насколько счетчик ключа может быть завышен: значение вытесненного счетчика, которое он унаследовал
+        self.errors: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def add(self, key: str, weight: float = 1.0) -> None:
+        counts = self.counts
+        if key in counts:
+            counts[key] += weight
+            return
+        if len(counts) < self.capacity:
+            counts[key] = weight
+            self.errors[key] = 0.0
+            return
+        # Вытесняем минимальный счетчик, новый ключ наследует его значение как погрешность
+        victim = min(counts, key=counts.get)
+        floor = counts.pop(victim)
+        del self.errors[victim]
+        counts[key] = floor + weight
+        self.errors[key] = floor
+
+    def top(self, n: int) -> List[Tuple[str, float, float]]:
+        #(ключ, оценка, гарантированный минимум): настоящая частота лежит между count - error и count.
+        ranked = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:n]
+        return [(key, count, count - self.errors[key]) for key, count in ranked]
+
+    def clear(self) -> None:
+        self.counts.clear()
+        self.errors.clear()
+
+
+class GlobalStats:
+    #Сводка для /stats: обновляется хэндлерами за O(1) на событие, читается без обхода пользователей.
+
+    def __init__(self, timezone: str = DEFAULT_TIMEZONE, top_capacity: int = 64, dialog_ttl: float = 30 * 60) -> None:
+        self.timezone = timezone
+        self.day: Optional[dt.date] = None
+        self.active: Set[int] = set()
+        self.goal_met: Set[int] = set()
+        self.water = 0.0
+        self.calories_in = 0.0
+        self.calories_out = 0.0
+        self.foods = SpaceSaving(top_capacity)
+        self.workouts = SpaceSaving(top_capacity)
+        # Диалоги переживают смену дня, поэтому не сбрасываются. user_id -> время входа в диалог, по возрастанию;
+        # брошенный диалог роутер не закрывает — через dialog_ttl пользователь перестает считаться
+        self.dialog_ttl = dialog_ttl
+        self.in_dialog: "OrderedDict[int, float]" = OrderedDict()
+
+    def _roll(self, now: Optional[float] = None) -> None:
+        today = dt.datetime.fromtimestamp(time.time() if now is None else now, zone(self.timezone)).date()
+        if today == self.day:
+            return
+        self.day = today
+        self.active.clear()
+        self.goal_met.clear()
+        self.water = self.calories_in = self.calories_out = 0.0
+        self.foods.clear()
+        self.workouts.clear()
+
+    def _update_goal(self, profile: UserProfile) -> None:
+        if profile.water_goal and profile.logged_water >= profile.water_goal:
+            self.goal_met.add(profile.user_id)
+        else:
+            self.goal_met.discard(profile.user_id)
+
+    #События
+    def touch(self, user_id: int) -> None:
+        self._roll()
+        self.active.add(user_id)
+
+    def water_logged(self, profile: UserProfile, amount: float) -> None:
+        self.touch(profile.user_id)
+        self.water += amount
+        self._update_goal(profile)
+
+    def food_logged(self, profile: UserProfile, entries: Iterable[FoodLogEntry]) -> None:
+        self.touch(profile.user_id)
+        for entry in entries:
+            self.calories_in += entry.calories
+            self.foods.add(entry.name)
+
+    def workout_logged(self, profile: UserProfile, entry: WorkoutLogEntry) -> None:
+        self.touch(profile.user_id)
+        self.calories_out += entry.calories
+        self.workouts.add(entry.workout_type)
+        # Тренировка поднимает цель по воде — выполненная цель может снова стать невыполненной
+        self._update_goal(profile)
+
+    def dialog_changed(self, user_id: int, active: bool, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        self.in_dialog.pop(user_id, None)
+        if active:
+            self.in_dialog[user_id] = now
+        self._expire_dialogs(now)
+
+    def _expire_dialogs(self, now: float) -> None:
+        while self.in_dialog:
+            user_id, entered = next(iter(self.in_dialog.items()))
+            if now - entered < self.dialog_ttl:
+                break
+            del self.in_dialog[user_id]
+
+    #Чтение
+    def summary(self, top: int = 5, now: Optional[float] = None) -> Dict[str, object]:
+        self._roll(now)
+        self._expire_dialogs(time.time() if now is None else now)
+        active = len(self.active)
+        return {
+            "day": self.day,
+            "active_users": active,
+            "water": self.water,
+            "calories_in": self.calories_in,
+            "calories_out": self.calories_out,
+            "goal_rate": len(self.goal_met) / active if active else 0.0,
+            "top_foods": self.foods.top(top),
+            "top_workouts": self.workouts.top(top),
+            "in_dialog": len(self.in_dialog),
+        }
@@ -1,35 +1,295 @@
+import asyncio
 import datetime as dt
-from typing import Dict
+import heapq
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Set, Tuple
 
-from app.models import UserProfile
+from app.models import FoodLogEntry, UserProfile, WorkoutLogEntry
 from app.services.calculations import calculate_calorie_goal, calculate_water_goal
+from app.services.counters import DayTotals, LocalCounters
+from app.services.history import archive_day, counter_period, local_today
+from app.services.timezones import next_local_midnight
+
+if TYPE_CHECKING:
+    from app.services.coldstore import ColdStore
+    from app.services.counters import SqliteCounters
 
 
 class InMemoryStorage:
 
-    def __init__(self) -> None:
-        self.users: Dict[int, UserProfile] = {}
+    def __init__(
+        self,
+        loader: Optional[Callable[[int], Optional[UserProfile]]] = None,
+        cold: Optional["ColdStore"] = None,
+        max_hot: Optional[int] = None,
+        counters: Optional["LocalCounters | SqliteCounters"] = None,
+    ) -> None:
+        # Горячий уровень: порядок — от давно неактивных к недавно активным (LRU)
+        self.users: "OrderedDict[int, UserProfile]" = OrderedDict()
+        # loader поднимает профиль из снимка при первом обращении после рестарта
+        self.loader = loader
+        # Профили, которые могли измениться после последнего снимка
+        self.dirty: Set[int] = set()
+        # Очередь (next_reset, user_id) для фонового сброса; None — сброс только при обращении
+        self.rollover_heap: Optional[List[Tuple[float, int]]] = None
+        # user_id -> next_reset последней записи пользователя в куче: повторный подъем из cold ее не дублирует
+        self.rollover_queued: Dict[int, float] = {}
+        # Холодный уровень: при max_hot профилей в памяти самые давние уходят в cold
+        self.cold = cold
+        self.max_hot = max_hot
+        # user_id -> число незавершенных обработок; такие профили не вытесняются, пока хэндлер держит объект
+        self.pins: Dict[int, int] = {}
+        self.evictions = 0
+        self.cold_loads = 0
+        self.cold_load_seconds = 0.0
+        self.cold_load_max = 0.0
+        # Дневные итоги меняются только атомарными операциями add_* через counters
+        self.counters = counters or LocalCounters()
+        self.logger = logging.getLogger(self.__class__.__name__)
 
     def get_or_create_user(self, user_id: int) -> UserProfile:
-        if user_id not in self.users:
-            self.users[user_id] = UserProfile(user_id=user_id)
-            self.recalc_goals(self.users[user_id])
-        profile = self.users[user_id]
+        #Профиль из памяти без обращения к общим счетчикам; хэндлерам нужен load_user.
+        profile = self._promote(user_id)
         self.reset_daily_if_needed(profile)
         return profile
 
-    def reset_daily_if_needed(self, profile: UserProfile) -> None:
-        today = dt.date.today()
-        if not profile.last_reset or profile.last_reset.date() != today:
-            profile.logged_water = 0.0
-            profile.logged_calories = 0.0
-            profile.burned_calories = 0.0
-            profile.food_log.clear()
-            profile.workout_log.clear()
-            profile.workout_water_bonus = 0
-            profile.last_reset = dt.datetime.now()
+    @contextmanager
+    def pinned(self, user_id: int) -> Iterator[None]:
+        #Пока блок выполняется, профиль не уходит в cold: хэндлер может держать объект между await.
+        self.pins[user_id] = self.pins.get(user_id, 0) + 1
+        try:
+            yield
+        finally:
+            self.pins[user_id] -= 1
+            if not self.pins[user_id]:
+                del self.pins[user_id]
+
+    async def load_user(self, user_id: int) -> UserProfile:
+        #Как get_or_create_user, но с итогами, которые записали другие процессы: итоги уходящего
+        #и нового дня — одним запросом в отдельном потоке, чтобы ожидание SQLite не держало event loop.
+        if not self.counters.shared:
+            return self.get_or_create_user(user_id)
+        with self.pinned(user_id):
+            return await self._load_shared(user_id)
+
+    async def _load_shared(self, user_id: int) -> UserProfile:
+        profile = self._promote(user_id)
+        now = time.time()
+        if not profile.next_reset:
+            self.reset_daily_if_needed(profile, now)
+        before = counter_period(profile)
+        # После сброса счетчики относятся к сегодняшнему местному дню; datetime нужен, только когда граница пройдена
+        after = local_today(profile).toordinal() if now >= profile.next_reset else before
+        rows = await asyncio.to_thread(self.counters.get_days, user_id, (before, after))
+        if counter_period(profile) != before:
+            # Пока шел запрос, апдейт того же пользователя из другого чата уже сбросил день и подтянул итоги;
+            # строка before теперь вчерашняя — скопировать ее в новый день значило бы начать его со вчерашних сумм
+            return profile
+        if before in rows:
+            # Итоги уходящего дня могли пополнить другие процессы — подтягиваем до архивации
+            self._sync_totals(profile, rows[before])
+        self.reset_daily_if_needed(profile, now)
+        if after != before and after in rows:
+            self._sync_totals(profile, rows[after])
+        return profile
+
+    def _promote(self, user_id: int) -> UserProfile:
+        profile = self.users.get(user_id)
+        if profile is None:
+            profile = self._load_cold(user_id)
+            if profile is None:
+                profile = self.loader(user_id) if self.loader else None
+            if profile is None:
+                profile = UserProfile(user_id=user_id)
+                self.recalc_goals(profile)
+            elif profile.next_reset:
+                # Профиль из снимка или cold: если его записи в куче нет или она устарела — ставим
+                self.schedule_rollover(profile)
+            self.users[user_id] = profile
+            self._evict_if_needed()
+        else:
+            self.users.move_to_end(user_id)
+        self.dirty.add(user_id)
+        return profile
+
+    def peek(self, user_id: int) -> Optional[UserProfile]:
+        #Чтение без побочных эффектов: порядок LRU не меняется, профиль из cold или снимка в память не поднимается.
+        #Копия из cold или снимка отвязана от хранилища — изменения в ней не сохранятся.
+        profile = self.users.get(user_id)
+        if profile is None and self.cold is not None:
+            profile = self.cold.peek(user_id)
+        if profile is None and self.loader is not None:
+            profile = self.loader(user_id)
+        return profile
+
+    #Атомарные операции над дневными итогами
+    async def add_water(self, user_id: int, amount: float) -> DayTotals:
+        with self.pinned(user_id):
+            profile = self.get_or_create_user(user_id)
+            return await self._add(profile, DayTotals(water=amount))
+
+    async def add_food(self, user_id: int, entries: List[FoodLogEntry]) -> DayTotals:
+        with self.pinned(user_id):
+            profile = self.get_or_create_user(user_id)
+            profile.food_log.extend(entries)
+            return await self._add(profile, DayTotals(calories_in=sum(entry.calories for entry in entries)))
+
+    async def add_workout(self, user_id: int, entry: WorkoutLogEntry) -> DayTotals:
+        with self.pinned(user_id):
+            profile = self.get_or_create_user(user_id)
+            profile.workout_log.append(entry)
+            return await self._add(profile, DayTotals(calories_out=entry.calories, water_bonus=entry.water_bonus))
+
+    async def _add(self, profile: UserProfile, delta: DayTotals) -> DayTotals:
+        # Вызывающий держит pinned: пока идет запись в общий файл, профиль не вытесняется
+        # Период — местный день счетчиков, тот же, что уйдет в историю: запись нового дня начинается с нуля сама
+        args = (profile.user_id, counter_period(profile), delta, self._totals(profile))
+        # Общий файл может быть занят другим процессом (busy timeout) — ждем в потоке, а не в event loop
+        totals = await asyncio.to_thread(self.counters.add, *args) if self.counters.shared else self.counters.add(*args)
+        self._apply_totals(profile, totals)
+        return totals
+
+    def _sync_totals(self, profile: UserProfile, totals: DayTotals) -> None:
+        if totals != self._totals(profile):
+            self._apply_totals(profile, totals)
+
+    @staticmethod
+    def _totals(profile: UserProfile) -> DayTotals:
+        return DayTotals(
+            water=profile.logged_water,
+            calories_in=profile.logged_calories,
+            calories_out=profile.burned_calories,
+            water_bonus=profile.workout_water_bonus,
+        )
+
+    def _apply_totals(self, profile: UserProfile, totals: DayTotals) -> None:
+        bonus_changed = totals.water_bonus != profile.workout_water_bonus
+        profile.logged_water = totals.water
+        profile.logged_calories = totals.calories_in
+        profile.burned_calories = totals.calories_out
+        profile.workout_water_bonus = totals.water_bonus
+        if bonus_changed:
             self.recalc_goals(profile)
 
+    #Горячий и холодный уровни
+    def _load_cold(self, user_id: int) -> Optional[UserProfile]:
+        if self.cold is None or user_id not in self.cold:
+            return None
+        started = time.perf_counter()
+        profile = self.cold.take(user_id)
+        elapsed = time.perf_counter() - started
+        self.cold_loads += 1
+        self.cold_load_seconds += elapsed
+        self.cold_load_max = max(self.cold_load_max, elapsed)
+        return profile
+
+    def _evict_if_needed(self) -> None:
+        if self.cold is None or self.max_hot is None:
+            return
+        excess = len(self.users) - self.max_hot
+        if excess <= 0:
+            return
+        # Закрепленные профили пропускаем: если заняты все, горячий уровень временно больше max_hot
+        victims = []
+        for user_id in self.users:
+            if user_id not in self.pins:
+                victims.append(user_id)
+                if len(victims) == excess:
+                    break
+        for user_id in victims:
+            # Вытесненный профиль остается в dirty — снимок возьмет его байты из cold
+            profile = self.users.pop(user_id)
+            self.cold.put(profile)
+            self.counters.discard(profile.user_id)
+            self.evictions += 1
+
+    def tier_stats(self) -> Dict[str, float]:
+        return {
+            "hot": len(self.users),
+            "cold": len(self.cold) if self.cold is not None else 0,
+            "evictions": self.evictions,
+            "cold_loads": self.cold_loads,
+            "cold_load_avg_ms": self.cold_load_seconds / self.cold_loads * 1000 if self.cold_loads else 0.0,
+            "cold_load_max_ms": self.cold_load_max * 1000,
+        }
+
+    def reset_daily_if_needed(self, profile: UserProfile, now: Optional[float] = None) -> None:
+        #Горячий путь — одно сравнение с заранее посчитанной местной полуночью.
+        now = time.time() if now is None else now
+        if now < profile.next_reset:
+            return
+        if not profile.next_reset:
+            # Новый профиль или профиль из старого снимка: граница — полночь после последнего сброса
+            profile.next_reset = next_local_midnight(profile.last_reset.timestamp(), profile.timezone)
+            self.schedule_rollover(profile)
+            if now < profile.next_reset:
+                return
+        archive_day(profile)
+        profile.logged_water = 0.0
+        profile.logged_calories = 0.0
+        profile.burned_calories = 0.0
+        profile.food_log.clear()
+        profile.workout_log.clear()
+        profile.workout_water_bonus = 0
+        profile.last_reset = dt.datetime.now()
+        profile.next_reset = next_local_midnight(now, profile.timezone)
+        self.schedule_rollover(profile)
+        self.recalc_goals(profile)
+
+    def set_timezone(self, profile: UserProfile, timezone: str) -> None:
+        #Сегодняшние счетчики сохраняем, меняется только момент следующего сброса.
+        profile.timezone = timezone
+        profile.next_reset = next_local_midnight(time.time(), timezone)
+        self.schedule_rollover(profile)
+
+    #Фоновый сброс неактивных пользователей
+    def enable_rollover_sweep(self) -> None:
+        if self.rollover_heap is None:
+            self.rollover_heap = [(p.next_reset, p.user_id) for p in self.users.values()]
+            heapq.heapify(self.rollover_heap)
+            self.rollover_queued = {user_id: due for due, user_id in self.rollover_heap}
+
+    def schedule_rollover(self, profile: UserProfile) -> None:
+        if self.rollover_heap is None or self.rollover_queued.get(profile.user_id) == profile.next_reset:
+            return
+        heapq.heappush(self.rollover_heap, (profile.next_reset, profile.user_id))
+        self.rollover_queued[profile.user_id] = profile.next_reset
+
+    def rollover_due(self, now: float, limit: int = 1000) -> int:
+        #Сбрасываем до limit профилей, у которых наступила местная полночь.
+        heap = self.rollover_heap
+        done = 0
+        while heap and heap[0][0] <= now and done < limit:
+            due, user_id = heapq.heappop(heap)
+            if self.rollover_queued.get(user_id) == due:
+                del self.rollover_queued[user_id]
+            profile = self.users.get(user_id)
+            if profile is None and self.cold is not None and user_id in self.cold:
+                # Вытесненный профиль сбрасываем на месте, не поднимая в горячий уровень
+                if self._rollover_cold(user_id, due, now):
+                    done += 1
+                continue
+            if profile is None or profile.next_reset != due:
+                # Запись устарела: профиль уже сброшен или сменил часовой пояс
+                continue
+            self.reset_daily_if_needed(profile, now)
+            self.dirty.add(user_id)
+            done += 1
+        return done
+
+    def _rollover_cold(self, user_id: int, due: float, now: float) -> bool:
+        profile = self.cold.take(user_id)
+        reset = profile.next_reset == due
+        if reset:
+            # reset_daily_if_needed ставит следующий сброс в кучу — профиль остается в ней и в cold
+            self.reset_daily_if_needed(profile, now)
+            self.dirty.add(user_id)
+        self.cold.put(profile)
+        return reset
+
     def recalc_goals(self, profile: UserProfile) -> None:
         profile.water_goal = calculate_water_goal(profile)
         if profile.calorie_goal_manual:
@@ -0,0 +1,60 @@
+import datetime as dt
+import re
+from functools import lru_cache
+from typing import Dict, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+
+from app.services.cities import default_cities
+
+DEFAULT_TIMEZONE = "Europe/Moscow"
+
+_OFFSET_RE = re.compile(r"^(?:utc|gmt)?\s*([+-])(\d{1,2})$", re.IGNORECASE)
+# Диапазон существующих зон Etc/GMT: от UTC-12 (Etc/GMT+12) до UTC+14 (Etc/GMT-14)
+MIN_OFFSET = -12
+MAX_OFFSET = 14
+
+
+def zone(name: str) -> dt.tzinfo:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+@lru_cache(maxsize=None)
+def _iana_names() -> Dict[str, str]:
+    #Имена зон в нижнем регистре -> каноническое написание; список зон читается один раз на процесс.
+    return {name.lower(): name for name in available_timezones()}
+
+
+def timezone_for_city(city: str) -> Optional[str]:
+    place = default_cities().resolve(city)
+    return place.timezone if place else None
+
+
+def parse_timezone(text: str) -> Optional[str]:
+    #IANA-имя («Asia/Tokyo»), смещение («UTC+3», «-5») или известный город.
+    raw = text.strip()
+    match = _OFFSET_RE.match(raw.replace(" ", ""))
+    if match:
+        sign, hours = match.groups()
+        offset = int(hours) if sign == "+" else -int(hours)
+        if not MIN_OFFSET <= offset <= MAX_OFFSET:
+            return None
+        if offset == 0:
+            return "Etc/UTC"
+        # В зонах Etc/GMT знак инвертирован: UTC+3 == Etc/GMT-3
+        return f"Etc/GMT{'-' if offset > 0 else '+'}{abs(offset)}"
+    # IANA-имена проверяем раньше городов, чтобы «Asia/Tokyo» не ушло в нечеткий поиск; регистр не важен
+    name = _iana_names().get(raw.lower())
+    if name is not None:
+        return name
+    return timezone_for_city(raw)
+
+
+def next_local_midnight(now: float, timezone: str) -> float:
+    #Эпоха ближайшей полуночи по местному времени пользователя.
+    tz = zone(timezone)
+    local = dt.datetime.fromtimestamp(now, tz)
+    tomorrow = local.date() + dt.timedelta(days=1)
+    return dt.datetime.combine(tomorrow, dt.time(), tzinfo=tz).timestamp()
@@ -1,30 +1,56 @@
 import logging
-from typing import Optional
+import time
+from typing import Any, Dict, Optional, Tuple
 
 import requests
 
+from app.services.cities import CityIndex, default_cities
+from app.services.resilience import Resilience, raise_for_upstream
+
 
 class WeatherClient:
     #Клиент OpenWeather для получения температуры.
 
-    def __init__(self, api_key: Optional[str]) -> None:
+    def __init__(
+        self,
+        api_key: Optional[str],
+        resilience: Optional[Resilience] = None,
+        cities: Optional[CityIndex] = None,
+        cache_ttl: float = 15 * 60,
+    ) -> None:
         self.api_key = api_key
+        self.cities = cities or default_cities()
+        self.cache_ttl = cache_ttl
+        self._cache: Dict[str, Tuple[float, float]] = {}
         self.logger = logging.getLogger(self.__class__.__name__)
+        self.api = (resilience or Resilience()).endpoint("openweather.current", hedge=True)
 
-    def fetch_temperature(self, city: str) -> Optional[float]:
-        if not self.api_key or not city:
-            return None
-        try:
-            resp = requests.get(
-                "https://api.openweathermap.org/data/2.5/weather",
-                params={"q": city, "appid": self.api_key, "units": "metric"},
-                timeout=10,
-            )
-            if resp.status_code != 200:
-                self.logger.warning("Weather API error (%s): %s", resp.status_code, resp.text)
-                return None
-            data = resp.json()
-            return data.get("main", {}).get("temp")
-        except requests.RequestException as exc:
-            self.logger.error("Weather request failed: %s", exc)
+    def fetch_temperature(self, city: str, city_id: str = "") -> Optional[float]:
+        if not self.api_key or not (city or city_id):
             return None
+        place = self.cities.get(city_id) if city_id else self.cities.resolve(city)
+        if place is not None:
+            # Запрос и кэш по id из справочника: «москва», «Moscow» и «Msk» — одна запись
+            key = place.id
+            params: Dict[str, Any] = {"lat": place.latitude, "lon": place.longitude}
+        else:
+            key = city.strip().lower()
+            params = {"q": city}
+        cached = self._cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        # Пока OpenWeather недоступен, отдаем последнюю известную температуру города
+        temperature = self.api.call(key, lambda: self._fetch(params))
+        if temperature is not None:
+            self._cache[key] = (time.monotonic() + self.cache_ttl, temperature)
+        return temperature
+
+    def _fetch(self, params: Dict[str, Any]) -> Optional[float]:
+        resp = requests.get(
+            "https://api.openweathermap.org/data/2.5/weather",
+            params={**params, "appid": self.api_key, "units": "metric"},
+            timeout=10,
+        )
+        raise_for_upstream(resp)
+        data = resp.json()
+        return data.get("main", {}).get("temp")
@@ -0,0 +1,138 @@
+"""Стоимость выбора хэндлера на один апдейт: старая цепочка фильтров против Router.
+
+Старая схема воспроизведена настоящими хэндлерами PTB в порядке регистрации
+(entry points диалогов, кнопки-регэкспы, state-хэндлеры с ~button_filter,
+is_button и новая клавиатура на каждый ответ). Накладные расходы самого
+ConversationHandler не учитываются, так что «до» занижено.
+
+Запуск: python -m benchmarks.bench_dispatch
+"""
+import datetime as dt
+import timeit
+from types import SimpleNamespace
+
+from telegram import Chat, Message, MessageEntity, ReplyKeyboardMarkup, Update, User
+from telegram.ext import CommandHandler, MessageHandler, filters
+
+from app.bot.handlers import BotHandlers
+from app.bot.state import FoodState
+from app.services.challenges import ChallengeRegistry
+from app.services.activities import default_catalog
+from app.services.food import FoodClient
+from app.services.plotter import ProgressPlotter
+from app.services.reminders import HydrationReminders
+from app.services.stats import GlobalStats
+from app.services.storage import InMemoryStorage
+from app.services.weather import WeatherClient
+
+BUTTON_REGEX = r"^(Настроить профиль|Добавить воду|Лог еды|Тренировка|Прогресс|Графики)$"
+BOT = SimpleNamespace(username="bench_bot")
+
+
+async def noop(update, context):
+    return None
+
+
+def make_update(text: str) -> Update:
+    entities = []
+    if text.startswith("/"):
+        entities = [MessageEntity(type=MessageEntity.BOT_COMMAND, offset=0, length=len(text.split()[0]))]
+    message = Message(
+        message_id=1,
+        date=dt.datetime.now(),
+        chat=Chat(id=1, type=Chat.PRIVATE),
+        from_user=User(id=1, first_name="u", is_bot=False),
+        text=text,
+        entities=entities,
+    )
+    message.set_bot(BOT)
+    return Update(update_id=1, message=message)
+
+
+def legacy_keyboard() -> ReplyKeyboardMarkup:
+    return ReplyKeyboardMarkup(
+        [
+            ["Настроить профиль", "Добавить воду"],
+            ["Лог еды", "Тренировка"],
+            ["Прогресс", "Графики"],
+        ],
+        resize_keyboard=True,
+    )
+
+
+def legacy_chain(in_food_dialog: bool) -> list:
+    def button(text: str):
+        return MessageHandler(filters.TEXT & filters.Regex(f"^{text}$"), noop)
+
+    chain = [CommandHandler("start", noop), CommandHandler("help", noop)]
+    for command, text in [
+        ("set_profile", "Настроить профиль"),
+        ("log_food", "Лог еды"),
+    ]:
+        chain += [CommandHandler(command, noop), button(text)]
+    if in_food_dialog:
+        chain += [
+            MessageHandler(filters.TEXT & ~filters.COMMAND & ~filters.Regex(BUTTON_REGEX), noop),
+            CommandHandler("check_progress", noop),
+            MessageHandler(filters.COMMAND, noop),
+        ]
+    for command, text in [
+        ("log_water", "Добавить воду"),
+        ("log_workout", "Тренировка"),
+    ]:
+        chain += [CommandHandler(command, noop), button(text)]
+    chain += [
+        CommandHandler("check_progress", noop),
+        CommandHandler("plot_progress", noop),
+        CommandHandler("cancel", noop),
+        button("Прогресс"),
+        button("Графики"),
+    ]
+    return chain
+
+
+def legacy_dispatch(chain: list, update: Update, in_dialog: bool) -> None:
+    for handler in chain:
+        if handler.check_update(update):
+            break
+    if in_dialog:
+        # is_button: новый filters.Regex на каждое обращение
+        filters.Regex(BUTTON_REGEX).check_update(update)
+    legacy_keyboard()
+
+
+def main() -> None:
+    storage = InMemoryStorage()
+    handlers = BotHandlers(
+        storage=storage,
+        weather=WeatherClient(api_key=None),
+        food=FoodClient(),
+        plotter=ProgressPlotter(),
+        reminders=HydrationReminders(storage=storage),
+        activities=default_catalog(),
+        stats=GlobalStats(),
+        challenges=ChallengeRegistry(),
+    )
+    router = handlers.router
+    cases = [
+        ("кнопка «Графики»", "Графики", None, False),
+        ("/check_progress", "/check_progress", None, False),
+        ("граммы в диалоге еды", "200", FoodState.GRAMS, True),
+    ]
+    number = 20000
+    print(f"{'апдейт':<24}{'до, мкс':>10}{'после, мкс':>12}{'ускорение':>11}")
+    for title, text, state, in_dialog in cases:
+        update = make_update(text)
+        chain = legacy_chain(in_dialog)
+        before = timeit.timeit(lambda: legacy_dispatch(chain, update, in_dialog), number=number)
+
+        def routed() -> None:
+            router.resolve(state, update.effective_message.text)
+            handlers.main_keyboard()
+
+        after = timeit.timeit(routed, number=number)
+        print(f"{title:<24}{before / number * 1e6:>10.2f}{after / number * 1e6:>12.2f}{before / after:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
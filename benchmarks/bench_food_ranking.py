@@ -0,0 +1,115 @@
+"""Ранжирование результатов поиска продуктов: старая сортировка против food_ranking.rank.
+
+«старая» — схема из FoodClient._fetch_search: ключ сортировки (pick_name +
+html.unescape + lower, только startswith/in) и сортировка всего списка ради
+первого элемента. Опечаток она не прощает, поэтому дешевле новой оценки.
+«sort» — новая оценка в старой обвязке: та же нормализация (_key) и тот же
+признак языка, что в rank, но оценка считается для каждого продукта и весь
+список сортируется. Выбор у обеих схем совпадает — это проверяется перед замером.
+«rank» — food_ranking.rank: одна нормализация на продукт; до SORT_MAX_CANDIDATES
+продуктов (страница поиска бота — 24) та же полная сортировка, что и «sort»,
+на длинных списках — куча из k лучших и отсев по верхней оценке без полного
+подсчета. Поэтому на 24 кандидатах sort/rank около 1x: ускорения бот там не
+получает, оно появляется только на сотнях и тысячах кандидатов. Кроме времени
+печатается, что выбрала каждая схема.
+
+Запуск: python -m benchmarks.bench_food_ranking
+"""
+import html
+import random
+import timeit
+from typing import Any, Dict, List, Optional
+
+from app.services.food_ranking import SORT_MAX_CANDIDATES, _CYRILLIC_RE, _key, _name, prepare_query, rank, score
+
+NAMES = [
+    "Гречка ядрица", "Гречневая крупа", "Греческий йогурт", "Гречка с грибами", "Молоко 3,2%",
+    "Молоко овсяное", "Творог 5%", "Творожный сыр", "Куриная грудка", "Куриное филе",
+    "Рис басмати", "Рис круглозерный", "Овсяные хлопья", "Овсяное печенье", "Хлеб &quot;Бородинский&quot;",
+    "Buckwheat groats", "Greek yogurt", "Chicken breast", "Oat milk", "Apple juice",
+]
+QUERIES = ["гречка", "гречкя", "куриная грутка", "молоко"]
+
+
+def make_products(count: int, seed: int = 1) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    products = []
+    for index in range(count):
+        name = " ".join(filter(None, [rng.choice(NAMES), rng.choice(["", "Магнит", "Ашан", "ВкусВилл", "Global"]), str(index)]))
+        product: Dict[str, Any] = {"nutriments": {"energy-kcal_100g": rng.randint(20, 400)}}
+        product["product_name_ru" if rng.random() < 0.6 else "product_name"] = name
+        if "juice" in name or "milk" in name:
+            product["categories_tags"] = ["en:beverages"]
+        if rng.random() < 0.1:
+            product["nutriments"] = {}
+        products.append(product)
+    return products
+
+
+def legacy_best(product_name: str, products: List[Dict[str, Any]]) -> Optional[str]:
+    query = product_name.lower()
+
+    def pick_name(p: Dict[str, Any]) -> Optional[str]:
+        name = p.get("product_name_ru") or p.get("product_name")
+        return html.unescape(name) if name else None
+
+    def score(p: Dict[str, Any]) -> int:
+        name = pick_name(p) or ""
+        name_l = name.lower()
+        s = 0
+        if name_l.startswith(query):
+            s += 3
+        elif query in name_l:
+            s += 1
+        tags = p.get("categories_tags", []) or []
+        if any("beverages" in t for t in tags):
+            s -= 2
+        return s
+
+    products = list(products)
+    products.sort(key=score, reverse=True)
+    return pick_name(products[0])
+
+
+def sorted_top(product_name: str, products: List[Dict[str, Any]], k: int = 4) -> List[str]:
+    query = prepare_query(product_name)
+    scored = []
+    for product in products:
+        named = _name(product)
+        if named is None:
+            continue
+        name, russian_name = named
+        key = _key(name)
+        if not key:
+            continue
+        russian = russian_name or bool(_CYRILLIC_RE.search(key))
+        scored.append((score(query, key, russian, product), name))
+    # sorted устойчива: при равной оценке выигрывает продукт выше в выдаче, как в rank
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [name for _, name in scored[:k]]
+
+
+def main() -> None:
+    print(f"{'кандидатов':<12}{'старая, мс':>12}{'sort, мс':>10}{'rank, мс':>10}{'sort/rank':>11}  путь rank")
+    for count in (24, 1000, 10000):
+        products = make_products(count)
+        for query in QUERIES:
+            assert sorted_top(query, products) == [candidate.name for candidate in rank(query, products, k=4)]
+        number = max(1, 20000 // count)
+        per_query = number * len(QUERIES) / 1e3
+        legacy = timeit.timeit(lambda: [legacy_best(query, products) for query in QUERIES], number=number)
+        full = timeit.timeit(lambda: [sorted_top(query, products) for query in QUERIES], number=number)
+        top = timeit.timeit(lambda: [rank(query, products, k=4) for query in QUERIES], number=number)
+        path = "сортировка" if count <= SORT_MAX_CANDIDATES else "куча"
+        print(f"{count:<12}{legacy / per_query:>12.3f}{full / per_query:>10.3f}{top / per_query:>10.3f}{full / top:>10.2f}x  {path}")
+
+    print()
+    products = make_products(1000)
+    for query in QUERIES:
+        ranked = rank(query, products, k=4)
+        print(f"«{query}»: до — {legacy_best(query, products)}; после — {ranked[0].name}")
+        print(f"    варианты: {', '.join(candidate.name for candidate in ranked[1:])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from app.bot.handlers import BotHandlers
+from app.services.challenges import ChallengeRegistry
+from app.services.reminders import HydrationReminders
+from app.services.stats import GlobalStats
+from app.services.storage import InMemoryStorage
+from tests.fakes import make_context, make_update
+
+
+class Dialog:
+    #Отправляет текстовые сообщения через роутер от одного пользователя в одном чате.
+
+    def __init__(self, handlers: BotHandlers, chat_id: int = 1, user_id: int = 1) -> None:
+        self.handlers = handlers
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.context = make_context()
+        self.replies = []
+
+    async def send(self, text: str) -> None:
+        update = make_update(self.chat_id, text, user_id=self.user_id, replies=self.replies)
+        await self.handlers.router.dispatch(update, self.context)
+
+    def run(self, *texts: str) -> list:
+        async def run():
+            for text in texts:
+                await self.send(text)
+
+        asyncio.run(run())
+        return self.replies
+
+
+@pytest.fixture
+def make_handlers():
+    #Фабрика BotHandlers без внешних сервисов; нужные зависимости передаются по имени.
+    def make(**overrides) -> BotHandlers:
+        storage = overrides.pop("storage", None) or InMemoryStorage()
+        deps = dict(
+            storage=storage,
+            weather=None,
+            food=None,
+            plotter=None,
+            reminders=HydrationReminders(storage=storage),
+            activities=None,
+            stats=GlobalStats(),
+            challenges=ChallengeRegistry(),
+        )
+        deps.update(overrides)
+        return BotHandlers(**deps)
+
+    return make
+
+
+@pytest.fixture
+def dialog():
+    return Dialog
@@ -0,0 +1,23 @@
+from types import SimpleNamespace
+from typing import List, Optional
+
+BOT = SimpleNamespace(username="HealthBot")
+
+
+def make_context() -> SimpleNamespace:
+    return SimpleNamespace(user_data={}, args=None, bot=BOT)
+
+
+def make_update(chat_id: int, text: str, user_id: int = 1, replies: Optional[List[str]] = None) -> SimpleNamespace:
+    #Текстовое сообщение: отрицательный chat_id — группа, как в Telegram; ответы бота дописываются в replies.
+    async def reply_text(answer, **kwargs):
+        if replies is not None:
+            replies.append(answer)
+
+    message = SimpleNamespace(text=text, photo=None, reply_text=reply_text)
+    return SimpleNamespace(
+        message=message,
+        effective_message=message,
+        effective_chat=SimpleNamespace(id=chat_id, type="private" if chat_id > 0 else "group"),
+        effective_user=SimpleNamespace(id=user_id),
+    )
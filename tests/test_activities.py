@@ -0,0 +1,31 @@
+import pytest
+
+from app.services.activities import DEFAULT_MET, Activity, ActivityCatalog, default_catalog
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("тренировка", "тренировка"),
+    ("workout", "тренировка"),
+    ("тренировка ног", "тренировка"),
+    ("утренняя тренировка", "тренировка"),
+    ("бегг", "бег"),
+    ("плаванье", "плавание"),
+    ("тенис", "теннис"),
+])
+def test_match(query, expected):
+    assert default_catalog().match(query).name == expected
+
+
+def test_generic_workout_uses_default_met():
+    assert default_catalog().met("тренировка") == DEFAULT_MET
+
+
+def test_short_query_is_not_fuzzy_matched():
+    assert default_catalog().match("бе") is None
+    assert default_catalog().met("бе") == DEFAULT_MET
+
+
+def test_single_word_does_not_match_multiword_synonym():
+    catalog = ActivityCatalog([(Activity(name="айкидо", met=6.0), ["айкидо тренировка"])])
+    assert catalog.match("тренировки") is None
+    assert catalog.match("айкидо тренировки").name == "айкидо"
@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+from app.bot.router import Router
+from app.bot.state import FoodState
+from app.services.barcode import normalize_barcode
+from app.services.food import FoodClient
+from app.services.resilience import CircuitBreaker, UpstreamError
+from tests.fakes import make_update
+
+VALID = ["96385074", "036000291452", "4006381333931", "10614141000415"]
+
+
+@pytest.mark.parametrize("code", VALID)
+def test_valid_checksums_are_accepted(code):
+    assert normalize_barcode(code) == code
+    assert normalize_barcode(f" {code[:4]} {code[4:]} ") == code
+
+
+@pytest.mark.parametrize("code", VALID)
+def test_wrong_check_digit_is_rejected(code):
+    assert normalize_barcode(code[:-1] + str((int(code[-1]) + 1) % 10)) is None
+
+
+@pytest.mark.parametrize("raw", ["1234567", "123456789", "12345678901", "123456789012345", "", "4006381333931г", "40063-81333931"])
+def test_other_lengths_and_symbols_are_rejected(raw):
+    assert normalize_barcode(raw) is None
+
+
+def make_client(fetch):
+    client = FoodClient(barcode_ttl=1000.0, barcode_miss_ttl=10.0)
+    calls = []
+
+    def fetch_barcode(barcode):
+        calls.append(barcode)
+        return fetch(barcode)
+
+    client._fetch_barcode = fetch_barcode
+    return client, calls
+
+
+def ttl_left(client, barcode):
+    return client._barcode_cache[barcode][0] - time.monotonic()
+
+
+def test_hit_is_cached_long_and_miss_short():
+    client, calls = make_client(lambda barcode: {"name": "Гречка", "calories": 330.0} if barcode == VALID[0] else None)
+    assert client.get_by_barcode(VALID[0]) == {"name": "Гречка", "calories": 330.0}
+    assert client.get_by_barcode(VALID[1]) is None
+    assert 990 < ttl_left(client, VALID[0]) <= 1000
+    assert 0 < ttl_left(client, VALID[1]) <= 10
+
+    client.get_by_barcode(VALID[0])
+    client.get_by_barcode(VALID[1])
+    assert calls == [VALID[0], VALID[1]]
+
+
+def test_failure_is_not_cached():
+    def fail(barcode):
+        raise UpstreamError("503")
+
+    client, calls = make_client(fail)
+    assert client.get_by_barcode(VALID[0]) is None
+    assert VALID[0] not in client._barcode_cache
+    client.get_by_barcode(VALID[0])
+    assert calls == [VALID[0], VALID[0]]
+
+
+def test_open_breaker_is_not_cached():
+    client, calls = make_client(lambda barcode: None)
+    breaker = client.product_api.breaker
+    breaker.state, breaker.opened_at = CircuitBreaker.OPEN, time.monotonic()
+    assert client.get_by_barcode(VALID[0]) is None
+    assert calls == [] and VALID[0] not in client._barcode_cache
+
+
+class FakeFood:
+    def __init__(self):
+        self.barcodes = []
+        self.names = []
+
+    def get_by_barcode(self, barcode):
+        self.barcodes.append(barcode)
+        return {"name": "Гречка", "calories": 330.0}
+
+    def get_food_info(self, name):
+        self.names.append(name)
+        return None
+
+
+def test_digits_in_food_dialog_go_to_barcode_lookup(make_handlers, dialog):
+    food = FakeFood()
+    chat = dialog(make_handlers(food=food))
+    replies = chat.run("Лог еды", "4006 3813 33931")
+    assert food.barcodes == ["4006381333931"] and food.names == []
+    assert replies[-1].startswith("Гречка — 330 ккал")
+    assert Router.get_state(make_update(1, ""), chat.context) == FoodState.GRAMS
+
+
+def test_digits_with_wrong_checksum_are_not_a_barcode(make_handlers, dialog):
+    food = FakeFood()
+    replies = dialog(make_handlers(food=food)).run("Лог еды", "4006381333932")
+    assert food.barcodes == [] and food.names == []
+    assert replies[-1].startswith("Введите название продукта")
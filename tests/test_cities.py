@@ -0,0 +1,57 @@
+import pytest
+
+from app.services.cities import default_cities, edit_distance
+from app.services.weather import WeatherClient
+
+
+@pytest.mark.parametrize("name, city_id", [
+    ("москва", "moscow"), ("Msk", "moscow"), ("Питер", "saint-petersburg"), ("екатер", "yekaterinburg"), ("Омск", "omsk"),
+])
+def test_exact_names_synonyms_and_unique_prefixes_resolve(name, city_id):
+    assert default_cities().resolve(name).id == city_id
+
+
+@pytest.mark.parametrize("name, guess", [
+    ("Пушкин", "Пекин"), ("Братск", "Брянск"), ("Орск", "Омск"), ("Reutov", "Ростов-на-Дону"), ("новосибирк", "Новосибирск"),
+])
+def test_near_miss_names_are_only_suggested(name, guess):
+    assert default_cities().resolve(name) is None
+    assert default_cities().suggest(name).name == guess
+
+
+def test_ambiguous_prefix_is_not_resolved():
+    assert default_cities().resolve("ново") is None
+    assert default_cities().suggest("ново").id == "novosibirsk"
+
+
+def test_edit_distance_counts_transposition_once():
+    assert edit_distance("омкс", "омск", 2) == 1
+    assert edit_distance("орск", "омск", 1) == 1
+    assert edit_distance("пушкин", "пекин", 2) == 2
+
+
+def run_profile_dialog(chat, city_answers):
+    return chat.run("/set_profile", "70", "175", "30", "40", *city_answers, "m", "авто")
+
+
+@pytest.fixture
+def handlers(make_handlers):
+    return make_handlers(weather=WeatherClient(None))
+
+
+def test_near_miss_city_asks_and_keeps_timezone(handlers, dialog):
+    profile = handlers.storage.get_or_create_user(1)
+    handlers.storage.set_timezone(profile, "Asia/Novosibirsk")
+
+    replies = run_profile_dialog(dialog(handlers), ["Орск", "нет"])
+    assert any("Вы имели в виду Омск" in reply for reply in replies)
+    assert (profile.city, profile.city_id, profile.timezone) == ("Орск", "", "Asia/Novosibirsk")
+
+    run_profile_dialog(dialog(handlers), ["Пушкин", "да"])
+    assert (profile.city, profile.city_id, profile.timezone) == ("Пекин", "beijing", "Asia/Novosibirsk")
+
+
+def test_exact_city_sets_timezone(handlers, dialog):
+    run_profile_dialog(dialog(handlers), ["Омск"])
+    profile = handlers.storage.get_or_create_user(1)
+    assert (profile.city_id, profile.timezone) == ("omsk", "Asia/Omsk")
@@ -0,0 +1,121 @@
+import asyncio
+
+from app.services.coldstore import ColdStore
+from app.services.counters import DayTotals, LocalCounters, SqliteCounters
+from app.services.history import counter_day
+from app.services.storage import InMemoryStorage
+
+
+def water(storage: InMemoryStorage, user_id: int, amount: float) -> DayTotals:
+    # Как хэндлер: сначала профиль с общими итогами, затем запись
+    async def log():
+        await storage.load_user(user_id)
+        return await storage.add_water(user_id, amount)
+
+    return asyncio.run(log())
+
+
+def load(storage: InMemoryStorage, user_id: int):
+    return asyncio.run(storage.load_user(user_id))
+
+
+class CountingCounters(SqliteCounters):
+    reads = 0
+
+    def get_days(self, user_id, periods):
+        self.reads += 1
+        return super().get_days(user_id, periods)
+
+
+def test_timezone_change_in_one_process_keeps_other_process_totals(tmp_path):
+    path = str(tmp_path / "counters.db")
+    first = InMemoryStorage(counters=SqliteCounters(path))
+    second = InMemoryStorage(counters=SqliteCounters(path))
+    water(first, 1, 500)
+    assert water(second, 1, 300).water == 800
+
+    # Первый процесс считает, что у пользователя уже следующий день (например, сменили пояс), второй — нет
+    load(first, 1).next_reset += 24 * 60 * 60
+    water(first, 1, 100)
+    water(second, 1, 200)
+    assert load(second, 1).logged_water == 1000
+    assert load(first, 1).logged_water == 900
+    shared = SqliteCounters(path)
+    first_day = counter_day(first.get_or_create_user(1)).toordinal()
+    second_day = counter_day(second.get_or_create_user(1)).toordinal()
+    rows = shared.get_days(1, (first_day, second_day))
+    assert (rows[first_day].water, rows[second_day].water) == (900, 1000)
+
+
+def test_load_user_reads_both_days_in_one_query_at_rollover(tmp_path):
+    path = str(tmp_path / "counters.db")
+    first = InMemoryStorage(counters=SqliteCounters(path))
+    counters = CountingCounters(path)
+    second = InMemoryStorage(counters=counters)
+    water(second, 1, 200)
+    water(first, 1, 300)
+
+    profile = second.get_or_create_user(1)
+    # Профиль еще во вчерашнем дне, а другой процесс успел записать воду за вчера и за сегодня
+    profile.next_reset -= 24 * 60 * 60
+    counters.add(1, counter_day(profile).toordinal(), DayTotals(water=400), seed=DayTotals())
+    counters.reads = 0
+    assert load(second, 1).logged_water == 500
+    assert counters.reads == 1
+    [archived] = profile.history.range(counter_day(profile).replace(year=2000), counter_day(profile))
+    assert archived.water == 400
+
+
+def test_local_counters_do_not_overwrite_newer_day():
+    counters = LocalCounters()
+    counters.add(1, 10, DayTotals(water=500), seed=DayTotals())
+    assert counters.add(1, 9, DayTotals(water=100), seed=DayTotals(water=200)).water == 300
+    assert counters.get_days(1, (9, 10))[10].water == 500
+
+
+def test_eviction_drops_local_counter_rows(tmp_path):
+    cold = ColdStore(str(tmp_path / "cold.bin"))
+    storage = InMemoryStorage(cold=cold, max_hot=1)
+    water(storage, 1, 500)
+    water(storage, 2, 300)
+    assert list(storage.counters._rows) == [2]
+    assert water(storage, 1, 100).water == 600
+    cold.close()
+
+
+def test_concurrent_loads_across_midnight_do_not_carry_yesterday_into_today(tmp_path):
+    counters = SqliteCounters(str(tmp_path / "counters.db"))
+    storage = InMemoryStorage(counters=counters)
+    profile = storage.get_or_create_user(1)
+    # Вчерашний день еще не сброшен, в нем 700 мл
+    profile.next_reset -= 24 * 60 * 60
+    profile.logged_water = 700
+    counters.add(1, counter_day(profile).toordinal(), DayTotals(water=700), seed=DayTotals())
+
+    async def two_chats():
+        await asyncio.gather(storage.load_user(1), storage.load_user(1))
+
+    asyncio.run(two_chats())
+    assert profile.logged_water == 0
+    [archived] = profile.history.range(counter_day(profile).replace(year=2000), counter_day(profile))
+    assert archived.water == 700
+    assert asyncio.run(storage.add_water(1, 100)).water == 100
+
+
+class CountingConnection:
+    def __init__(self, connection):
+        self.connection = connection
+        self.statements = []
+
+    def execute(self, sql, *args):
+        self.statements.append(sql.split()[0])
+        return self.connection.execute(sql, *args)
+
+
+def test_old_rows_are_pruned_once_per_user_and_day(tmp_path):
+    counters = SqliteCounters(str(tmp_path / "counters.db"))
+    counters._connection = connection = CountingConnection(counters._connection)
+    for _ in range(3):
+        counters.add(1, 100, DayTotals(water=100), seed=DayTotals())
+    counters.add(1, 101, DayTotals(water=100), seed=DayTotals())
+    assert connection.statements == ["INSERT", "DELETE", "INSERT", "INSERT", "INSERT", "DELETE"]
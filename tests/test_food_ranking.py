@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from app.services.food_ranking import _CYRILLIC_RE, _key, _name, prepare_query, rank, score
+
+NAMES = ["Гречка ядрица", "Гречневая крупа", "Греческий йогурт", "Молоко 3,2%", "Куриная грудка", "Buckwheat groats", "Oat milk"]
+
+
+def make_products(count: int, seed: int):
+    rng = random.Random(seed)
+    products = []
+    for _ in range(count):
+        product = {"nutriments": {"energy-kcal_100g": 100} if rng.random() < 0.9 else {}}
+        product["product_name_ru" if rng.random() < 0.5 else "product_name"] = rng.choice(NAMES)
+        if rng.random() < 0.1:
+            product["categories_tags"] = ["en:beverages"]
+        products.append(product)
+    return products
+
+
+def brute_force(text, products, k):
+    #Тот же счет, что в rank, но для каждого продукта и полной сортировкой; sorted устойчива — при равенстве выше тот, кто раньше.
+    query = prepare_query(text)
+    scored = []
+    for product in products:
+        named = _name(product)
+        if named is None:
+            continue
+        name, russian_name = named
+        key = _key(name)
+        if not key:
+            continue
+        scored.append((score(query, key, russian_name or bool(_CYRILLIC_RE.search(key)), product), name, id(product)))
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return scored[:k]
+
+
+@pytest.mark.parametrize("text", ["гречка", "гречкя", "куриная грутка", "молоко", "oat"])
+# 24 — страница поиска бота (полная сортировка), 200 и 50 — куча с отсевом, 30 при k=10 — снова сортировка
+@pytest.mark.parametrize("count, k", [(200, 4), (50, 10), (30, 10), (24, 4), (3, 4), (0, 4)])
+def test_rank_matches_full_sort(text, count, k):
+    products = make_products(count, seed=count + k)
+    expected = brute_force(text, products, k)
+    ranked = rank(text, products, k=k)
+    assert [(c.score, c.name, id(c.product)) for c in ranked] == expected
+
+
+def test_equal_scores_keep_search_order():
+    products = [{"product_name_ru": "Гречка ядрица", "nutriments": {"energy-kcal_100g": value}} for value in (300, 310, 320, 330)]
+    ranked = rank("гречка", products, k=2)
+    assert [c.product["nutriments"]["energy-kcal_100g"] for c in ranked] == [300, 310]
+
+
+def test_k_larger_than_candidates_returns_all_named_products():
+    products = [{"product_name": "Oat milk"}, {"nutriments": {}}, {"product_name_ru": "Гречка"}]
+    assert [c.name for c in rank("гречка", products, k=10)] == ["Гречка", "Oat milk"]
+    assert rank("гречка", products, k=0) == []
+    assert rank("!!!", products, k=4) == []
@@ -0,0 +1,101 @@
+import datetime as dt
+
+from app.bot.formatters import format_history
+from app.models import DailyHistory, DailyRecord, FoodLogEntry, UserProfile
+from app.services import history
+from app.services.history import archive_day, counter_day, counter_period, local_today, recent_days
+from app.services.timezones import next_local_midnight, zone
+
+
+def record(day: dt.date, water: float = 1000) -> DailyRecord:
+    return DailyRecord(day=day, water=water, water_goal=2000, calories_in=1500, calories_out=200, calorie_goal=2000, top_foods="гречка")
+
+
+def test_range_returns_only_days_inside_bounds():
+    history = DailyHistory()
+    start = dt.date(2026, 1, 1)
+    for offset in (0, 1, 3, 7):
+        history.append(record(start + dt.timedelta(days=offset), water=offset))
+    days = [r.day for r in history.range(dt.date(2026, 1, 2), dt.date(2026, 1, 7))]
+    assert days == [dt.date(2026, 1, 2), dt.date(2026, 1, 4)]
+    assert history.range(dt.date(2026, 2, 1), dt.date(2026, 2, 28)) == []
+
+
+def test_repeated_day_is_merged_into_stored_day():
+    history = DailyHistory()
+    history.append(record(dt.date(2026, 1, 5)))
+    later = DailyRecord(day=dt.date(2026, 1, 5), water=300, water_goal=2500, calories_in=200, calories_out=50,
+                        calorie_goal=2100, top_foods="творог, гречка")
+    history.append(later)
+    [merged] = history.range(dt.date(2026, 1, 1), dt.date(2026, 1, 31))
+    assert (merged.water, merged.calories_in, merged.calories_out) == (1300, 1700, 250)
+    assert (merged.water_goal, merged.calorie_goal, merged.top_foods) == (2500, 2100, "гречка, творог")
+
+
+def test_earlier_missing_day_is_inserted_in_order():
+    history = DailyHistory()
+    history.append(record(dt.date(2026, 1, 3)))
+    history.append(record(dt.date(2026, 1, 5)))
+    history.append(record(dt.date(2026, 1, 4), water=1))
+    assert [(r.day.day, r.water) for r in history.range(dt.date(2026, 1, 1), dt.date(2026, 1, 31))] == [(3, 1000), (4, 1), (5, 1000)]
+
+
+def test_timezone_moved_back_keeps_second_archive_of_same_day():
+    tokyo_evening = dt.datetime(2026, 3, 10, 23, 30, tzinfo=zone("Asia/Tokyo")).timestamp()
+    profile = UserProfile(user_id=1, timezone="Asia/Tokyo", logged_water=700, next_reset=next_local_midnight(tokyo_evening, "Asia/Tokyo"))
+    archive_day(profile)
+    # Пояс сдвинули на Лондон: 10 марта там еще идет, и этот день архивируется снова
+    profile.timezone, profile.logged_water = "Europe/London", 400
+    profile.next_reset = next_local_midnight(tokyo_evening, "Europe/London")
+    archive_day(profile)
+    [day] = profile.history.range(dt.date(2026, 3, 10), dt.date(2026, 3, 10))
+    assert day.water == 1100
+
+
+def test_history_survives_record_roundtrip():
+    history = DailyHistory()
+    history.append(record(dt.date(2026, 1, 5)))
+    restored = DailyHistory.from_record(history.to_record())
+    assert restored.range(dt.date(2026, 1, 5), dt.date(2026, 1, 5)) == history.range(dt.date(2026, 1, 5), dt.date(2026, 1, 5))
+
+
+def test_archive_day_uses_the_day_that_ends_at_next_reset():
+    evening = dt.datetime(2026, 3, 10, 23, 30, tzinfo=zone("Asia/Tokyo")).timestamp()
+    profile = UserProfile(user_id=1, timezone="Asia/Tokyo", logged_water=700, next_reset=next_local_midnight(evening, "Asia/Tokyo"))
+    profile.food_log.append(FoodLogEntry("гречка", 200, 220))
+    assert counter_day(profile) == dt.date(2026, 3, 10)
+    archive_day(profile)
+    [archived] = profile.history.range(dt.date(2026, 3, 10), dt.date(2026, 3, 10))
+    assert archived.water == 700 and archived.top_foods == "гречка"
+
+
+def test_counter_period_is_computed_once_per_reset_epoch(monkeypatch):
+    midnight = next_local_midnight(dt.datetime(2026, 3, 10, 12, tzinfo=zone("Asia/Tokyo")).timestamp(), "Asia/Tokyo")
+    first, second = (UserProfile(user_id=user_id, timezone="Asia/Tokyo", next_reset=midnight) for user_id in (1, 2))
+    assert counter_period(first) == dt.date(2026, 3, 10).toordinal()
+    # Тот же next_reset у соседа по поясу и повторные апдейты обходятся без datetime
+    monkeypatch.setattr(history, "zone", None)
+    assert counter_period(second) == counter_period(first) == dt.date(2026, 3, 10).toordinal()
+
+
+def test_empty_day_is_not_archived():
+    profile = UserProfile(user_id=1, next_reset=next_local_midnight(0.0, "Europe/Moscow"))
+    archive_day(profile)
+    assert len(profile.history) == 0
+
+
+def test_recent_days_ends_with_current_day():
+    profile = UserProfile(user_id=1, logged_water=300)
+    today = local_today(profile)
+    profile.history.append(record(today - dt.timedelta(days=9)))
+    profile.history.append(record(today - dt.timedelta(days=2)))
+    records = recent_days(profile, 7)
+    assert [r.day for r in records] == [today - dt.timedelta(days=2), today]
+    assert records[-1].water == 300
+
+
+def test_one_day_history_is_worded_as_today():
+    today = [record(dt.date(2026, 1, 5))]
+    assert format_history(today, 1).startswith("Сегодня:")
+    assert "Завершенных дней пока нет" not in format_history(today, 1)
+    assert "Завершенных дней пока нет" in format_history(today, 7)
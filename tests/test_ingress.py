@@ -0,0 +1,120 @@
+import asyncio
+
+from telegram.ext import ConversationHandler
+
+from app.bot.ingress import Ingress
+from app.bot.router import ANY_COMMAND, Router
+from tests.fakes import make_context, make_update
+
+DIALOG = 7
+
+
+def make_ingress(calls):
+    async def history(update, context):
+        calls.append((update.effective_user.id, update.effective_message.text))
+
+    router = Router()
+    router.command("history", history)
+    return Ingress(router, read_only=[history], expensive=[])
+
+
+def dispatch(ingress, *updates):
+    async def run():
+        for update in updates:
+            await ingress.dispatch(update, make_context())
+
+    asyncio.run(run())
+
+
+def test_repeated_request_is_merged():
+    calls = []
+    ingress = make_ingress(calls)
+    dispatch(ingress, make_update(-100, "/history 7", user_id=1), make_update(-100, "/history 7", user_id=1))
+    assert calls == [(1, "/history 7")]
+    assert ingress.merged == 1
+
+
+def test_other_users_in_group_are_not_merged():
+    calls = []
+    ingress = make_ingress(calls)
+    dispatch(ingress, make_update(-100, "/history 7", user_id=1), make_update(-100, "/history 7", user_id=2))
+    assert calls == [(1, "/history 7"), (2, "/history 7")]
+    assert ingress.merged == 0
+
+
+def test_different_arguments_are_not_merged():
+    calls = []
+    ingress = make_ingress(calls)
+    dispatch(ingress, make_update(5, "/history 7", user_id=1), make_update(5, "/history 30", user_id=1))
+    assert calls == [(1, "/history 7"), (1, "/history 30")]
+
+
+def test_handler_is_resolved_under_the_state_left_by_previous_update():
+    calls = []
+    opened = asyncio.Event()
+    release = asyncio.Event()
+
+    async def log_food(update, context):
+        calls.append("log_food")
+        opened.set()
+        await release.wait()
+        return DIALOG
+
+    async def history(update, context):
+        calls.append("history")
+
+    async def cancelled(update, context):
+        calls.append("cancelled")
+        return ConversationHandler.END
+
+    router = Router()
+    router.command("log_food", log_food)
+    router.command("history", history)
+    router.add(ANY_COMMAND, cancelled, state=DIALOG)
+    ingress = Ingress(router, read_only=[history], expensive=[])
+    context = make_context()
+
+    async def run():
+        first = asyncio.create_task(ingress.dispatch(make_update(5, "/log_food"), context))
+        await opened.wait()
+        # Оба /history встают в очередь, пока чат еще не в диалоге
+        queued = [asyncio.create_task(ingress.dispatch(make_update(5, "/history 7"), context)) for _ in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(first, *queued)
+
+    asyncio.run(run())
+    # Первый /history выполнился уже в диалоге и закрыл его, второй — обычный запрос, склеивать не с чем
+    assert calls == ["log_food", "cancelled", "history"]
+    assert ingress.merged == 0
+
+
+def test_expensive_updates_over_the_waiting_limit_are_shed():
+    calls = []
+    release = asyncio.Event()
+
+    async def plot(update, context):
+        calls.append(update.effective_chat.id)
+        await release.wait()
+
+    router = Router()
+    router.command("plot_progress", plot)
+    ingress = Ingress(router, read_only=[], expensive=[plot], max_active=1, max_waiting=1)
+    replies = []
+
+    async def run():
+        tasks = [
+            asyncio.create_task(ingress.dispatch(make_update(chat_id, "/plot_progress", replies=replies), make_context()))
+            for chat_id in (1, 2, 3)
+        ]
+        for _ in range(5):
+            await asyncio.sleep(0)
+        # Первый строится, второй ждет, третьему места в очереди нет
+        assert ingress.snapshot()["waiting"] == 1
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert calls == [1, 2]
+    assert ingress.dropped == 1
+    assert replies == ["Сейчас много запросов, попробуйте через минуту."]
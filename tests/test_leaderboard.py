@@ -0,0 +1,38 @@
+import random
+
+from app.services.leaderboard import RankedBoard
+
+
+def expected_ranks(scores):
+    ordered = sorted(scores, key=lambda user_id: (-scores[user_id], user_id))
+    return {user_id: place for place, user_id in enumerate(ordered, 1)}
+
+
+def test_rank_matches_full_sort_through_splits_and_removals():
+    rng = random.Random(7)
+    board = RankedBoard(load=4)
+    scores = {}
+    for step in range(2000):
+        user_id = rng.randrange(60)
+        if rng.random() < 0.1:
+            board.discard(user_id)
+            scores.pop(user_id, None)
+        else:
+            delta = rng.choice([0, 250, 500, 1000])
+            board.add(user_id, delta)
+            scores[user_id] = scores.get(user_id, 0.0) + delta
+        if step % 50 == 0:
+            ranks = expected_ranks(scores)
+            assert {user_id: board.rank(user_id) for user_id in scores} == ranks
+    assert board.top(5) == [(user_id, scores[user_id]) for user_id in sorted(scores, key=lambda u: (-scores[u], u))[:5]]
+
+
+def test_reset_keeps_members_ranked_by_id():
+    board = RankedBoard(load=2)
+    for user_id, score in [(3, 100), (1, 50), (2, 300), (5, 10), (4, 0)]:
+        board.set(user_id, score)
+    board.reset()
+    assert [board.rank(user_id) for user_id in range(1, 6)] == [1, 2, 3, 4, 5]
+    board.add(5, 1)
+    assert board.rank(5) == 1 and board.rank(4) == 5
+    assert board.rank(42) is None
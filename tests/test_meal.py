@@ -0,0 +1,36 @@
+from app.bot.router import Router
+from app.bot.state import FoodState
+from app.services.meal import parse_meal
+from tests.fakes import make_update
+
+
+def test_single_item_is_not_a_meal_in_dialog():
+    assert parse_meal("гречка 200г", min_items=2) == []
+    assert parse_meal("молоко 3,2", min_items=2) == []
+
+
+def test_comma_or_line_separated_items_are_a_meal():
+    assert parse_meal("гречка 200г, курица 150 г", min_items=2) == [("гречка", 200.0), ("курица", 150.0)]
+    assert parse_meal("гречка 200\nогурец 100", min_items=2) == [("гречка", 200.0), ("огурец", 100.0)]
+
+
+def test_log_meal_accepts_single_item():
+    assert parse_meal("гречка 200г") == [("гречка", 200.0)]
+
+
+class FakeFood:
+    def __init__(self):
+        self.meals = []
+
+    async def get_many(self, names, timeout):
+        self.meals.append(names)
+        return {name: {"name": name.capitalize(), "calories": 100.0} for name in names}
+
+
+def test_single_item_after_bare_log_meal_is_a_meal(make_handlers, dialog):
+    food = FakeFood()
+    chat = dialog(make_handlers(food=food))
+    chat.run("/log_meal", "гречка 200г")
+    assert food.meals == [["гречка"]]
+    assert Router.get_state(make_update(1, ""), chat.context) == FoodState.MEAL
+    assert "meal_mode" not in chat.context.user_data
@@ -0,0 +1,38 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.bot.handlers import BotHandlers
+
+
+def tap(handlers: BotHandlers, data: str):
+    answers = []
+
+    async def answer(text=None, **kwargs):
+        answers.append(text)
+
+    async def edit_message_text(text, **kwargs):
+        pass
+
+    message = SimpleNamespace(chat=SimpleNamespace(type="private"), reply_to_message=None)
+    query = SimpleNamespace(
+        data=data, message=message, from_user=SimpleNamespace(id=1), answer=answer, edit_message_text=edit_message_text
+    )
+    update = SimpleNamespace(callback_query=query, effective_user=SimpleNamespace(id=1), effective_chat=SimpleNamespace(id=1))
+    asyncio.run(handlers.quick_log(update, SimpleNamespace(user_data={})))
+    return answers
+
+
+def test_quick_water_button_logs_its_amount(make_handlers):
+    handlers = make_handlers()
+    assert tap(handlers, "q:water:250") == ["+250 мл воды"]
+    assert handlers.storage.get_or_create_user(1).logged_water == 250
+
+
+@pytest.mark.parametrize("data", ["q:water:nan", "q:water:-100000", "q:water:abc", "q:water:300", "q:water:", "q:refresh:1"])
+def test_forged_callback_data_is_ignored(make_handlers, data):
+    handlers = make_handlers()
+    assert tap(handlers, data) == [None]
+    assert handlers.storage.get_or_create_user(1).logged_water == 0
+    assert handlers.stats.summary()["water"] == 0
@@ -0,0 +1,100 @@
+import asyncio
+import datetime as dt
+
+from app.models import UserProfile
+from app.services import snapshot
+from app.services.coldstore import ColdStore
+from app.services.reminders import HydrationReminders, TimerWheel
+from app.services.snapshot import encode_profile, write_snapshot
+from app.services.storage import InMemoryStorage
+from app.services.timezones import zone
+
+NOON = dt.datetime(2026, 1, 15, 12, tzinfo=zone("Europe/Moscow")).timestamp()
+
+
+def test_mid_tick_key_fires_within_one_tick():
+    wheel = TimerWheel(tick=60.0, size=1441)
+    wheel.pop_due(6000.0)
+    wheel.schedule(1, 6075.0)
+    assert wheel.pop_due(6060.01) == []
+    assert wheel.pop_due(6075.0 + 60.0) == [1]
+    assert len(wheel) == 0
+
+
+def test_key_on_tick_boundary_fires_on_that_tick():
+    wheel = TimerWheel(tick=60.0, size=10)
+    wheel.pop_due(0.0)
+    wheel.schedule(1, 120.0)
+    assert wheel.pop_due(119.9) == []
+    assert wheel.pop_due(120.0) == [1]
+
+
+def test_key_of_next_revolution_stays_in_slot():
+    wheel = TimerWheel(tick=60.0, size=10)
+    wheel.pop_due(0.0)
+    wheel.schedule(1, 60.0 * 13)
+    assert wheel.pop_due(60.0 * 3) == []
+    assert wheel.pop_due(60.0 * 13) == [1]
+
+
+def test_collect_due_keeps_cold_profiles_in_cold(tmp_path):
+    cold = ColdStore(str(tmp_path / "cold.bin"))
+    storage = InMemoryStorage(cold=cold, max_hot=1)
+    reminders = HydrationReminders(storage)
+    storage.get_or_create_user(1)
+    storage.get_or_create_user(2)
+    assert 1 in cold
+    reminders.wheel.schedule(1, NOON)
+
+    due = reminders.collect_due(NOON + 100.0)
+
+    assert [profile.user_id for profile in due] == [1]
+    assert 1 in cold and 1 not in storage.users
+    assert list(storage.users) == [2]
+    cold.close()
+
+
+def test_collect_due_ignores_logged_water_of_past_day():
+    storage = InMemoryStorage()
+    reminders = HydrationReminders(storage)
+    profile = UserProfile(user_id=1, water_goal=2000, logged_water=2500, next_reset=NOON + 50.0)
+    storage.users[1] = profile
+    reminders.wheel.schedule(1, NOON)
+
+    assert reminders.collect_due(NOON + 100.0) == [profile]
+    assert "Выпито 0 мл" in reminders.format_reminder(profile, NOON + 100.0)
+
+
+def test_profiles_restored_from_snapshot_get_reminders(tmp_path, monkeypatch):
+    records = {user_id: encode_profile(UserProfile(user_id=user_id, water_goal=2000)) for user_id in (1, 2, 3)}
+    # У второго напоминания выключены, срок третьего прошел, пока бот не работал
+    due = {1: NOON + 600.0, 3: NOON - 3600.0}
+    base = write_snapshot(str(tmp_path / "snapshot.bin"), records, None, due)
+    storage = InMemoryStorage(loader=base.load)
+    reminders = HydrationReminders(storage)
+
+    def decode(data):
+        raise AssertionError("seed must not decode profiles")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(snapshot, "decode_profile", decode)
+        assert asyncio.run(reminders.seed(list(base.reminder_due()), now=NOON)) == 2
+    assert reminders.wheel.due[1] == NOON + 600.0
+    assert NOON <= reminders.wheel.due[3] < NOON + reminders.min_interval
+    assert 2 not in reminders.wheel.due
+
+    due_profiles = reminders.collect_due(NOON + 600.0)
+    assert sorted(profile.user_id for profile in due_profiles) == [1, 3]
+    assert not storage.users
+    base.close()
+
+
+def test_stale_due_does_not_remind_at_night():
+    storage = InMemoryStorage()
+    reminders = HydrationReminders(storage)
+    storage.users[1] = UserProfile(user_id=1, water_goal=2000)
+    night = NOON - 11 * 3600.0
+    reminders.wheel.schedule(1, night)
+
+    assert reminders.collect_due(night) == []
+    assert reminders.wheel.due[1] > night
@@ -0,0 +1,138 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from app.bot.formatters import format_stats
+from app.services.resilience import CircuitBreaker, Resilience, UpstreamError, UpstreamMiss, raise_for_upstream
+from app.services.stats import GlobalStats
+from app.services.storage import InMemoryStorage
+
+
+def make_response(status: int) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status
+    resp.url = "https://upstream.test/api"
+    return resp
+
+
+def failing_call(status: int):
+    def call():
+        raise_for_upstream(make_response(status))
+        return 1.0
+
+    return call
+
+
+def test_4xx_is_a_miss_not_a_failure():
+    with pytest.raises(UpstreamMiss):
+        raise_for_upstream(make_response(404))
+    raise_for_upstream(make_response(200))
+
+
+@pytest.mark.parametrize("status", [400, 401, 404])
+def test_4xx_does_not_open_breaker(status):
+    endpoint = Resilience().endpoint("test", failure_threshold=2)
+    for _ in range(5):
+        assert endpoint.call("key", failing_call(status)) is None
+    assert endpoint.breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_5xx_and_429_open_breaker(status):
+    endpoint = Resilience().endpoint("test", failure_threshold=2)
+    for _ in range(2):
+        endpoint.call("key", failing_call(status))
+    assert endpoint.breaker.state == CircuitBreaker.OPEN
+
+
+def test_unexpected_error_during_probe_releases_half_open():
+    endpoint = Resilience().endpoint("test", failure_threshold=1, reset_timeout=0.0)
+    endpoint.call("key", failing_call(500))
+    assert endpoint.breaker.state == CircuitBreaker.OPEN
+
+    def broken():
+        raise KeyError("main")
+
+    with pytest.raises(KeyError):
+        endpoint.call("key", broken)
+    assert endpoint.breaker.state == CircuitBreaker.HALF_OPEN
+    assert endpoint.call("key", lambda: 2.0) == 2.0
+    assert endpoint.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_only_the_probe_frees_the_probe_slot():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.0, on_transition=lambda *args: None)
+    early = breaker.allow()
+    breaker.record_failure(breaker.allow())
+    probe = breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN and probe is not None
+    # Запрос, пропущенный до размыкания, завершился — пробный еще идет, второго не пускаем
+    breaker.record_failure(early)
+    breaker.release(early)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow() is None
+    breaker.release(probe)
+    assert breaker.allow() is not None
+
+
+def test_failed_attempts_count_towards_p95():
+    endpoint = Resilience().endpoint("test", failure_threshold=100)
+    for _ in range(20):
+        endpoint.call("key", failing_call(503))
+    assert len(endpoint.latencies) == 20
+    assert endpoint.p95() is not None
+
+
+def hedged_endpoint():
+    layer = Resilience()
+    endpoint = layer.endpoint("test", hedge=True, hedge_min_delay=0.05, failure_threshold=10)
+    endpoint.latencies.extend([0.01] * 20)
+    return layer, endpoint
+
+
+def attempts(*behaviours):
+    #Каждый следующий вызов ведет себя по следующему правилу: (задержка, результат или исключение).
+    calls = iter(behaviours)
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            delay, outcome = next(calls)
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return call
+
+
+def test_slow_first_request_is_hedged_and_fast_second_wins():
+    layer, endpoint = hedged_endpoint()
+    started = time.monotonic()
+    assert endpoint.call("key", attempts((0.3, "slow"), (0.0, "fast"))) == "fast"
+    assert time.monotonic() - started < 0.25
+    assert layer.counters["test.hedged"] == 1
+    assert endpoint.breaker.state == CircuitBreaker.CLOSED
+    layer.executor.shutdown()
+
+
+def test_hedge_where_both_requests_fail_counts_one_failure():
+    layer, endpoint = hedged_endpoint()
+    endpoint._remember("key", "stale")
+    result = endpoint.call("key", attempts((0.2, UpstreamError("503")), (0.0, UpstreamError("503"))))
+    assert result == "stale"
+    assert layer.counters["test.hedged"] == 1
+    assert layer.counters["test.failures"] == 1 and endpoint.breaker.failures == 1
+    layer.executor.shutdown()
+
+
+def test_stats_report_breakers_and_counters():
+    layer = Resilience()
+    layer.endpoint("openweather.current")
+    layer.count("openweather.current", "failures")
+    ingress = {"merged": 0, "dropped": 0, "waiting": 0, "chats": 0}
+    text = format_stats(GlobalStats().summary(), InMemoryStorage().tier_stats(), ingress, layer.snapshot())
+    assert "- openweather.current: размыкатель closed, p95 —; сбоев 1, промахов 0" in text
+    layer.executor.shutdown()
@@ -0,0 +1,56 @@
+import time
+
+from app.models import UserProfile
+from app.services.coldstore import ColdStore
+from app.services.storage import InMemoryStorage
+
+
+def restored_profile(user_id: int, next_reset: float) -> UserProfile:
+    return UserProfile(user_id=user_id, logged_water=500, next_reset=next_reset)
+
+
+def test_profile_loaded_from_snapshot_is_reset_at_midnight():
+    midnight = time.time() + 3600
+    storage = InMemoryStorage(loader=lambda user_id: restored_profile(user_id, midnight))
+    storage.enable_rollover_sweep()
+    assert storage.rollover_heap == []
+
+    profile = storage.get_or_create_user(1)
+    assert storage.rollover_due(midnight) == 1
+    assert profile.logged_water == 0
+    assert len(profile.history) == 1
+    assert profile.next_reset > midnight
+
+
+def test_evicted_profile_is_reset_in_cold(tmp_path):
+    midnight = time.time() + 3600
+    cold = ColdStore(str(tmp_path / "cold.bin"))
+    storage = InMemoryStorage(loader=lambda user_id: restored_profile(user_id, midnight), cold=cold, max_hot=1)
+    storage.enable_rollover_sweep()
+    storage.get_or_create_user(1)
+    storage.get_or_create_user(2)
+    assert 1 in cold
+
+    assert storage.rollover_due(midnight) == 2
+    assert 1 in cold and list(storage.users) == [2]
+    evicted = cold.peek(1)
+    assert evicted.logged_water == 0
+    assert len(evicted.history) == 1
+    assert (evicted.next_reset, 1) in storage.rollover_heap
+    cold.close()
+
+
+def test_cold_churn_does_not_duplicate_heap_entries(tmp_path):
+    midnight = time.time() + 3600
+    cold = ColdStore(str(tmp_path / "cold.bin"))
+    storage = InMemoryStorage(loader=lambda user_id: restored_profile(user_id, midnight), cold=cold, max_hot=1)
+    storage.enable_rollover_sweep()
+    for _ in range(5):
+        storage.get_or_create_user(1)
+        storage.get_or_create_user(2)
+    assert sorted(storage.rollover_heap) == [(midnight, 1), (midnight, 2)]
+
+    assert storage.rollover_due(midnight) == 2
+    assert storage.rollover_queued == {1: cold.peek(1).next_reset, 2: storage.users[2].next_reset}
+    assert len(storage.rollover_heap) == 2
+    cold.close()
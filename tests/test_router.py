@@ -0,0 +1,69 @@
+import asyncio
+from types import SimpleNamespace
+
+from telegram.ext import ConversationHandler
+
+from app.bot.handlers import BotHandlers
+from app.bot.router import ANY_COMMAND, ANY_TEXT, Router
+from tests.fakes import make_context, make_update
+
+DIALOG = 7
+
+
+def make_router(calls):
+    def handler(name, result=None):
+        async def callback(update, context):
+            calls.append((name, update.effective_chat.id))
+            return result
+
+        return callback
+
+    router = Router()
+    router.command("log_food", handler("log_food", DIALOG))
+    router.command("leaderboard", handler("leaderboard"))
+    router.add(ANY_TEXT, handler("dialog_text", ConversationHandler.END), state=DIALOG)
+    router.add(ANY_COMMAND, handler("cancelled", ConversationHandler.END), state=DIALOG)
+    return router
+
+
+def test_dialog_state_is_kept_per_chat():
+    calls = []
+    router = make_router(calls)
+    context = make_context()
+    private, group = 1, -100
+
+    asyncio.run(router.dispatch(make_update(private, "/log_food"), context))
+    asyncio.run(router.dispatch(make_update(group, "/leaderboard"), context))
+    asyncio.run(router.dispatch(make_update(group, "привет"), context))
+
+    assert calls == [("log_food", private), ("leaderboard", group)]
+    assert Router.get_state(make_update(private, ""), context) == DIALOG
+    assert Router.get_state(make_update(group, ""), context) is None
+
+    asyncio.run(router.dispatch(make_update(private, "гречка"), context))
+    assert calls[-1] == ("dialog_text", private)
+    assert context.user_data == {}
+
+
+def test_command_addressed_to_another_bot_is_ignored():
+    calls = []
+    router = make_router(calls)
+    context = make_context()
+
+    asyncio.run(router.dispatch(make_update(-100, "/leaderboard@OtherBot"), context))
+    assert calls == []
+    asyncio.run(router.dispatch(make_update(-100, "/leaderboard@healthbot"), context))
+    asyncio.run(router.dispatch(make_update(-100, "/leaderboard"), context))
+    assert calls == [("leaderboard", -100), ("leaderboard", -100)]
+
+
+def progress_query(chat_type: str, owner: int, tapper: int):
+    request = SimpleNamespace(from_user=SimpleNamespace(id=owner))
+    message = SimpleNamespace(chat=SimpleNamespace(type=chat_type), reply_to_message=request)
+    return SimpleNamespace(message=message, from_user=SimpleNamespace(id=tapper))
+
+
+def test_quick_buttons_belong_to_the_progress_owner_in_groups():
+    assert BotHandlers.owns_progress(progress_query("group", owner=1, tapper=1))
+    assert not BotHandlers.owns_progress(progress_query("supergroup", owner=1, tapper=2))
+    assert BotHandlers.owns_progress(progress_query("private", owner=1, tapper=1))
@@ -0,0 +1,42 @@
+import marshal
+
+from app.models import UserProfile
+from app.services.snapshot import SnapshotFile, decode_profile, encode_profile, write_snapshot
+
+
+def old_record(city: str) -> bytes:
+    record = marshal.loads(encode_profile(UserProfile(user_id=1, city=city)))
+    del record["city_id"]
+    return marshal.dumps(record)
+
+
+def test_missing_city_id_is_derived_from_city():
+    assert decode_profile(old_record("Казань")).city_id == "kazan"
+
+
+def test_unknown_city_gets_empty_city_id():
+    assert decode_profile(old_record("Нигдеград")).city_id == ""
+
+
+def test_write_snapshot_merges_fresh_records_with_base(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    first = write_snapshot(path, {1: encode_profile(UserProfile(user_id=1)), 2: encode_profile(UserProfile(user_id=2))}, None)
+    second = write_snapshot(path, {2: encode_profile(UserProfile(user_id=2, weight=80.0)), 3: encode_profile(UserProfile(user_id=3))}, first)
+    first.close()
+
+    assert [user_id for user_id, _ in second.records()] == [1, 2, 3]
+    assert second.load(1).user_id == 1
+    assert second.load(2).weight == 80.0
+    second.close()
+    reopened = SnapshotFile(path)
+    assert len(reopened) == 3
+    reopened.close()
+
+
+def test_reminder_due_is_kept_for_copied_records(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    first = write_snapshot(path, {1: encode_profile(UserProfile(user_id=1)), 2: encode_profile(UserProfile(user_id=2))}, None, {1: 500.0})
+    second = write_snapshot(path, {2: encode_profile(UserProfile(user_id=2))}, first)
+    first.close()
+    assert list(second.reminder_due()) == [(1, 500.0), (2, 0.0)]
+    second.close()
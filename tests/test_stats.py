@@ -0,0 +1,27 @@
+from app.services.stats import GlobalStats, SpaceSaving
+
+
+def test_abandoned_dialogs_expire():
+    stats = GlobalStats(dialog_ttl=1800)
+    stats.dialog_changed(1, True, now=0.0)
+    stats.dialog_changed(2, True, now=1000.0)
+    assert stats.summary(now=1500.0)["in_dialog"] == 2
+    assert stats.summary(now=1900.0)["in_dialog"] == 1
+    assert stats.summary(now=2900.0)["in_dialog"] == 0
+
+
+def test_finished_dialog_is_dropped_and_reentry_refreshes_time():
+    stats = GlobalStats(dialog_ttl=1800)
+    stats.dialog_changed(1, True, now=0.0)
+    stats.dialog_changed(1, False, now=10.0)
+    assert stats.summary(now=20.0)["in_dialog"] == 0
+    stats.dialog_changed(1, True, now=1000.0)
+    assert stats.summary(now=2000.0)["in_dialog"] == 1
+
+
+def test_top_reports_guaranteed_lower_bound():
+    counter = SpaceSaving(capacity=2)
+    for key in ["гречка", "гречка", "гречка", "рис", "творог"]:
+        counter.add(key)
+    # «творог» вытеснил «рис» и унаследовал его счетчик как погрешность
+    assert counter.top(2) == [("гречка", 3.0, 3.0), ("творог", 2.0, 1.0)]
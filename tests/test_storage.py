@@ -0,0 +1,50 @@
+import asyncio
+import threading
+
+from app.services.coldstore import ColdStore
+from app.services.storage import InMemoryStorage
+from tests.fakes import make_context, make_update
+
+
+class GatedWeather:
+    #Ответ погоды ждет, пока тест не откроет ворота: между загрузкой профиля и записью идут другие апдейты.
+
+    def __init__(self) -> None:
+        self.gate = threading.Event()
+
+    def fetch_temperature(self, city, city_id=""):
+        self.gate.wait(5)
+        return 31.0
+
+
+def test_profile_in_use_is_not_evicted_between_load_and_write(tmp_path, make_handlers):
+    cold = ColdStore(str(tmp_path / "cold.bin"))
+    storage = InMemoryStorage(cold=cold, max_hot=1)
+    weather = GatedWeather()
+    handlers = make_handlers(storage=storage, weather=weather)
+
+    async def run():
+        progress = asyncio.create_task(handlers.ingress.dispatch(make_update(1, "/check_progress"), make_context()))
+        await asyncio.sleep(0.05)
+        # Пока первый пользователь ждет погоду, второй занимает единственное место в горячем уровне
+        await handlers.ingress.dispatch(make_update(2, "/start", user_id=2), make_context())
+        assert 1 in storage.users and 1 not in cold
+        weather.gate.set()
+        await progress
+
+    asyncio.run(run())
+    assert storage.peek(1).temperature == 31.0
+    # Обработка закончилась — профиль снова вытесняется как обычно
+    storage.get_or_create_user(3)
+    assert list(storage.users) == [3]
+    assert cold.peek(1).temperature == 31.0
+    cold.close()
+
+
+def test_pins_are_counted_per_user():
+    storage = InMemoryStorage()
+    with storage.pinned(1):
+        with storage.pinned(1):
+            assert storage.pins == {1: 2}
+        assert storage.pins == {1: 1}
+    assert storage.pins == {}
@@ -0,0 +1,31 @@
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.services.timezones import parse_timezone
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("UTC+3", "Etc/GMT-3"),
+    ("utc-12", "Etc/GMT+12"),
+    ("+14", "Etc/GMT-14"),
+    ("UTC+0", "Etc/UTC"),
+])
+def test_offsets(text, expected):
+    assert parse_timezone(text) == expected
+
+
+@pytest.mark.parametrize("text", ["UTC-13", "UTC-14", "UTC+15"])
+def test_offsets_outside_existing_zones_are_rejected(text):
+    assert parse_timezone(text) is None
+
+
+@pytest.mark.parametrize("offset", range(-12, 15))
+def test_every_accepted_offset_is_a_real_zone(offset):
+    name = parse_timezone(f"UTC{offset:+d}")
+    assert ZoneInfo(name).utcoffset(None).total_seconds() == offset * 3600
+
+
+def test_iana_names_are_case_insensitive():
+    assert parse_timezone("asia/tokyo") == "Asia/Tokyo"
+    assert parse_timezone("EUROPE/MOSCOW") == "Europe/Moscow"